@@ -0,0 +1,596 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence
+import numpy as np
+from .core.patterns import SensorPattern
+from .core.anomaly import AnomalyDetector
+from .core.privacy import PrivacyMetrics
+from .core.scheduler import TrainingScheduler
+from .network.topology import build_fleet, build_sensors, build_topology
+from .storage.replay import ReplaySource
+
+# Benchmarks that need torch or matplotlib import them when they run, so
+# listing benchmarks (e.g. for the CLI's --only choices) stays cheap
+if TYPE_CHECKING:
+    from .core.sensor import EnhancedSensor
+
+# Parameter grids; `quick` runs use the first entries only
+SENSOR_COUNTS = (3, 10, 30, 100)
+FLEET_SIZES = (100, 1000)
+SCHEDULER_SENSORS = 100
+HISTORY_LENGTHS = (48, 256, 1024)
+PLOT_SENSORS = (3, 50)
+PRIVACY_READINGS = (1_000, 100_000)
+PRIVATIZATION_SENSORS = 1_000
+PRIVATIZATION_EPSILONS = (2.0, 10.0, 50.0)
+HIERARCHY_SIZES = (1_000, 5_000)
+ANOMALY_SIZES = (1_000, 10_000)
+REPLAY_SENSORS = 1_000
+REPLAY_FORMATS = ('npy', 'csv')
+STARTUP_COMMANDS = (('--help',), ('info',), ('run', '--help'))
+
+# Backends a lightweight CLI command should never load
+HEAVY_MODULES = ('torch', 'matplotlib')
+
+# Run in fresh interpreters by the startup benchmark. The peak comes from
+# VmHWM where available: ru_maxrss would include the forking parent's peak.
+_PEAK_RSS_SCRIPT = """
+import sys
+def peak_rss():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+"""
+_STARTUP_SCRIPT = _PEAK_RSS_SCRIPT + """
+import json
+from {package}.cli import cli
+try:
+    cli({args!r}, standalone_mode=False)
+except SystemExit:
+    pass
+print(json.dumps({{'heavy': [m for m in {heavy!r} if m in sys.modules], 'rss': peak_rss()}}))
+"""
+HIERARCHY_CELLS = 32
+
+
+def _read_status(field: str) -> Optional[int]:
+    """A size field of /proc/self/status in bytes, where available"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS counter (Linux only)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _max_rss() -> int:
+    """Process peak resident set size in bytes since start (0 where unavailable, e.g. Windows)"""
+    try:
+        # Unix only, so imported here to keep the CLI importable everywhere
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure(fn: Callable[[], Dict]) -> Dict:
+    """Run `fn`, adding the peak resident memory reached while it ran
+
+    On Linux the kernel's high-water mark is reset before the call, so
+    `peak_rss_bytes` is specific to this benchmark; elsewhere it is the
+    process peak so far. `rss_before_bytes` is the baseline, so the
+    difference is what the benchmark itself needed. Memory is sampled
+    from the OS rather than traced, so timings are not distorted.
+    """
+    reset = _reset_peak_rss()
+    before = _read_status('VmRSS')
+    result = fn()
+    peak = _read_status('VmHWM') if reset else None
+    result['peak_rss_bytes'] = peak if peak is not None else _max_rss()
+    result['rss_before_bytes'] = before if before is not None else 0
+    return result
+
+
+def _timed(fn: Callable[[], None], repeat: int) -> float:
+    """Mean seconds per call over `repeat` calls"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def _history(sensor: 'EnhancedSensor', hours: int):
+    """Fill a sensor's history without training"""
+    for hour in range(hours):
+        sensor.generate_temperature(hour, train=False)
+
+
+def bench_network(quick: bool = False) -> List[Dict]:
+    """Hours per second of EnhancedFederatedNetwork.update vs sensor count"""
+    from .network.federation import EnhancedFederatedNetwork
+    from .visualization.plotter import NetworkPlotter
+    hours = 24 if quick else 72
+    results = []
+    cases = [('sensors', n) for n in SENSOR_COUNTS[:2 if quick else None]]
+    cases += [('fleet', n) for n in FLEET_SIZES[:1 if quick else None]]
+    for mode, count in cases:
+        def run():
+            specs = build_topology(count, seed=0)
+            plotter = NetworkPlotter(headless=True, render_every=hours + 1)
+            if mode == 'fleet':
+                network = EnhancedFederatedNetwork(fleet=build_fleet(specs, seed=0), plotter=plotter)
+            else:
+                network = EnhancedFederatedNetwork(sensors=build_sensors(specs), plotter=plotter)
+            started = time.perf_counter()
+            for hour in range(hours):
+                network.update(hour)
+            elapsed = time.perf_counter() - started
+            plotter.close()
+            return {'hours_per_sec': hours / elapsed,
+                    'sensor_hours_per_sec': hours * count / elapsed}
+
+        results.append(dict(benchmark='network_update', mode=mode, sensors=count, hours=hours,
+                            **measure(run)))
+    return results
+
+
+def bench_predictor(quick: bool = False) -> List[Dict]:
+    """PatternPredictor.train / predict latency vs history length"""
+    from .core.models import PatternPredictor
+    repeat = 5 if quick else 20
+    results = []
+    for length in HISTORY_LENGTHS[:2 if quick else None]:
+        data = np.random.default_rng(0).normal(22, 3, length)
+
+        def run():
+            predictor = PatternPredictor()
+            return {'train_seconds': _timed(lambda: predictor.train(data), repeat),
+                    'predict_seconds': _timed(lambda: predictor.predict(data), repeat * 10)}
+
+        results.append(dict(benchmark='predictor', history_length=length, **measure(run)))
+    return results
+
+
+def bench_learn_patterns(quick: bool = False) -> List[Dict]:
+    """EnhancedSensor.learn_patterns cost for rolling and recomputed windows"""
+    from .core.sensor import EnhancedSensor
+    repeat = 200 if quick else 2000
+    results = []
+    for window in (24, 168, 100):
+        def run():
+            sensor = EnhancedSensor("bench", (0, 0), 'factory')
+            _history(sensor, 400)
+            return {'seconds_per_call': _timed(lambda: sensor.learn_patterns(window), repeat),
+                    'rolling': sensor.rolling.ready(window)}
+
+        results.append(dict(benchmark='learn_patterns', window=window, **measure(run)))
+    return results
+
+
+def bench_events(quick: bool = False) -> List[Dict]:
+    """SensorPattern event impact throughput, per call and vectorized"""
+    hours = 8760 if quick else 87600
+
+    def scalar():
+        pattern = SensorPattern('factory', seed=0)
+        count = hours // 10
+        seconds = _timed(lambda: [pattern.get_event_impact(h) for h in range(count)], 1)
+        return {'impacts_per_sec': count / seconds}
+
+    def vectorized():
+        pattern = SensorPattern('factory', seed=0)
+        seconds = _timed(lambda: pattern.get_event_impacts(np.arange(hours)), 5)
+        return {'impacts_per_sec': hours / seconds}
+
+    return [dict(benchmark='event_impact', mode='scalar', **measure(scalar)),
+            dict(benchmark='event_impact', mode='vectorized', hours=hours, **measure(vectorized))]
+
+
+def bench_privacy(quick: bool = False) -> List[Dict]:
+    """PrivacyMetrics update and query cost after many readings"""
+    results = []
+    for readings in PRIVACY_READINGS[:1 if quick else None]:
+        def run():
+            metrics = PrivacyMetrics()
+            for i in range(readings):
+                metrics.update(20.0, i % 2 == 0)
+            return {'seconds_per_update': _timed(lambda: metrics.update(20.0, True), 1000),
+                    'seconds_per_query': _timed(metrics.analyze_sharing_patterns, 1000)}
+
+        results.append(dict(benchmark='privacy', readings=readings, **measure(run)))
+    return results
+
+
+def bench_privatization(quick: bool = False) -> List[Dict]:
+    """Batched DP pattern release cost, and its error against the true statistics, vs epsilon"""
+    from .network.privatization import DEFAULT_BOUNDS, MECHANISMS, PATTERN_FIELDS, Privatizer
+    fleet = build_fleet(build_topology(PRIVATIZATION_SENSORS, seed=0), seed=0)
+    stats, peaks = [], []
+    for hour in range(48):
+        fleet.step(hour)
+        if hour >= 24:
+            stats.append(np.stack([fleet.pattern_stats[field] for field in PATTERN_FIELDS], axis=1))
+            peaks.append(fleet.peak_mask.T.copy())
+    stats, peaks = np.concatenate(stats), np.concatenate(peaks)
+
+    # Errors are in units of each statistic's bound width, averaged over statistics
+    low, high = (np.array(side) for side in zip(*(DEFAULT_BOUNDS[field] for field in PATTERN_FIELDS)))
+    # Always reporting the middle of the bounds reveals nothing; noisier releases are worse than that
+    midpoint_error = float(np.mean(np.abs((low + high) / 2 - stats) / (high - low)))
+    results = []
+    for mechanism in MECHANISMS:
+        for epsilon in PRIVATIZATION_EPSILONS[:1 if quick else None]:
+            privatizer = Privatizer(mechanism, pattern_epsilon=epsilon, seed=0)
+
+            def run():
+                noisy, noisy_peaks = privatizer.privatize_stats(stats, peaks)
+                return {'seconds_per_call': _timed(lambda: privatizer.privatize_stats(stats, peaks), 10),
+                        'stats_error': float(np.mean(np.abs(noisy - stats) / (high - low))),
+                        'peak_flip_rate': float(np.mean(noisy_peaks != peaks))}
+
+            results.append(dict(benchmark='privatization', mechanism=mechanism, epsilon=epsilon,
+                                releases=len(stats), midpoint_error=midpoint_error, **measure(run)))
+    return results
+
+
+def bench_hierarchy(quick: bool = False) -> List[Dict]:
+    """Federation round latency and memory, flat vs edge-aggregated, vs fleet size"""
+    from .network.federation import EnhancedFederatedNetwork
+    from .network.hierarchy import CellHierarchy
+    from .network.rounds import FederationEngine
+    from .visualization.plotter import NetworkPlotter
+    rounds = 3 if quick else 10
+    results = []
+    for count in HIERARCHY_SIZES[:1 if quick else None]:
+        specs = build_topology(count, layout='grid', seed=0)
+        for mode in ('flat', 'hierarchical'):
+            hierarchy = CellHierarchy(num_cells=HIERARCHY_CELLS, seed=0) if mode == 'hierarchical' else None
+            engine = FederationEngine(hierarchy=hierarchy, seed=0)
+            plotter = NetworkPlotter(headless=True, render_every=1_000_000)
+            network = EnhancedFederatedNetwork(fleet=build_fleet(specs, seed=0), plotter=plotter)
+            for hour in range(2):
+                network.update(hour)
+
+            def run():
+                engine.run_round(network, 0)  # assigns cells and starts the edge workers
+                return {'round_seconds': _timed(lambda: engine.run_round(network, 0), rounds)}
+
+            result = dict(benchmark='hierarchy', mode=mode, sensors=count, **measure(run))
+            if hierarchy is not None:
+                result['cells'] = engine.rounds[-1]['cells']
+                hierarchy.close()
+            plotter.close()
+            results.append(result)
+    return results
+
+
+def bench_scheduler(quick: bool = False) -> List[Dict]:
+    """Network throughput and accuracy, training every hour vs adaptively scheduled"""
+    from .core.inference import FleetInference
+    from .network.federation import EnhancedFederatedNetwork
+    from .visualization.plotter import NetworkPlotter
+    hours = 120 if quick else 240
+    results = []
+    cases = [('fleet', n) for n in FLEET_SIZES[:1 if quick else None]]
+    cases += [('sensors', SCHEDULER_SENSORS)]
+    for kind, count in cases:
+        baseline = None
+        for mode in ('always', 'adaptive'):
+            scheduler = TrainingScheduler() if mode == 'adaptive' else None
+
+            def run():
+                specs = build_topology(count, seed=0)
+                plotter = NetworkPlotter(headless=True, render_every=hours + 1)
+                if kind == 'fleet':
+                    network = EnhancedFederatedNetwork(fleet=build_fleet(specs, seed=0),
+                                                       plotter=plotter, scheduler=scheduler)
+                    histories = [network.fleet.accuracy_history]
+                else:
+                    # Both modes forecast every hour, so accuracy is tracked the same way
+                    sensors = build_sensors(specs)
+                    network = EnhancedFederatedNetwork(
+                        sensors=sensors, plotter=plotter, scheduler=scheduler,
+                        inference=FleetInference([s.predictor for s in sensors]))
+                    histories = [s.accuracy_history for s in sensors]
+                started = time.perf_counter()
+                for hour in range(hours):
+                    network.update(hour)
+                elapsed = time.perf_counter() - started
+                plotter.close()
+                # Accuracy averaged over the last day, once models have settled
+                return {'hours_per_sec': hours / elapsed,
+                        'accuracy': float(np.mean([history.last(24) for history in histories]))}
+
+            result = dict(benchmark='scheduler', network=kind, mode=mode, sensors=count, hours=hours,
+                          **measure(run))
+            if scheduler is None:
+                baseline = result['accuracy']
+            else:
+                result['compute_saved'] = scheduler.report()['compute_saved']
+                result['accuracy_lost'] = baseline - result['accuracy']
+            results.append(result)
+    return results
+
+
+def bench_anomaly(quick: bool = False) -> List[Dict]:
+    """Per-tick anomaly scoring cost vs fleet size, and detection of injected spikes"""
+    from .core.dataset import SyntheticDataset
+    hours = 120 if quick else 240
+    results = []
+    for count in ANOMALY_SIZES[:1 if quick else None]:
+        dataset = SyntheticDataset([('factory', 'office', 'outdoor')[i % 3] for i in range(count)], seed=0)
+        clean = dataset.generate(hours)
+        # Spikes of 12 noise standard deviations once the detector is warm
+        rng = np.random.default_rng(0)
+        detector = AnomalyDetector()
+        spikes = rng.random(clean.shape) < 0.002
+        spikes[:detector.warmup] = False
+        readings = clean + spikes * rng.choice([-6.0, 6.0], clean.shape)
+
+        def run():
+            detector.set_events(dataset.event_impact, dataset.event_counts)
+            hits = false_alerts = 0
+            elapsed = 0.0
+            for hour in range(hours):
+                # Persistence forecasts of the clean series, so a spike is not carried into the next hour
+                started = time.perf_counter()
+                alerts = detector.update(hour, readings[hour], clean[hour])
+                elapsed += time.perf_counter() - started
+                hits += int(spikes[hour, alerts].sum())
+                false_alerts += int((~spikes[hour, alerts]).sum())
+            return {'seconds_per_update': elapsed / hours,
+                    'recall': hits / max(1, int(spikes.sum())),
+                    'false_alert_rate': false_alerts / ((hours - detector.warmup) * count)}
+
+        results.append(dict(benchmark='anomaly', sensors=count, hours=hours, **measure(run)))
+    return results
+
+
+def _write_replay(path: str, data_format: str, temps: np.ndarray):
+    """Write (hours, sensors) readings as `.npy` or as a long CSV with one row per reading"""
+    if data_format == 'npy':
+        np.save(path, temps)
+        return
+    hours, sensors = np.indices(temps.shape)
+    with open(path, 'w') as f:
+        f.write('timestamp,sensor,value\n')
+        for hour, sensor, value in zip(hours.ravel().tolist(), sensors.ravel().tolist(), temps.ravel().tolist()):
+            f.write(f"{hour * 3600},s{sensor},{value:.3f}\n")
+
+
+def bench_replay(quick: bool = False) -> List[Dict]:
+    """Replay ingestion throughput: reading and aligning recorded files into hourly ticks"""
+    hours = 168 if quick else 720
+    temps = np.random.default_rng(0).normal(20.0, 3.0, (hours, REPLAY_SENSORS))
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for data_format in REPLAY_FORMATS[:1 if quick else None]:
+            path = os.path.join(directory, f"replay.{data_format}")
+            _write_replay(path, data_format, temps)
+
+            def run():
+                # Includes the long CSV's scan for sensor names
+                started = time.perf_counter()
+                source = ReplaySource(path, chunk_hours=64, chunk_rows=64 * REPLAY_SENSORS)
+                ticks = sum(1 for _ in source)
+                elapsed = time.perf_counter() - started
+                return {'sensor_hours_per_sec': ticks * source.size / elapsed,
+                        'wait_seconds': source.stats()['wait_seconds']}
+
+            results.append(dict(benchmark='replay', format=data_format, sensors=REPLAY_SENSORS,
+                                hours=hours, **measure(run)))
+    return results
+
+
+def _run_python(script: str, importtime: bool = False):
+    """Run `script` in a fresh interpreter that can import this package
+
+    Returns the wall time, the last line of stdout and stderr.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', script]
+    started = time.perf_counter()
+    done = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - started
+    lines = done.stdout.strip().splitlines()
+    return elapsed, lines[-1] if lines else '', done.stderr
+
+
+def _import_seconds(importtime_log: str, module: str) -> float:
+    """Cumulative import time of `module` from `python -X importtime` output"""
+    for line in importtime_log.splitlines():
+        if line.startswith('import time:') and line.rsplit('|', 1)[-1].strip() == module:
+            return int(line.split('|')[1]) / 1e6
+    return 0.0
+
+
+def bench_startup(quick: bool = False) -> List[Dict]:
+    """CLI start-up latency, import time and memory per command, in fresh interpreters"""
+    repeat = 3 if quick else 7
+    package = __package__ or 'src'
+    _, baseline, _ = _run_python(_PEAK_RSS_SCRIPT + "print(peak_rss())")
+    results = []
+    for args in STARTUP_COMMANDS[:2 if quick else None]:
+        script = _STARTUP_SCRIPT.format(package=package, args=list(args), heavy=HEAVY_MODULES)
+        runs = [_run_python(script, importtime=True) for _ in range(repeat)]
+        report = json.loads(runs[-1][1])
+        results.append({
+            'benchmark': 'startup',
+            'command': ' '.join(args),
+            # Best of the runs, the least disturbed by other load
+            'startup_seconds': min(elapsed for elapsed, _, _ in runs),
+            'import_seconds': min(_import_seconds(log, f'{package}.cli') for _, _, log in runs),
+            'heavy_modules': ','.join(report['heavy']),
+            'peak_rss_bytes': report['rss'],
+            'rss_before_bytes': int(baseline)
+        })
+    return results
+
+
+def bench_plotting(quick: bool = False) -> List[Dict]:
+    """NetworkPlotter.update_plots cost with rendering off, headless and on a display"""
+    import matplotlib
+    from .visualization.plotter import NetworkPlotter
+    frames = 5 if quick else 20
+    results = []
+    for count in PLOT_SENSORS[:1 if quick else None]:
+        sensors = build_sensors(build_topology(count, seed=0))
+        for sensor in sensors:
+            _history(sensor, 48)
+            sensor.learn_patterns()
+            sensor.privacy.update(sensor.temperature_history[-1], True)
+
+        for mode in ('off', 'headless', 'display'):
+            def run():
+                if mode == 'display':
+                    plotter = NetworkPlotter()
+                else:
+                    plotter = NetworkPlotter(headless=True,
+                                             render_every=frames + 1 if mode == 'off' else 1)
+                plotter.update_plots(sensors, 0)  # first frame creates the artists
+                seconds = _timed(lambda: plotter.update_plots(sensors, 1), frames)
+                plotter.close()
+                return {'seconds_per_frame': seconds}
+
+            result = dict(benchmark='plotting', mode=mode, sensors=count, **measure(run))
+            if mode == 'display':
+                result['backend'] = matplotlib.get_backend()
+            results.append(result)
+    return results
+
+
+BENCHMARKS: Dict[str, Callable[[bool], List[Dict]]] = {
+    'network': bench_network,
+    'predictor': bench_predictor,
+    'learn_patterns': bench_learn_patterns,
+    'events': bench_events,
+    'privacy': bench_privacy,
+    'privatization': bench_privatization,
+    'hierarchy': bench_hierarchy,
+    'scheduler': bench_scheduler,
+    'anomaly': bench_anomaly,
+    'replay': bench_replay,
+    'startup': bench_startup,
+    'plotting': bench_plotting
+}
+
+
+def _version() -> str:
+    try:
+        from importlib.metadata import version
+        return version('federated-sensor-network')
+    except Exception:
+        return 'unknown'
+
+
+def run_benchmarks(names: Optional[Sequence[str]] = None, quick: bool = False,
+                   progress: Optional[Callable[[str], None]] = None) -> Dict:
+    """Run the selected benchmarks (all by default) and return a JSON-ready report"""
+    import torch
+    names = list(names) if names else list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(sorted(unknown))}. "
+                         f"Choose from: {', '.join(BENCHMARKS)}")
+
+    np.random.seed(0)
+    torch.manual_seed(0)
+    results = []
+    for name in names:
+        if progress is not None:
+            progress(name)
+        results.extend(BENCHMARKS[name](quick))
+
+    return {
+        'version': _version(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'quick': quick,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'torch': torch.__version__,
+            'threads': torch.get_num_threads()
+        },
+        'results': results
+    }
+
+
+def write_results(report: Dict, path: str):
+    """Write a report from `run_benchmarks` as JSON"""
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+# Metrics where larger is better; every other timing metric is smaller-is-better
+_HIGHER_IS_BETTER = ('hours_per_sec', 'sensor_hours_per_sec', 'impacts_per_sec')
+_METRICS = _HIGHER_IS_BETTER + ('train_seconds', 'predict_seconds', 'seconds_per_call',
+                                'seconds_per_frame', 'seconds_per_update', 'seconds_per_query',
+                                'round_seconds', 'startup_seconds', 'import_seconds',
+                                'peak_rss_bytes')
+
+# Other measured values, which are not part of a result's identity
+_OUTCOMES = ('rss_before_bytes', 'rolling', 'backend', 'accuracy', 'compute_saved', 'accuracy_lost',
+             'heavy_modules', 'recall', 'false_alert_rate', 'wait_seconds',
+             'stats_error', 'midpoint_error', 'peak_flip_rate')
+
+
+def _key(result: Dict) -> tuple:
+    """Identity of a result: benchmark name plus its parameters"""
+    return tuple(sorted((k, v) for k, v in result.items()
+                        if k not in _METRICS and k not in _OUTCOMES))
+
+
+def compare_results(baseline: Dict, current: Dict) -> List[Dict]:
+    """Per-metric change between two reports
+
+    `speedup` is > 1 when `current` is better, whichever direction the
+    metric runs.
+    """
+    previous = {_key(r): r for r in baseline['results']}
+    rows = []
+    for result in current['results']:
+        before = previous.get(_key(result))
+        if before is None:
+            continue
+        for metric in _METRICS:
+            if metric in result and metric in before and result[metric] and before[metric]:
+                ratio = result[metric] / before[metric]
+                rows.append({
+                    'case': ', '.join(f"{k}={v}" for k, v in _key(result)),
+                    'metric': metric,
+                    'baseline': before[metric],
+                    'current': result[metric],
+                    'speedup': ratio if metric in _HIGHER_IS_BETTER else 1 / ratio
+                })
+    return rows
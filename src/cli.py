@@ -1,10 +1,22 @@
 #!/usr/bin/env python3
+import functools
+import json
 import click
-from rich.console import Console
-from .network.federation import EnhancedFederatedNetwork
-from .visualization.console import NetworkConsole
+from .benchmark import BENCHMARKS
+from .network.privatization import MECHANISMS
+from .network.topology import LAYOUTS
+from .storage.replay import FORMATS
 
-console = Console()
+# Only what the option definitions need is imported here. Each command
+# imports its own dependencies, so `--help`, `info` and other light
+# commands start without loading torch, matplotlib or rich.
+
+
+@functools.lru_cache(maxsize=None)
+def _console():
+    """Shared rich console, created on first output"""
+    from rich.console import Console
+    return Console()
 
 
 @click.group()
@@ -18,16 +30,93 @@ def cli():
 @click.option('--sensors', default=3, help='Number of sensors')
 @click.option('--interval', default=0.2, help='Update interval in seconds')
 @click.option('--output', default=None, help='Output directory for results')
-def run(hours, sensors, interval, output):
+@click.option('--headless', is_flag=True, help='Render off-screen without a display')
+@click.option('--render-every', default=1, help='Render the plots every N simulated hours')
+@click.option('--record', default=None, help='Directory to stream per-hour metrics to')
+@click.option('--layout', type=click.Choice(LAYOUTS), default='line', help='Sensor placement')
+@click.option('--topology', default=None, help='JSON topology file (overrides --sensors/--layout)')
+@click.option('--fleet', is_flag=True, help='Step all sensors as one batched fleet')
+@click.option('--seed', default=None, type=int, help='Random seed for topology and fleet')
+@click.option('--checkpoint', default=None, help='Directory for periodic resumable snapshots')
+@click.option('--checkpoint-every', default=24, help='Simulated hours between snapshots')
+@click.option('--instrument', is_flag=True, help='Time each update phase and show a live table')
+@click.option('--trace-out', default=None, help='Chrome trace JSON of recorded phases')
+@click.option('--metrics-out', default=None, help='Prometheus text file of phase latencies')
+@click.option('--profile-hours', default=None, help='START:COUNT hours to capture with a profiler')
+@click.option('--torch-profile', is_flag=True, help='Use the torch profiler instead of cProfile')
+@click.option('--profile-out', default=None, help='Profiler output file')
+@click.option('--dp-epsilon', default=None, type=float,
+              help='Share patterns with differential privacy at this epsilon per release')
+@click.option('--dp-mechanism', type=click.Choice(MECHANISMS), default='gaussian',
+              help='Noise mechanism for --dp-epsilon')
+@click.option('--train-threshold', default=None, type=float,
+              help='Only train sensors whose smoothed relative error exceeds this (or that drift)')
+@click.option('--train-budget', default=None, type=int,
+              help='At most this many sensors train per hour, worst first')
+@click.option('--anomaly-threshold', default=None, type=float,
+              help='Score every reading for anomalies and alert above this score')
+def run(hours, sensors, interval, output, headless, render_every, record,
+        layout, topology, fleet, seed, checkpoint, checkpoint_every,
+        instrument, trace_out, metrics_out, profile_hours, torch_profile, profile_out,
+        dp_epsilon, dp_mechanism, train_threshold, train_budget, anomaly_threshold):
     """Run a federated sensor network simulation"""
+    from .core.anomaly import AnomalyDetector
+    from .core.instrumentation import Instrumentation
+    from .core.scheduler import TrainingScheduler
+    from .network.federation import EnhancedFederatedNetwork
+    from .network.privatization import Privatizer
+    from .network.topology import (DEFAULT_TOPOLOGY, build_fleet, build_sensors,
+                                   build_topology, load_topology)
+    from .storage.checkpoint import Checkpointer
+    from .storage.recorder import MetricsRecorder
+    from .visualization.console import NetworkConsole
+    from .visualization.plotter import NetworkPlotter
+
+    network_console = NetworkConsole()
     try:
-        network = EnhancedFederatedNetwork()
-        network_console = NetworkConsole()
+        if topology is not None:
+            specs = load_topology(topology)
+        elif sensors == 3 and layout == 'line':
+            specs = DEFAULT_TOPOLOGY
+        else:
+            specs = build_topology(sensors, layout=layout, seed=seed)
+
+        plotter = NetworkPlotter(headless=headless, render_every=render_every)
+        recorder = MetricsRecorder(record) if record else None
+        checkpointer = None
+        if checkpoint:
+            options = {'hours': hours, 'interval': interval, 'output': output, 'headless': headless,
+                       'render_every': render_every, 'record': record, 'every': checkpoint_every}
+            checkpointer = Checkpointer(checkpoint, every=checkpoint_every, metadata=options)
+        instrumentation = None
+        if instrument or trace_out or metrics_out or profile_hours:
+            start, count = (int(v) for v in profile_hours.split(':')) if profile_hours else (None, 1)
+            instrumentation = Instrumentation(
+                profile_start=start, profile_hours=count, profile_path=profile_out,
+                torch_profile=torch_profile, chrome_trace_path=trace_out,
+                prometheus_path=metrics_out, export_every=24)
+        privatizer = None
+        if dp_epsilon is not None:
+            privatizer = Privatizer(dp_mechanism, pattern_epsilon=dp_epsilon, seed=seed)
+        scheduler = None
+        if train_threshold is not None or train_budget is not None:
+            options = {'budget': train_budget}
+            if train_threshold is not None:
+                options['error_threshold'] = train_threshold
+            scheduler = TrainingScheduler(**options)
+        detector = AnomalyDetector(anomaly_threshold) if anomaly_threshold is not None else None
+        components = dict(plotter=plotter, recorder=recorder, checkpointer=checkpointer,
+                          instrumentation=instrumentation, privatizer=privatizer,
+                          scheduler=scheduler, detector=detector)
+        if fleet:
+            network = EnhancedFederatedNetwork(fleet=build_fleet(specs, seed=seed), **components)
+        else:
+            network = EnhancedFederatedNetwork(sensors=build_sensors(specs), **components)
 
         network_console.print_simulation_header()
 
         # Run simulation
-        network.run_simulation(hours)
+        network.run_simulation(hours, interval, monitor=network_console if instrument else None)
 
         # Save results if output specified
         if output:
@@ -38,9 +127,201 @@ def run(hours, sensors, interval, output):
         raise
 
 
+@cli.command()
+@click.argument('directory')
+@click.option('--hours', default=None, type=int, help='New total number of hours (default: as started)')
+@click.option('--snapshot', default=None, help='Snapshot file to resume from (default: latest)')
+def resume(directory, hours, snapshot):
+    """Continue a checkpointed simulation exactly where its snapshot left off"""
+    from .network.federation import EnhancedFederatedNetwork
+    from .storage.checkpoint import Checkpointer, load_checkpoint
+    from .storage.recorder import MetricsRecorder
+    from .visualization.console import NetworkConsole
+    from .visualization.plotter import NetworkPlotter
+
+    network_console = NetworkConsole()
+    try:
+        options = load_checkpoint(directory, snapshot)['metadata']
+        hours = hours if hours is not None else options['hours']
+        plotter = NetworkPlotter(headless=options['headless'], render_every=options['render_every'])
+        recorder = MetricsRecorder(options['record']) if options['record'] else None
+        checkpointer = Checkpointer(directory, every=options['every'], metadata=dict(options, hours=hours))
+
+        network = EnhancedFederatedNetwork.from_checkpoint(directory, snapshot, plotter=plotter,
+                                                           recorder=recorder, checkpointer=checkpointer)
+        network_console.console.print(f"[yellow]Resuming at hour {network.current_hour + 1}[/yellow]")
+        network.run_simulation(hours, options['interval'], start_hour=network.current_hour + 1)
+
+        if options['output']:
+            network.plotter.save(f"{options['output']}/simulation_final.png")
+
+    except Exception as e:
+        network_console.print_error(e)
+        raise
+
+
+@cli.command()
+@click.option('--clients', default=10, help='Number of simulated sensor clients')
+@click.option('--hours', default=48, help='Hours simulated by each client')
+@click.option('--transport', type=click.Choice(['queue', 'tcp']), default='queue',
+              help='In-process queues or TCP on localhost')
+@click.option('--round-period', default=0.5, help='Seconds between federation rounds')
+@click.option('--deadline', default=0.25, help='Round deadline in seconds')
+@click.option('--stragglers', default=0.0, help='Fraction of clients that reply late')
+@click.option('--hour-interval', default=0.01, help='Seconds each client waits between readings')
+def loadtest(clients, hours, transport, round_period, deadline, stragglers, hour_interval):
+    """Load-test the asyncio federation coordinator with local clients"""
+    from rich.table import Table
+    from .network.loadtest import run_load_test
+    console = _console()
+
+    results = run_load_test(clients, hours, transport, round_period=round_period,
+                            round_deadline=deadline, hour_interval=hour_interval,
+                            straggler_fraction=stragglers)
+
+    table = Table(title="Federation Load Test")
+    table.add_column("Metric")
+    table.add_column("Value")
+    for key, value in results.items():
+        table.add_row(key, f"{value:.4g}" if isinstance(value, float) else str(value))
+    console.print(table)
+
+
+@cli.command()
+@click.argument('path')
+@click.option('--hours', default=8760, help='Hours of readings per sensor')
+@click.option('--sensors', default=3, help='Number of sensors')
+@click.option('--layout', type=click.Choice(LAYOUTS), default='line', help='Sensor placement')
+@click.option('--topology', default=None, help='JSON topology file (overrides --sensors/--layout)')
+@click.option('--chunk-hours', default=8760, help='Hours generated per vectorized chunk')
+@click.option('--seed', default=None, type=int, help='Random seed for topology and readings')
+def generate(path, hours, sensors, layout, topology, chunk_hours, seed):
+    """Write a synthetic (hours x sensors) temperature corpus to a .npy file"""
+    from .core.dataset import SyntheticDataset
+    from .network.topology import build_topology, load_topology
+    console = _console()
+
+    specs = load_topology(topology) if topology is not None else build_topology(
+        sensors, layout=layout, seed=seed)
+    dataset = SyntheticDataset([s.pattern_type for s in specs], seed=seed,
+                               names=[s.name for s in specs])
+    data = dataset.to_memmap(path, hours, chunk_hours)
+    console.print(f"Wrote {data.shape[0]} hours x {data.shape[1]} sensors to {path}")
+
+
+@cli.command()
+@click.argument('path')
+@click.option('--format', 'data_format', type=click.Choice(FORMATS), default=None,
+              help='Input format (default: from the path)')
+@click.option('--hours', default=None, type=int, help='Stop before this hour (default: end of the data)')
+@click.option('--start-hour', default=0, help='Skip recorded hours before this one')
+@click.option('--realtime-factor', default=None, type=float,
+              help='Simulated seconds per wall-clock second (default: as fast as possible)')
+@click.option('--chunk-hours', default=1024, help='Hours read per block from .npy files and recordings')
+@click.option('--prefetch', default=4, help='Blocks read ahead on the background reader')
+@click.option('--layout', type=click.Choice(LAYOUTS), default='line', help='Sensor placement')
+@click.option('--topology', default=None, help='JSON topology file, one sensor per data column in order')
+@click.option('--fleet', is_flag=True, help='Step all sensors as one batched fleet')
+@click.option('--seed', default=None, type=int, help='Random seed for topology and fleet')
+@click.option('--headless', is_flag=True, help='Render off-screen without a display')
+@click.option('--render-every', default=24, help='Render the plots every N replayed hours')
+@click.option('--record', default=None, help='Directory to stream per-hour metrics to')
+@click.option('--anomaly-threshold', default=None, type=float,
+              help='Score every reading for anomalies and alert above this score')
+def replay(path, data_format, hours, start_hour, realtime_factor, chunk_hours, prefetch,
+           layout, topology, fleet, seed, headless, render_every, record, anomaly_threshold):
+    """Run the network over recorded readings from a .npy, CSV or recording directory"""
+    from .core.anomaly import AnomalyDetector
+    from .network.federation import EnhancedFederatedNetwork
+    from .network.topology import build_fleet, build_sensors, build_topology, load_topology
+    from .storage.recorder import MetricsRecorder
+    from .storage.replay import ReplaySource
+    from .visualization.console import NetworkConsole
+    from .visualization.plotter import NetworkPlotter
+
+    network_console = NetworkConsole()
+    try:
+        source = ReplaySource(path, data_format, chunk_hours=chunk_hours, prefetch=prefetch,
+                              realtime_factor=realtime_factor)
+        if topology is not None:
+            specs = load_topology(topology)
+            if len(specs) != source.size:
+                raise ValueError(f"Topology has {len(specs)} sensors but the data has {source.size}")
+        else:
+            # Pattern types only shape the expected events; names come from the data
+            specs = [spec._replace(name=name) for spec, name in
+                     zip(build_topology(source.size, layout=layout, seed=seed), source.names)]
+
+        components = dict(
+            plotter=NetworkPlotter(headless=headless, render_every=render_every),
+            recorder=MetricsRecorder(record) if record else None,
+            detector=AnomalyDetector(anomaly_threshold) if anomaly_threshold is not None else None)
+        if fleet:
+            network = EnhancedFederatedNetwork(fleet=build_fleet(specs, seed=seed), **components)
+        else:
+            network = EnhancedFederatedNetwork(sensors=build_sensors(specs), **components)
+
+        network_console.console.print(f"[yellow]Replaying {source.size} sensors from {path}[/yellow]")
+        network.run_simulation(hours, start_hour=start_hour, source=source)
+        stats = source.stats()
+        network_console.console.print(
+            f"Replayed {stats['ticks']} hours; read {stats['read_seconds']:.2f}s, "
+            f"waited {stats['wait_seconds']:.2f}s for data, dropped {stats['late_rows']} late rows")
+
+    except Exception as e:
+        network_console.print_error(e)
+        raise
+
+
+@cli.command()
+@click.option('--output', default='bench.json', help='JSON file for the results')
+@click.option('--only', multiple=True, type=click.Choice(list(BENCHMARKS)),
+              help='Run only these benchmarks (repeatable)')
+@click.option('--quick', is_flag=True, help='Smaller parameter grids for a fast check')
+@click.option('--compare', default=None, help='Earlier results JSON to compare against')
+def bench(output, only, quick, compare):
+    """Benchmark simulation, training, pattern, plotting and start-up hot paths"""
+    from rich.table import Table
+    from .benchmark import compare_results, run_benchmarks, write_results
+    console = _console()
+
+    report = run_benchmarks(only, quick, progress=lambda name: console.print(f"[cyan]Running {name}...[/cyan]"))
+    write_results(report, output)
+
+    table = Table(title=f"FedSense Benchmarks ({report['version']})")
+    table.add_column("Benchmark")
+    table.add_column("Case")
+    table.add_column("Result")
+    table.add_column("Peak RSS", justify="right")
+    for result in report['results']:
+        params = {k: v for k, v in result.items() if k != 'benchmark' and not isinstance(v, float)
+                  and not k.endswith('_bytes')}
+        metrics = {k: v for k, v in result.items() if isinstance(v, float)}
+        table.add_row(result['benchmark'],
+                      ', '.join(f"{k}={v}" for k, v in params.items()),
+                      ', '.join(f"{k}={v:.4g}" for k, v in metrics.items()),
+                      f"{result['peak_rss_bytes'] / 2 ** 20:.0f} MiB "
+                      f"(+{(result['peak_rss_bytes'] - result['rss_before_bytes']) / 2 ** 20:.0f})")
+    console.print(table)
+    console.print(f"Results written to {output}")
+
+    if compare:
+        with open(compare) as f:
+            baseline = json.load(f)
+        diff = Table(title=f"Change vs {compare}")
+        diff.add_column("Case")
+        diff.add_column("Metric")
+        diff.add_column("Speedup", justify="right")
+        for row in compare_results(baseline, report):
+            style = "green" if row['speedup'] >= 1 else "red"
+            diff.add_row(row['case'], row['metric'], f"[{style}]{row['speedup']:.2f}x[/{style}]")
+        console.print(diff)
+
+
 @cli.command()
 def info():
     """Display information about the system"""
+    console = _console()
     console.print("""
 [bold blue]Federated Sensor Network (FedSense)[/bold blue]
 
@@ -63,8 +344,30 @@ def info():
   # Run extended simulation
   fedsense run --hours 200 --sensors 5
 
+  # Large batched fleet on a grid, without a display
+  fedsense run --sensors 1000 --layout grid --fleet --headless --interval 0
+
   # Save results
   fedsense run --output ./results
+
+  # Live per-phase latency table, with trace and Prometheus exports
+  fedsense run --instrument --trace-out trace.json --metrics-out metrics.prom
+
+  # Profile hours 50-59 with cProfile
+  fedsense run --profile-hours 50:10 --profile-out run.prof
+
+  # Differentially private pattern sharing, epsilon 2 per release
+  fedsense run --dp-epsilon 2 --dp-mechanism laplace
+
+  # Measure performance and compare with an earlier run
+  fedsense bench --quick --output bench.json --compare baseline.json
+
+  # Snapshot every 24 hours, then continue after a crash or Ctrl-C
+  fedsense run --hours 1000 --checkpoint ./ckpt
+  fedsense resume ./ckpt
+
+  # Pre-generate a year of readings for 1000 sensors
+  fedsense generate corpus.npy --hours 8760 --sensors 1000 --seed 0
     """)
 
 
@@ -0,0 +1,232 @@
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from .history import HistoryBuffer
+
+HOURS_PER_DAY = 24
+
+# Columns of each row in the alert ring
+ALERT_FIELDS = ('hour', 'sensor', 'reading', 'score')
+
+# Standard deviation of one stochastic event's N(1, 0.2) impact
+_EVENT_STD = 0.2
+
+
+class AnomalyDetector:
+    """Streaming anomaly scores for every sensor, one vectorized pass per tick
+
+    Each reading is compared with three expectations, each as a z-score
+    against its own exponentially weighted variance:
+
+    - the residual of the forecast made for it by the sensor's predictor,
+    - a rolling mean over roughly the last `window` readings,
+    - the sensor's level plus an hour-of-day offset. Offsets start from the
+      impact of the sensor's known `SensorPattern` events (`set_events`), so
+      scheduled events are expected, and are refined over `baseline_days`.
+
+    The score is the mean absolute z of the available components and a
+    sensor alerts when it exceeds `threshold` after `warmup` readings.
+    Statistics are updated with deviations clipped to `threshold` standard
+    deviations, so a spike barely moves them while a lasting shift is
+    gradually absorbed. State is a fixed number of values per sensor plus
+    a ring of the last `capacity` alerts.
+    """
+
+    def __init__(self, threshold: float = 4.0, window: int = 24, baseline_days: int = 7,
+                 warmup: int = 72, noise_floor: float = 0.1, capacity: int = 1024):
+        if threshold <= 0:
+            raise ValueError("threshold must be positive")
+        if window < 1 or baseline_days < 1:
+            raise ValueError("window and baseline_days must be at least 1")
+        if noise_floor <= 0:
+            raise ValueError("noise_floor must be positive")
+        self.threshold = threshold
+        self.window = window
+        self.baseline_days = baseline_days
+        self.warmup = warmup
+        self.noise_floor = noise_floor
+        self.capacity = capacity
+
+        self.alerts = HistoryBuffer(capacity, shape=(len(ALERT_FIELDS),))
+        self.event_mean: Optional[np.ndarray] = None
+        self.event_var: Optional[np.ndarray] = None
+        self.ticks = 0
+        self.alerting = 0
+        self._resize(0)
+
+    def _resize(self, size: int):
+        self.size = size
+        self.seen = np.zeros(size, dtype=np.int64)
+        self.mean = np.zeros(size)
+        self.var = np.zeros(size)
+        self.level = np.zeros(size)
+        self.residual_seen = np.zeros(size, dtype=np.int64)
+        self.residual_var = np.zeros(size)
+        self.offset_seen = np.zeros((size, HOURS_PER_DAY), dtype=np.int64)
+        self.offset_var = np.zeros((size, HOURS_PER_DAY))
+        self.offset = np.zeros((size, HOURS_PER_DAY))
+        if self.event_mean is not None and len(self.event_mean) == size:
+            self.offset[:] = self.event_mean
+        self.forecast = np.full(size, np.nan)
+        self.scores = np.zeros(size)
+        self.alert_counts = np.zeros(size, dtype=np.int64)
+
+    def set_events(self, impact: np.ndarray, counts: np.ndarray):
+        """Seed hour-of-day offsets from (sensors, 24) `compile_event_tables` output
+
+        Offsets are relative to the daily mean, so only the shape of the
+        event schedule matters; hours the sensor has not yet seen keep
+        the event impact as their expectation.
+        """
+        expected = impact + counts
+        self.event_mean = expected - expected.mean(axis=1, keepdims=True)
+        self.event_var = _EVENT_STD ** 2 * counts
+        if len(impact) != self.size:
+            self._resize(len(impact))
+        else:
+            unseen = self.offset_seen == 0
+            self.offset[unseen] = self.event_mean[unseen]
+
+    def update(self, hour: int, readings: np.ndarray, forecasts: np.ndarray) -> np.ndarray:
+        """Score this tick's readings; returns the indices of alerting sensors
+
+        `forecasts` are the predictions made this tick for the next
+        reading (NaN where there is none); they are held and scored
+        against the readings of the following tick.
+        """
+        if len(readings) != self.size:
+            self._resize(len(readings))
+        rows = np.arange(self.size)
+        h = hour % HOURS_PER_DAY
+        floor = self.noise_floor ** 2
+        warm = self.seen >= self.warmup
+
+        # Forecast residual
+        residual = readings - self.forecast
+        scored = ~np.isnan(residual)
+        residual = np.where(scored, residual, 0.0)
+        z_residual = residual / np.sqrt(self.residual_var + floor)
+        has_residual = scored & (self.residual_seen > 1)
+
+        # Rolling z-score
+        deviation = readings - self.mean
+        z_rolling = deviation / np.sqrt(self.var + floor)
+
+        # Level plus hour-of-day offset, falling back to the rolling variance for unseen hours
+        offset_seen = self.offset_seen[:, h]
+        offset_var = np.where(offset_seen > 1, self.offset_var[:, h], self.var)
+        if self.event_var is not None:
+            offset_var = offset_var + self.event_var[:, h]
+        seasonal = readings - self.level - self.offset[:, h]
+        z_hour = seasonal / np.sqrt(offset_var + floor)
+
+        components = 2 + has_residual
+        self.scores = (np.abs(z_rolling) + np.abs(z_hour) + np.where(has_residual, np.abs(z_residual), 0.0)) / components
+        self.scores[self.seen == 0] = 0.0
+        alerting = np.flatnonzero(warm & (self.scores > self.threshold))
+
+        # Clipped updates, so outliers barely move the statistics once warm
+        limit = np.where(warm, self.threshold, np.inf)
+        self.seen += 1
+        alpha = np.maximum(1 / self.seen, 2 / (self.window + 1))
+        step = _clip(deviation, limit, self.var + floor)
+        self.mean += alpha * step
+        self.var = (1 - alpha) * (self.var + alpha * step ** 2)
+
+        level_alpha = np.maximum(1 / self.seen, 1 / (HOURS_PER_DAY * self.baseline_days))
+        self.level += level_alpha * _clip(seasonal, limit, offset_var + floor)
+
+        # Offsets take what the updated level does not explain
+        self.offset_seen[:, h] += 1
+        offset_alpha = np.maximum(1 / self.offset_seen[:, h], 1 / self.baseline_days)
+        step = _clip(readings - self.level - self.offset[:, h], limit, offset_var + floor)
+        self.offset[rows, h] += offset_alpha * step
+        self.offset_var[rows, h] = (1 - offset_alpha) * (self.offset_var[rows, h] + offset_alpha * step ** 2)
+
+        self.residual_seen += scored
+        residual_alpha = np.maximum(1 / np.maximum(self.residual_seen, 1), 2 / (self.window + 1))
+        step = _clip(residual, limit, self.residual_var + floor)
+        self.residual_var = np.where(scored, (1 - residual_alpha) * self.residual_var + residual_alpha * step ** 2,
+                                     self.residual_var)
+
+        self.forecast = np.array(forecasts, dtype=float)
+        self.ticks += 1
+        self.alerting = len(alerting)
+        if len(alerting):
+            self.alert_counts[alerting] += 1
+            self.alerts.extend(np.column_stack([np.full(len(alerting), hour), alerting,
+                                                readings[alerting], self.scores[alerting]]))
+        return alerting
+
+    def recent(self, n: int = 5, names: Optional[Sequence[str]] = None) -> List[Dict]:
+        """The last `n` alerts, newest first, with sensor names when given"""
+        rows = self.alerts.last(min(n, len(self.alerts)))[::-1]
+        return [{'hour': int(hour),
+                 'sensor': names[int(sensor)] if names is not None else int(sensor),
+                 'reading': float(reading), 'score': float(score)}
+                for hour, sensor, reading, score in rows]
+
+    def report(self, names: Optional[Sequence[str]] = None) -> Dict:
+        """Alert totals, the sensors alerting this tick and the latest alerts"""
+        return {
+            'ticks': self.ticks,
+            'alerts': self.alerts.total,
+            'alerting': self.alerting,
+            'sensors_alerted': int(np.count_nonzero(self.alert_counts)),
+            'max_score': float(self.scores.max()) if self.size else 0.0,
+            'recent': self.recent(5, names)
+        }
+
+    def config(self) -> Dict:
+        return {
+            'threshold': self.threshold,
+            'window': self.window,
+            'baseline_days': self.baseline_days,
+            'warmup': self.warmup,
+            'noise_floor': self.noise_floor,
+            'capacity': self.capacity
+        }
+
+    def state_dict(self) -> Dict:
+        """Per-sensor statistics, held forecasts and the alert ring"""
+        return {
+            'seen': self.seen,
+            'mean': self.mean,
+            'var': self.var,
+            'level': self.level,
+            'residual_seen': self.residual_seen,
+            'residual_var': self.residual_var,
+            'offset_seen': self.offset_seen,
+            'offset': self.offset,
+            'offset_var': self.offset_var,
+            'forecast': self.forecast,
+            'scores': self.scores,
+            'alert_counts': self.alert_counts,
+            'ticks': self.ticks,
+            'alerting': self.alerting,
+            'alerts': self.alerts.state_dict()
+        }
+
+    def load_state_dict(self, state: Dict):
+        """Restore from `state_dict`"""
+        self.seen = np.array(state['seen'], dtype=np.int64)
+        self.size = len(self.seen)
+        self.mean = np.array(state['mean'], dtype=float)
+        self.var = np.array(state['var'], dtype=float)
+        self.level = np.array(state['level'], dtype=float)
+        self.residual_seen = np.array(state['residual_seen'], dtype=np.int64)
+        self.residual_var = np.array(state['residual_var'], dtype=float)
+        self.offset_seen = np.array(state['offset_seen'], dtype=np.int64)
+        self.offset = np.array(state['offset'], dtype=float)
+        self.offset_var = np.array(state['offset_var'], dtype=float)
+        self.forecast = np.array(state['forecast'], dtype=float)
+        self.scores = np.array(state['scores'], dtype=float)
+        self.alert_counts = np.array(state['alert_counts'], dtype=np.int64)
+        self.ticks = state['ticks']
+        self.alerting = state['alerting']
+        self.alerts.load_state_dict(state['alerts'])
+
+
+def _clip(deviation: np.ndarray, limit: np.ndarray, variance: np.ndarray) -> np.ndarray:
+    """Deviations limited to `limit` standard deviations"""
+    bound = limit * np.sqrt(variance)
+    return np.clip(deviation, -bound, bound)
@@ -0,0 +1,105 @@
+from typing import Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+import torch
+from .patterns import SensorPattern, compile_event_tables
+from .sensor import BASE_TEMPERATURES
+
+
+class SyntheticDataset:
+    """Bulk temperature generator decoupled from online training
+
+    Uses the same model as `EnhancedSensor.generate_temperature` (base
+    temperature, daily sine cycle, `SensorPattern` events and N(0, 0.5)
+    noise) but produces hours x sensors arrays in vectorized chunks.
+
+    Every sensor gets its own generator spawned from `seed`, and each hour
+    consumes exactly two standard normals from it (event, noise), so a
+    sensor's series is reproducible regardless of chunk size or of which
+    other sensors are generated alongside it.
+    """
+
+    def __init__(self, pattern_types: Sequence[str], seed: Optional[int] = None,
+                 names: Optional[Sequence[str]] = None):
+        unknown = set(pattern_types) - set(BASE_TEMPERATURES)
+        if unknown:
+            raise ValueError(f"Unknown pattern types: {', '.join(sorted(unknown))}")
+
+        self.pattern_types = list(pattern_types)
+        self.names = list(names) if names is not None else [
+            f"sensor_{i}" for i in range(len(self.pattern_types))]
+        self.size = len(self.pattern_types)
+
+        sequences = np.random.SeedSequence(seed).spawn(self.size)
+        self.rngs = [np.random.default_rng(s) for s in sequences]
+
+        self.base_temp = np.empty(self.size)
+        patterns = []
+        for i, (pattern_type, rng) in enumerate(zip(self.pattern_types, self.rngs)):
+            mean, spread = BASE_TEMPERATURES[pattern_type]
+            self.base_temp[i] = mean + rng.normal(0, spread)
+            patterns.append(SensorPattern(pattern_type, seed=int(rng.integers(2 ** 31))))
+        self.patterns: List[SensorPattern] = patterns
+        self.event_impact, self.event_counts = compile_event_tables(patterns)
+
+        self.hours_generated = 0
+
+    def _draw(self, num_hours: int) -> np.ndarray:
+        """(num_hours, sensors, 2) standard normals, one stream per sensor"""
+        draws = np.empty((num_hours, self.size, 2))
+        for i, rng in enumerate(self.rngs):
+            draws[:, i] = rng.standard_normal((num_hours, 2))
+        return draws
+
+    def generate(self, num_hours: int) -> np.ndarray:
+        """The next `num_hours` readings as a (num_hours, sensors) array"""
+        hours = np.arange(self.hours_generated, self.hours_generated + num_hours)
+        hour_of_day = hours % 24
+        draws = self._draw(num_hours)
+
+        temps = self.base_temp + 3 * np.sin(2 * np.pi * hours / 24)[:, None]
+        temps += self.event_impact[:, hour_of_day].T
+
+        # Sum of k N(1, 0.2) events is N(k, 0.2 * sqrt(k))
+        counts = self.event_counts[:, hour_of_day].T
+        temps += counts + 0.2 * np.sqrt(counts) * draws[..., 0]
+        temps += 0.5 * draws[..., 1]
+
+        self.hours_generated += num_hours
+        return temps
+
+    def chunks(self, num_hours: int, chunk_hours: int = 8760) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield (hours, temperatures) chunks covering the next `num_hours` hours"""
+        remaining = num_hours
+        while remaining > 0:
+            size = min(chunk_hours, remaining)
+            start = self.hours_generated
+            yield np.arange(start, start + size), self.generate(size)
+            remaining -= size
+
+    def to_memmap(self, path: str, num_hours: int, chunk_hours: int = 8760,
+                  dtype=np.float32) -> np.ndarray:
+        """Write the next `num_hours` hours to a (num_hours, sensors) `.npy` file
+
+        Chunks are written straight into a memory-mapped array, so corpora
+        larger than RAM can be produced and later opened with
+        `np.load(path, mmap_mode='r')`.
+        """
+        out = np.lib.format.open_memmap(path, mode='w+', dtype=dtype,
+                                        shape=(num_hours, self.size))
+        row = 0
+        for hours, temps in self.chunks(num_hours, chunk_hours):
+            out[row:row + len(hours)] = temps
+            row += len(hours)
+        out.flush()
+        return out
+
+
+def training_windows(temps: np.ndarray, window_size: int = 24) -> torch.Tensor:
+    """Sliding (sensors, windows, window_size + 1) training windows
+
+    `temps` is an (hours, sensors) array as produced by `SyntheticDataset`.
+    The result is a view, ready for `PatternPredictor.train_windows` one
+    sensor at a time or for a `BatchedSensorModel` across sensors.
+    """
+    series = torch.from_numpy(np.ascontiguousarray(np.asarray(temps, dtype=np.float32).T))
+    return series.unfold(1, window_size + 1, 1)
@@ -0,0 +1,531 @@
+from collections.abc import Mapping
+import math
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+import torch
+import torch.nn as nn
+from .history import HistoryBuffer, HistoryColumn
+from .instrumentation import NULL_INSTRUMENTATION
+from .models import BatchedSensorModel
+from .patterns import SensorPattern, compile_event_tables, event_impacts
+from .privacy import FLAG_EDGES, SCORE_EDGES, PrivacyAccountant, WindowedHistogram
+from .scheduler import TrainingScheduler
+from .sensor import BASE_TEMPERATURES
+
+
+class SensorFleet:
+    """Advances a whole population of sensors as stacked arrays
+
+    Every per-sensor quantity of `EnhancedSensor` (base temperature, event
+    impacts, histories, learned pattern statistics, privacy counters and the
+    prediction model) is stored with a leading sensor axis, so one `step`
+    call moves the entire fleet forward by an hour.
+    """
+
+    def __init__(self, names: Sequence[str], locations: Sequence[Tuple[float, float]],
+                 pattern_types: Sequence[str], history_size: int = 1024,
+                 window_size: int = 24, replay_size: int = 128,
+                 batch_size: Optional[int] = None, lr: float = 0.001,
+                 seed: Optional[int] = None, privacy_window: int = 168,
+                 pattern_epsilon: float = 0.1, epsilon_budget: Optional[float] = None):
+        if not len(names) == len(locations) == len(pattern_types):
+            raise ValueError("names, locations and pattern_types must have the same length")
+
+        self.names = list(names)
+        self.locations = list(locations)
+        self.pattern_types = list(pattern_types)
+        self.size = len(self.names)
+        self.window_size = window_size
+        self.replay_size = replay_size
+        self.batch_size = batch_size
+
+        self.rng = np.random.default_rng(seed)
+        self.torch_generator = torch.Generator()
+        if seed is not None:
+            self.torch_generator.manual_seed(seed)
+
+        # Base temperature and event tables
+        means, spreads = zip(*(BASE_TEMPERATURES[p] for p in self.pattern_types))
+        self.base_temp = np.asarray(means, dtype=float) + self.rng.normal(0, spreads)
+        self.patterns = [SensorPattern(p) for p in self.pattern_types]
+        self.refresh_patterns()
+
+        # Histories, one column per sensor
+        shape = (self.size,)
+        self.temperature_history = HistoryBuffer(history_size, shape=shape)
+        self.prediction_history = HistoryBuffer(history_size, shape=shape)
+        self.accuracy_history = HistoryBuffer(history_size, shape=shape,
+                                              initial=[np.full(self.size, 0.5)])
+
+        # Learned pattern statistics over the last window
+        self.has_patterns = False
+        self.pattern_stats = {
+            name: np.zeros(self.size)
+            for name in ('mean', 'std', 'variance', 'min', 'max', 'trend')
+        }
+        self.peak_mask = np.zeros((window_size, self.size), dtype=bool)
+
+        # Privacy counters
+        self.raw_data_saved = np.zeros(self.size, dtype=np.int64)
+        self.patterns_shared = np.zeros(self.size, dtype=np.int64)
+        self.privacy_score = np.full(self.size, 100.0)
+        self.privacy_score_total = np.zeros(self.size)
+        self.privacy_score_min = np.full(self.size, 100.0)
+        self.pattern_epsilon = pattern_epsilon
+        self.pattern_delta = 0.0
+        self.score_window = WindowedHistogram(SCORE_EDGES, privacy_window, shape)
+        self.sharing_window = WindowedHistogram(FLAG_EDGES, privacy_window, shape)
+        self.accountant = PrivacyAccountant(epsilon_budget, shape=shape)
+
+        # One batched model stands in for every sensor's PatternPredictor
+        self.model = BatchedSensorModel(self.size, window_size, generator=self.torch_generator)
+        self.optimizer = torch.optim.Adam(self.model.parameters(), lr=lr)
+        self.criterion = nn.MSELoss(reduction='none')
+        self.proximal_mu = 0.0
+        self.proximal_anchor: Optional[torch.Tensor] = None
+        self.train_steps = 0
+        # Per row: steps taken, first/last/summed loss, and whether the last loss is not yet uploaded
+        self.row_steps = np.zeros(self.size, dtype=np.int64)
+        self.loss_first = np.zeros(self.size)
+        self.loss_last = np.zeros(self.size)
+        self.loss_total = np.zeros(self.size)
+        self.loss_fresh = np.zeros(self.size, dtype=bool)
+
+        # Phase timers, set by the owning network when instrumentation is on
+        self.instrumentation = NULL_INSTRUMENTATION
+        # Optional adaptive choice of the rows that train each hour, set by the owning network
+        self.scheduler: Optional[TrainingScheduler] = None
+
+    def set_proximal(self, anchor: Optional[torch.Tensor], mu: float):
+        """Configure the FedProx proximal term for every row's local training"""
+        self.proximal_anchor = anchor
+        self.proximal_mu = mu
+
+    def refresh_patterns(self):
+        """Recompile event tables, e.g. after `add_custom_event` on a sensor's pattern"""
+        self.event_impact, self.event_counts = compile_event_tables(self.patterns)
+
+    def step(self, hour: int, readings: Optional[np.ndarray] = None) -> np.ndarray:
+        """Generate, learn from and account for one hour of readings across the fleet
+
+        `readings` replaces the generated readings, e.g. with recorded data.
+        """
+        timer = self.instrumentation
+        with timer.phase('generate'):
+            temps = self._generate(hour) if readings is None else np.array(readings, dtype=float)
+            self.temperature_history.append(temps)
+
+        with timer.phase('train'):
+            self._train(self._scheduled_rows(temps))
+        with timer.phase('learn_patterns'):
+            self._learn_patterns()
+        with timer.phase('privacy'):
+            self._update_privacy()
+        with timer.phase('inference'):
+            self._predict()
+        timer.count('readings', self.size)
+
+        return temps
+
+    def _generate(self, hour: int) -> np.ndarray:
+        """Base temperature with daily cycle, event impacts and noise"""
+        temps = self.base_temp + 3 * np.sin(2 * np.pi * hour / 24)
+        temps = temps + event_impacts(self.event_impact, self.event_counts, hour, self.rng)
+        return temps + self.rng.normal(0, 0.5, self.size)
+
+    def _scheduled_rows(self, temps: np.ndarray) -> Optional[np.ndarray]:
+        """Rows the scheduler picks to train on this hour's readings (None: every row)"""
+        if self.scheduler is None:
+            return None
+        # The previous hour's prediction is the forecast of this hour's reading
+        if len(self.prediction_history):
+            predictions = self.prediction_history[-1]
+        else:
+            predictions = np.full(self.size, np.nan)
+        return self.scheduler.select(predictions, temps)
+
+    def _train(self, rows: Optional[np.ndarray] = None):
+        """One optimisation step of every sensor's model (or just `rows`) on its replay window"""
+        span = self.replay_size + self.window_size
+        recent = self.temperature_history.last(span)
+        if len(recent) < self.window_size + 1 or (rows is not None and not len(rows)):
+            return
+
+        index = torch.from_numpy(rows) if rows is not None else None
+        series = torch.from_numpy(np.ascontiguousarray(recent.T, dtype=np.float32))
+        windows = series.unfold(1, self.window_size + 1, 1)
+        if index is not None:
+            windows = windows[index]
+        if self.batch_size is not None and self.batch_size < windows.shape[1]:
+            idx = torch.randint(windows.shape[1], (self.batch_size,), generator=self.torch_generator)
+            windows = windows[:, idx]
+
+        self.model.train()
+        self.optimizer.zero_grad()
+        outputs = self.model(windows[..., :-1], index)
+        per_sensor = self.criterion(outputs, windows[..., -1:]).mean(dim=(1, 2))
+        loss = per_sensor.sum()
+        if self.proximal_anchor is not None and self.proximal_mu > 0:
+            loss = loss + self.proximal_mu / 2 * self.model.proximal_term(self.proximal_anchor, index)
+        loss.backward()
+        self._step(rows)
+
+        losses = per_sensor.detach().numpy().astype(float)
+        if rows is None:
+            rows = np.arange(self.size)
+        first = self.row_steps[rows] == 0
+        if first.any():
+            self.loss_first = self.loss_first.copy()
+            self.loss_first[rows[first]] = losses[first]
+        self.loss_last = self.loss_last.copy()
+        self.loss_last[rows] = losses
+        self.loss_total[rows] += losses
+        self.loss_fresh[rows] = True
+        self.row_steps[rows] += 1
+        self.train_steps += 1
+
+    def _step(self, rows: Optional[np.ndarray]):
+        """Optimizer step of every row, or an Adam step of just `rows`
+
+        Adam moves parameters even where the gradient is zero, so a partial
+        step gathers only the selected rows' parameters and moment
+        estimates, updates them and scatters them back; other rows cost
+        nothing. Bias correction uses the optimizer's shared step count, as
+        a full step would.
+        """
+        if rows is None or len(rows) == self.size:
+            self.optimizer.step()
+            return
+
+        index = torch.from_numpy(rows)
+        group = self.optimizer.param_groups[0]
+        beta1, beta2 = group['betas']
+        with torch.no_grad():
+            for param in group['params']:
+                state = self.optimizer.state[param]
+                if not state:
+                    state['step'] = torch.tensor(0.0)
+                    state['exp_avg'] = torch.zeros_like(param)
+                    state['exp_avg_sq'] = torch.zeros_like(param)
+                state['step'] += 1
+                step = float(state['step'])
+
+                grad = param.grad[index]
+                exp_avg = state['exp_avg'][index].lerp_(grad, 1 - beta1)
+                exp_avg_sq = state['exp_avg_sq'][index].mul_(beta2).addcmul_(grad, grad, value=1 - beta2)
+                denom = exp_avg_sq.sqrt().div_(math.sqrt(1 - beta2 ** step)).add_(group['eps'])
+                param[index] = param[index].addcdiv_(exp_avg, denom, value=-group['lr'] / (1 - beta1 ** step))
+                state['exp_avg'][index] = exp_avg
+                state['exp_avg_sq'][index] = exp_avg_sq
+
+    def _learn_patterns(self):
+        """Vectorized equivalent of `EnhancedSensor.learn_patterns`"""
+        if len(self.temperature_history) < self.window_size:
+            return
+
+        recent = self.temperature_history.last(self.window_size)
+        mean = recent.mean(axis=0)
+        std = recent.std(axis=0)
+
+        # Update accuracy based on prediction performance
+        if len(self.prediction_history) > 0:
+            error = np.abs(self.prediction_history[-1] - recent[-1])
+            accuracy = np.maximum(0, 1 - error / mean)
+            self.accuracy_history.append(0.9 * self.accuracy_history[-1] + 0.1 * accuracy)
+
+        x = np.arange(self.window_size) - (self.window_size - 1) / 2
+        stats = self.pattern_stats
+        stats['mean'] = mean
+        stats['std'] = std
+        stats['variance'] = std ** 2
+        stats['min'] = recent.min(axis=0)
+        stats['max'] = recent.max(axis=0)
+        stats['trend'] = x @ (recent - mean) / (x @ x)
+        self.peak_mask = recent > mean + std
+        self.has_patterns = True
+
+    def _update_privacy(self):
+        """Vectorized equivalent of `PrivacyMetrics.update`"""
+        self.raw_data_saved += 1
+        if self.has_patterns:
+            self.patterns_shared += 1
+
+            self.accountant.spend(self.pattern_epsilon, self.pattern_delta)
+
+        sharing_ratio = self.patterns_shared / np.maximum(1, self.raw_data_saved)
+        self.privacy_score = np.maximum(50, 100 * (1 - sharing_ratio / 2))
+        self.privacy_score_total += self.privacy_score
+        np.minimum(self.privacy_score_min, self.privacy_score, out=self.privacy_score_min)
+
+        self.score_window.add(self.privacy_score)
+        self.sharing_window.add(1.0 if self.has_patterns else 0.0)
+
+    def _predict(self):
+        """Predict the next reading of every sensor in one forward pass"""
+        recent = self.temperature_history.last(self.window_size)
+        if len(recent) < self.window_size:
+            return
+
+        x = torch.from_numpy(np.ascontiguousarray(recent.T, dtype=np.float32)).unsqueeze(1)
+        self.model.eval()
+        with torch.no_grad():
+            self.prediction_history.append(self.model(x)[:, 0, 0].numpy())
+
+    def row_patterns(self, row: int) -> Dict:
+        """Learned patterns of one sensor in `EnhancedSensor.learn_patterns` format"""
+        if not self.has_patterns:
+            return {}
+
+        stats = self.pattern_stats
+        return {
+            'daily_range': (float(stats['min'][row]), float(stats['max'][row])),
+            'variance': float(stats['variance'][row]),
+            'trend': float(stats['trend'][row]),
+            'peak_hours': np.flatnonzero(self.peak_mask[:, row]).tolist()
+        }
+
+    def views(self) -> List['FleetSensorView']:
+        """`EnhancedSensor`-compatible views, one per row"""
+        return [FleetSensorView(self, row) for row in range(self.size)]
+
+    def pattern_library(self) -> 'FleetPatternLibrary':
+        """Lazy name -> patterns mapping over the fleet"""
+        return FleetPatternLibrary(self)
+
+    def config(self) -> Dict:
+        """Constructor arguments that rebuild an equivalent (untrained) fleet"""
+        return {
+            'names': self.names,
+            'locations': [tuple(location) for location in self.locations],
+            'pattern_types': self.pattern_types,
+            'history_size': self.temperature_history.retention,
+            'window_size': self.window_size,
+            'replay_size': self.replay_size,
+            'batch_size': self.batch_size,
+            'lr': self.optimizer.param_groups[0]['lr'],
+            'privacy_window': self.score_window.window,
+            'pattern_epsilon': self.pattern_epsilon,
+            'epsilon_budget': self.accountant.budget
+        }
+
+    def state_dict(self) -> Dict:
+        """Every array, model and RNG state that changes as the fleet steps"""
+        return {
+            'rng': self.rng.bit_generator.state,
+            'torch_generator': self.torch_generator.get_state(),
+            'base_temp': self.base_temp,
+            'patterns': [pattern.state_dict() for pattern in self.patterns],
+            'temperature_history': self.temperature_history.state_dict(),
+            'prediction_history': self.prediction_history.state_dict(),
+            'accuracy_history': self.accuracy_history.state_dict(),
+            'has_patterns': self.has_patterns,
+            'pattern_stats': self.pattern_stats,
+            'peak_mask': self.peak_mask,
+            'raw_data_saved': self.raw_data_saved,
+            'patterns_shared': self.patterns_shared,
+            'privacy_score': self.privacy_score,
+            'privacy_score_total': self.privacy_score_total,
+            'privacy_score_min': self.privacy_score_min,
+            'score_window': self.score_window.state_dict(),
+            'sharing_window': self.sharing_window.state_dict(),
+            'accountant': self.accountant.state_dict(),
+            'model': self.model.state_dict(),
+            'optimizer': self.optimizer.state_dict(),
+            'proximal_mu': self.proximal_mu,
+            'proximal_anchor': self.proximal_anchor,
+            'train_steps': self.train_steps,
+            'row_steps': self.row_steps,
+            'loss_first': self.loss_first,
+            'loss_last': self.loss_last,
+            'loss_total': self.loss_total,
+            'loss_fresh': self.loss_fresh
+        }
+
+    def load_state_dict(self, state: Dict):
+        """Restore from `state_dict` of a fleet with the same configuration"""
+        self.rng.bit_generator.state = state['rng']
+        self.torch_generator.set_state(state['torch_generator'])
+        self.base_temp = np.array(state['base_temp'])
+        for pattern, pattern_state in zip(self.patterns, state['patterns']):
+            pattern.load_state_dict(pattern_state)
+        self.refresh_patterns()
+
+        self.temperature_history.load_state_dict(state['temperature_history'])
+        self.prediction_history.load_state_dict(state['prediction_history'])
+        self.accuracy_history.load_state_dict(state['accuracy_history'])
+        self.has_patterns = state['has_patterns']
+        self.pattern_stats = {name: np.array(values) for name, values in state['pattern_stats'].items()}
+        self.peak_mask = np.array(state['peak_mask'])
+
+        self.raw_data_saved = np.array(state['raw_data_saved'])
+        self.patterns_shared = np.array(state['patterns_shared'])
+        self.privacy_score = np.array(state['privacy_score'])
+        self.privacy_score_total = np.array(state['privacy_score_total'])
+        self.privacy_score_min = np.array(state['privacy_score_min'])
+        self.score_window.load_state_dict(state['score_window'])
+        self.sharing_window.load_state_dict(state['sharing_window'])
+        self.accountant.load_state_dict(state['accountant'])
+
+        self.model.load_state_dict(state['model'])
+        self.optimizer.load_state_dict(state['optimizer'])
+        self.proximal_mu = state['proximal_mu']
+        self.proximal_anchor = state['proximal_anchor']
+        self.train_steps = state['train_steps']
+        # Snapshots from before per-row counts had every row train on every step
+        self.row_steps = np.array(state.get('row_steps', np.full(self.size, self.train_steps)), dtype=np.int64)
+        self.loss_first = np.array(state['loss_first'])
+        self.loss_last = np.array(state['loss_last'])
+        self.loss_total = np.array(state['loss_total'])
+        self.loss_fresh = np.array(state.get('loss_fresh', self.row_steps > 0), dtype=bool)
+
+    def get_health(self) -> Dict:
+        """Network health metrics computed directly from the fleet arrays"""
+        return {
+            'average_accuracy': float(np.mean(self.accuracy_history[-1])),
+            'average_privacy': float(np.mean(self.privacy_score)),
+            'max_epsilon': float(np.max(self.accountant.epsilon())),
+            'active_sensors': self.size,
+            'pattern_coverage': 1.0 if self.has_patterns else 0.0
+        }
+
+
+class FleetPatternLibrary(Mapping):
+    """Read-only mapping of sensor name to learned patterns, built on access"""
+
+    def __init__(self, fleet: SensorFleet):
+        self.fleet = fleet
+        self._rows = {name: row for row, name in enumerate(fleet.names)}
+
+    def __getitem__(self, name: str) -> Dict:
+        if not self.fleet.has_patterns:
+            raise KeyError(name)
+        return self.fleet.row_patterns(self._rows[name])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.fleet.names if self.fleet.has_patterns else [])
+
+    def __len__(self) -> int:
+        return self.fleet.size if self.fleet.has_patterns else 0
+
+
+class FleetPrivacyView:
+    """`PrivacyMetrics`-compatible view of one fleet row"""
+
+    def __init__(self, fleet: SensorFleet, row: int):
+        self.fleet = fleet
+        self.row = row
+
+    @property
+    def privacy_score(self) -> float:
+        return float(self.fleet.privacy_score[self.row])
+
+    @property
+    def raw_data_saved(self) -> int:
+        return int(self.fleet.raw_data_saved[self.row])
+
+    @property
+    def patterns_shared(self) -> int:
+        return int(self.fleet.patterns_shared[self.row])
+
+    @property
+    def epsilon(self) -> float:
+        return float(self.fleet.accountant.epsilon()[self.row])
+
+    def record_model_update(self, epsilon: float, delta: float = 0.0):
+        """Charge this row's accountant for a model update"""
+        mask = np.zeros(self.fleet.size, dtype=bool)
+        mask[self.row] = True
+        self.fleet.accountant.spend(epsilon, delta, mask)
+
+    def get_metrics(self) -> dict:
+        """Get current privacy metrics"""
+        return {
+            'privacy_score': self.privacy_score,
+            'raw_data_saved': self.raw_data_saved,
+            'patterns_shared': self.patterns_shared,
+            'sharing_ratio': self.patterns_shared / max(1, self.raw_data_saved),
+            'epsilon': self.epsilon,
+            'budget_exhausted': bool(self.fleet.accountant.exhausted()[self.row])
+        }
+
+    def analyze_sharing_patterns(self) -> dict:
+        """Analyze data sharing patterns"""
+        fleet, row = self.fleet, self.row
+        saved = self.raw_data_saved
+        return {
+            'total_data_points': saved,
+            'total_patterns_shared': self.patterns_shared,
+            'average_privacy_score': float(fleet.privacy_score_total[row]) / saved
+            if saved else 100,
+            'min_privacy_score': float(fleet.privacy_score_min[row]),
+            'recent_privacy_score': float(fleet.score_window.mean()[row]) if saved else 100,
+            'recent_sharing_ratio': float(fleet.sharing_window.mean()[row]),
+            'score_histogram': fleet.score_window.counts()[row].tolist(),
+            'epsilon': self.epsilon,
+            'delta': float(fleet.accountant.delta()[row]),
+            'epsilon_remaining': float(fleet.accountant.remaining()[row])
+        }
+
+
+class FleetSensorView:
+    """Thin `EnhancedSensor`-style view over one row of a SensorFleet
+
+    Readings are produced by `SensorFleet.step`, which advances all rows
+    together; the view only exposes the row's state and model.
+    """
+
+    def __init__(self, fleet: SensorFleet, row: int):
+        self.fleet = fleet
+        self.row = row
+        self.name = fleet.names[row]
+        self.location = fleet.locations[row]
+        self.pattern = fleet.patterns[row]
+        self.privacy = FleetPrivacyView(fleet, row)
+
+        self.temperature_history = HistoryColumn(fleet.temperature_history, row)
+        self.prediction_history = HistoryColumn(fleet.prediction_history, row)
+        self.accuracy_history = HistoryColumn(fleet.accuracy_history, row)
+
+    @property
+    def base_temp(self) -> float:
+        return float(self.fleet.base_temp[self.row])
+
+    @base_temp.setter
+    def base_temp(self, value: float):
+        self.fleet.base_temp[self.row] = value
+
+    @property
+    def learned_patterns(self) -> Dict:
+        return self.fleet.row_patterns(self.row)
+
+    def learn_patterns(self, window_size: int = 24) -> Dict:
+        """Patterns learned by the fleet on its last step"""
+        return self.learned_patterns
+
+    def predict_next_temperature(self) -> float:
+        """Latest fleet prediction for this sensor"""
+        if len(self.prediction_history) > 0:
+            return float(self.prediction_history[-1])
+        return float(self.temperature_history[-1])
+
+    def get_training_metrics(self) -> dict:
+        """`PatternPredictor.get_training_metrics` for this row's model"""
+        fleet = self.fleet
+        steps = int(fleet.row_steps[self.row])
+        if steps == 0:
+            return {'average_loss': None, 'loss_trend': None}
+
+        return {
+            'average_loss': float(fleet.loss_total[self.row]) / steps,
+            'loss_trend': float(fleet.loss_last[self.row] - fleet.loss_first[self.row])
+            if steps > 1 else 0
+        }
+
+    def get_metrics(self) -> Dict:
+        """Get comprehensive sensor metrics"""
+        return {
+            'privacy': self.privacy.get_metrics(),
+            'accuracy': float(self.accuracy_history[-1]),
+            'training': self.get_training_metrics(),
+            'patterns': self.learned_patterns
+        }
@@ -0,0 +1,183 @@
+import os
+import numpy as np
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+
+class HistoryBuffer:
+    """Fixed-size NumPy ring buffer with list-style access to the most recent readings
+
+    Each entry is a scalar by default, or a row of `shape` values when several
+    series (e.g. a whole sensor fleet) advance in lockstep.
+    """
+
+    def __init__(self, retention: int = 1024, spill_path: Optional[str] = None,
+                 initial: Optional[Iterable[float]] = None, dtype=np.float64,
+                 shape: Tuple[int, ...] = ()):
+        if retention < 1:
+            raise ValueError("retention must be at least 1")
+
+        self.retention = retention
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+        self.spill_path = spill_path
+
+        # Each value is written twice so the retained span is always a contiguous view
+        self._data = np.zeros((2 * retention,) + self.shape, dtype=self.dtype)
+        self._pos = 0
+        self._count = 0
+        self._spilled = 0
+        # A new series replaces whatever an earlier run left in the spill file;
+        # a restored one (see `load_state_dict`) keeps appending to it
+        self._resumed = False
+
+        if initial is not None:
+            self.extend(initial)
+
+    @property
+    def total(self) -> int:
+        """Number of values ever appended, including evicted ones"""
+        return self._count
+
+    @property
+    def spilled(self) -> int:
+        """Number of values written to the spill file"""
+        return self._spilled
+
+    def append(self, value: Union[float, np.ndarray]):
+        """Add a value, evicting (and optionally spilling) the oldest when full"""
+        if self.spill_path is not None and self._count - self._spilled >= self.retention:
+            self._spill(max(1, self.retention // 4))
+
+        self._data[self._pos] = value
+        self._data[self._pos + self.retention] = value
+        self._pos = (self._pos + 1) % self.retention
+        self._count += 1
+
+    def extend(self, values: Iterable[float]):
+        """Append several values in order"""
+        if (self.spill_path is None and isinstance(values, np.ndarray)
+                and values.shape[1:] == self.shape):
+            self._extend_array(values)
+            return
+        for value in values:
+            self.append(value)
+
+    def _extend_array(self, values: np.ndarray):
+        """`extend` with one vectorized write per copy (no spill file)"""
+        n = len(values)
+        kept = values[max(0, n - self.retention):]
+        idx = (self._pos + n - len(kept) + np.arange(len(kept))) % self.retention
+        self._data[idx] = kept
+        self._data[idx + self.retention] = kept
+        self._pos = (self._pos + n) % self.retention
+        self._count += n
+
+    def view(self) -> np.ndarray:
+        """Retained values, oldest first, without copying"""
+        n = len(self)
+        end = self._pos + self.retention
+        return self._data[end - n:end]
+
+    def last(self, n: int) -> np.ndarray:
+        """View of the most recent `n` retained values"""
+        view = self.view()
+        return view[max(0, len(view) - n):]
+
+    def __len__(self) -> int:
+        return min(self._count, self.retention)
+
+    def __getitem__(self, index: Union[int, slice]):
+        return self.view()[index]
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self.view())
+
+    def __array__(self, dtype=None, copy=None):
+        view = self.view()
+        return view.astype(dtype) if dtype is not None else view
+
+    def __repr__(self) -> str:
+        return f"HistoryBuffer(retention={self.retention}, len={len(self)}, total={self._count})"
+
+    def _spill(self, count: int):
+        """Append the oldest unspilled values to the spill file"""
+        unspilled = self._count - self._spilled
+        start = len(self) - unspilled
+        block = self.view()[start:start + min(count, unspilled)]
+
+        directory = os.path.dirname(self.spill_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        mode = 'ab' if self._resumed or self._spilled else 'wb'
+        with open(self.spill_path, mode) as f:
+            block.tofile(f)
+        self._spilled += len(block)
+
+    def flush(self):
+        """Write every retained value not yet on disk to the spill file"""
+        if self.spill_path is not None and self._count > self._spilled:
+            self._spill(self._count - self._spilled)
+
+    def state_dict(self) -> Dict:
+        """Retained values as an append-only series, plus spill progress"""
+        return {
+            'series': {'kind': 'series', 'total': self._count, 'values': self.view()},
+            'spilled': self._spilled
+        }
+
+    def load_state_dict(self, state: Dict):
+        """Restore from `state_dict`, truncating any spill file written past it"""
+        values = np.asarray(state['series']['values'], dtype=self.dtype)
+        n = min(len(values), self.retention)
+        self._data[:n] = values[len(values) - n:]
+        self._data[self.retention:self.retention + n] = values[len(values) - n:]
+        self._pos = n % self.retention
+        self._count = state['series']['total']
+        self._spilled = state['spilled']
+        self._resumed = True
+
+        if self.spill_path is not None and os.path.exists(self.spill_path):
+            row_bytes = self.dtype.itemsize * int(np.prod(self.shape, dtype=np.int64))
+            with open(self.spill_path, 'r+b') as f:
+                f.truncate(self._spilled * row_bytes)
+
+    def load_spilled(self) -> np.ndarray:
+        """Memory-map the values spilled to disk so far"""
+        if self.spill_path is None or self._spilled == 0 or not os.path.exists(self.spill_path):
+            return np.zeros((0,) + self.shape, dtype=self.dtype)
+        values = self._spilled * int(np.prod(self.shape, dtype=np.int64))
+        spilled = np.memmap(self.spill_path, dtype=self.dtype, mode='r', shape=(values,))
+        return spilled.reshape((-1,) + self.shape) if self.shape else spilled
+
+
+class HistoryColumn:
+    """Read-only view of one column of a row-shaped HistoryBuffer"""
+
+    def __init__(self, buffer: HistoryBuffer, column: int):
+        self.buffer = buffer
+        self.column = column
+
+    @property
+    def total(self) -> int:
+        return self.buffer.total
+
+    def view(self) -> np.ndarray:
+        """Retained values of this column, oldest first, without copying"""
+        return self.buffer.view()[:, self.column]
+
+    def last(self, n: int) -> np.ndarray:
+        """View of the most recent `n` retained values of this column"""
+        return self.buffer.last(n)[:, self.column]
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def __getitem__(self, index: Union[int, slice]):
+        return self.view()[index]
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self.view())
+
+    def __array__(self, dtype=None, copy=None):
+        view = self.view()
+        return view.astype(dtype) if dtype is not None else view
@@ -0,0 +1,117 @@
+import warnings
+from typing import List, Optional, Sequence
+import numpy as np
+import torch
+from .models import BatchedSensorModel, PatternPredictor
+
+BACKENDS = ('eager', 'script', 'compile')
+
+
+class FleetInference:
+    """Batched, cached forecasts for many PatternPredictors
+
+    The predictors' weights are stacked into one `BatchedSensorModel`, so a
+    prediction for every sensor (or every horizon) is a single batched
+    forward pass. Rows are refreshed lazily, only for predictors whose
+    weights changed since the last call. `backend` picks eager execution,
+    a TorchScript trace ('script') or `torch.compile` ('compile'); if
+    compilation is unavailable the engine falls back to eager execution.
+    """
+
+    def __init__(self, predictors: Sequence[PatternPredictor], backend: str = 'eager'):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}'. Choose from: {', '.join(BACKENDS)}")
+        if not predictors:
+            raise ValueError("FleetInference needs at least one predictor")
+
+        self.predictors = list(predictors)
+        self.size = len(self.predictors)
+        self.window_size = self.predictors[0].window_size
+        self.backend = backend
+
+        self.model = BatchedSensorModel(self.size, self.window_size).eval()
+        for parameter in self.model.parameters():
+            parameter.requires_grad_(False)
+        self._versions = np.full(self.size, -1, dtype=np.int64)
+        self._runner = None
+
+    def refresh(self) -> int:
+        """Reload rows whose predictor weights changed; returns the number reloaded"""
+        versions = np.fromiter((p.version for p in self.predictors), dtype=np.int64, count=self.size)
+        stale = np.flatnonzero(versions != self._versions)
+        if len(stale):
+            flat = torch.stack([self.predictors[row].get_flat_parameters() for row in stale])
+            self.model.load_flat_parameters(flat, torch.from_numpy(stale))
+            self._versions[stale] = versions[stale]
+        return len(stale)
+
+    def _compile(self, example: torch.Tensor):
+        """Build the runner for the configured backend"""
+        if self.backend == 'script':
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                return torch.jit.trace(self.model, example)
+        if self.backend == 'compile':
+            try:
+                runner = torch.compile(self.model, dynamic=True)
+                runner(example)
+                return runner
+            except Exception as e:
+                warnings.warn(f"torch.compile unavailable ({e}); using eager execution")
+        return self.model
+
+    def _run(self, x: torch.Tensor) -> torch.Tensor:
+        """(sensors, batch, window) -> (sensors, batch)"""
+        if self._runner is None:
+            self._runner = self._compile(x)
+        return self._runner(x)[..., 0]
+
+    def predict(self, windows) -> np.ndarray:
+        """Next-reading predictions for (sensors, window) or (sensors, batch, window) windows"""
+        x = torch.as_tensor(np.asarray(windows, dtype=np.float32))
+        single = x.dim() == 2
+        if single:
+            x = x.unsqueeze(1)
+
+        self.refresh()
+        with torch.inference_mode():
+            out = self._run(x).numpy()
+        return out[:, 0] if single else out
+
+    def forecast(self, windows, horizon: int) -> np.ndarray:
+        """Autoregressive (sensors, horizon) forecasts from (sensors, window) windows"""
+        windows = np.asarray(windows, dtype=np.float32)
+        series = torch.empty(self.size, self.window_size + horizon)
+        series[:, :self.window_size] = torch.from_numpy(windows[:, -self.window_size:])
+
+        self.refresh()
+        with torch.inference_mode():
+            for step in range(horizon):
+                x = series[:, step:step + self.window_size].unsqueeze(1)
+                series[:, self.window_size + step] = self._run(x)[:, 0]
+        return series[:, self.window_size:].numpy()
+
+    def predict_sensors(self, sensors: List, horizon: Optional[int] = None) -> np.ndarray:
+        """Predict for sensors owning `predictors`, in the same order
+
+        Each sensor with a full window gets its prediction appended to
+        `prediction_history`, as `predict_next_temperature` would; rows
+        without enough history are NaN. With `horizon`, returns the
+        (sensors, horizon) autoregressive forecast instead (nothing is
+        appended).
+        """
+        ready = np.array([len(s.temperature_history) >= self.window_size for s in sensors])
+        windows = np.zeros((self.size, self.window_size), dtype=np.float32)
+        for row in np.flatnonzero(ready):
+            windows[row] = sensors[row].temperature_history.last(self.window_size)
+
+        if horizon is not None:
+            out = self.forecast(windows, horizon)
+            out[~ready] = np.nan
+            return out
+
+        out = self.predict(windows)
+        out[~ready] = np.nan
+        for row in np.flatnonzero(ready):
+            sensors[row].prediction_history.append(float(out[row]))
+        return out
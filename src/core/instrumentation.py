@@ -0,0 +1,266 @@
+import contextlib
+import cProfile
+import json
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+import numpy as np
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class _Samples:
+    """Ring of the most recent durations plus running count and sum"""
+
+    __slots__ = ('values', 'pos', 'count', 'total')
+
+    def __init__(self, capacity: int):
+        self.values = np.empty(capacity)
+        self.pos = 0
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds: float):
+        self.values[self.pos] = seconds
+        self.pos = (self.pos + 1) % len(self.values)
+        self.count += 1
+        self.total += seconds
+
+    def recent(self) -> np.ndarray:
+        return self.values[:min(self.count, len(self.values))]
+
+    def quantiles(self) -> Dict[float, float]:
+        recent = self.recent()
+        if not len(recent):
+            return {q: 0.0 for q in QUANTILES}
+        return dict(zip(QUANTILES, np.quantile(recent, QUANTILES)))
+
+
+class _Phase:
+    """Context manager timing one phase occurrence"""
+
+    __slots__ = ('owner', 'name', 'sensor', 'started')
+
+    def __init__(self, owner: 'Instrumentation', name: str, sensor: Optional[str]):
+        self.owner = owner
+        self.name = name
+        self.sensor = sensor
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.owner.record(self.name, time.perf_counter() - self.started, self.sensor, self.started)
+        return False
+
+
+class Instrumentation:
+    """Per-phase timers, counters and an optional profiler capture window
+
+    `phase(name, sensor=None)` times a block; the latest `samples`
+    durations of each phase (and `sensor_samples` per sensor and phase)
+    are kept for latency percentiles. With `trace=True` the last
+    `trace_events` occurrences are kept for a Chrome trace. Between hours
+    `profile_start` and `profile_start + profile_hours` the run is captured
+    with cProfile, or with the torch profiler when `torch_profile` is set,
+    and written to `profile_path`. Exports are refreshed every
+    `export_every` hours when paths are configured.
+    """
+
+    enabled = True
+
+    def __init__(self, samples: int = 4096, sensor_samples: int = 256,
+                 trace: bool = False, trace_events: int = 100_000,
+                 profile_start: Optional[int] = None, profile_hours: int = 1,
+                 profile_path: Optional[str] = None, torch_profile: bool = False,
+                 chrome_trace_path: Optional[str] = None, prometheus_path: Optional[str] = None,
+                 export_every: Optional[int] = None):
+        self.samples = samples
+        self.sensor_samples = sensor_samples
+        self.phases: Dict[str, _Samples] = {}
+        self.sensor_phases: Dict[Tuple[str, str], _Samples] = {}
+        self.counters: Dict[str, int] = {}
+
+        self.trace = trace or chrome_trace_path is not None
+        self.events: Deque[Tuple[str, Optional[str], float, float]] = deque(maxlen=trace_events)
+        self.origin = time.perf_counter()
+
+        self.profile_start = profile_start
+        self.profile_hours = profile_hours
+        self.profile_path = profile_path
+        self.torch_profile = torch_profile
+        self._profiler = None
+
+        self.chrome_trace_path = chrome_trace_path
+        self.prometheus_path = prometheus_path
+        self.export_every = export_every
+
+    def phase(self, name: str, sensor: Optional[str] = None) -> _Phase:
+        """Time a block as one occurrence of `name` (optionally for one sensor)"""
+        return _Phase(self, name, sensor)
+
+    def record(self, name: str, seconds: float, sensor: Optional[str] = None,
+               started: Optional[float] = None):
+        """Add a measured duration"""
+        samples = self.phases.get(name)
+        if samples is None:
+            samples = self.phases[name] = _Samples(self.samples)
+        samples.add(seconds)
+
+        if sensor is not None:
+            key = (name, sensor)
+            per_sensor = self.sensor_phases.get(key)
+            if per_sensor is None:
+                per_sensor = self.sensor_phases[key] = _Samples(self.sensor_samples)
+            per_sensor.add(seconds)
+
+        if self.trace:
+            self.events.append((name, sensor, started if started is not None else
+                                time.perf_counter() - seconds, seconds))
+
+    def count(self, name: str, n: int = 1):
+        """Increment a counter"""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def begin_hour(self, hour: int):
+        """Start the profiler when the capture window opens"""
+        if self.profile_start is not None and hour == self.profile_start and self._profiler is None:
+            if self.torch_profile:
+                import torch.profiler
+                self._profiler = torch.profiler.profile(
+                    activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True)
+                self._profiler.__enter__()
+            else:
+                self._profiler = cProfile.Profile()
+                self._profiler.enable()
+
+    def end_hour(self, hour: int):
+        """Close the capture window and refresh periodic exports"""
+        self.count('hours')
+        if (self._profiler is not None
+                and hour >= self.profile_start + self.profile_hours - 1):
+            self._stop_profiler()
+        if self.export_every and (hour + 1) % self.export_every == 0:
+            self.export()
+
+    def _stop_profiler(self):
+        """Write the captured profile"""
+        profiler, self._profiler = self._profiler, None
+        path = self.profile_path
+        if self.torch_profile:
+            profiler.__exit__(None, None, None)
+            profiler.export_chrome_trace(path or 'fedsense_torch_trace.json')
+        else:
+            profiler.disable()
+            profiler.dump_stats(path or 'fedsense.prof')
+
+    def summary(self) -> List[Dict]:
+        """Count, total, mean and percentiles of every phase, slowest total first"""
+        rows = []
+        for name, samples in self.phases.items():
+            quantiles = samples.quantiles()
+            rows.append({
+                'phase': name,
+                'count': samples.count,
+                'total': samples.total,
+                'mean': samples.total / samples.count,
+                **{f"p{int(q * 100)}": value for q, value in quantiles.items()}
+            })
+        return sorted(rows, key=lambda row: row['total'], reverse=True)
+
+    def slowest_sensors(self, phase: str, n: int = 5) -> List[Tuple[str, float]]:
+        """Sensors with the highest p90 latency for a phase"""
+        scored = [(sensor, samples.quantiles()[0.9])
+                  for (name, sensor), samples in self.sensor_phases.items() if name == phase]
+        return sorted(scored, key=lambda item: item[1], reverse=True)[:n]
+
+    def chrome_trace(self) -> Dict:
+        """Recorded occurrences in Chrome trace-event format"""
+        events = []
+        for name, sensor, started, seconds in self.events:
+            event = {'name': name, 'cat': 'fedsense', 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                     'ts': (started - self.origin) * 1e6, 'dur': seconds * 1e6}
+            if sensor is not None:
+                event['args'] = {'sensor': sensor}
+            events.append(event)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def prometheus_text(self) -> str:
+        """Phase latencies and counters in the Prometheus text exposition format"""
+        lines = ['# HELP fedsense_phase_seconds Latency of each update phase',
+                 '# TYPE fedsense_phase_seconds summary']
+        for name, samples in self.phases.items():
+            for q, value in samples.quantiles().items():
+                lines.append(f'fedsense_phase_seconds{{phase="{name}",quantile="{q}"}} {value:.9g}')
+            lines.append(f'fedsense_phase_seconds_sum{{phase="{name}"}} {samples.total:.9g}')
+            lines.append(f'fedsense_phase_seconds_count{{phase="{name}"}} {samples.count}')
+
+        if self.sensor_phases:
+            lines += ['# HELP fedsense_sensor_phase_seconds Latency of each phase per sensor',
+                      '# TYPE fedsense_sensor_phase_seconds summary']
+            for (name, sensor), samples in self.sensor_phases.items():
+                labels = f'phase="{name}",sensor="{_escape(sensor)}"'
+                for q, value in samples.quantiles().items():
+                    lines.append(f'fedsense_sensor_phase_seconds{{{labels},quantile="{q}"}} {value:.9g}')
+                lines.append(f'fedsense_sensor_phase_seconds_sum{{{labels}}} {samples.total:.9g}')
+                lines.append(f'fedsense_sensor_phase_seconds_count{{{labels}}} {samples.count}')
+
+        lines += ['# HELP fedsense_events_total Counted events',
+                  '# TYPE fedsense_events_total counter']
+        for name, value in self.counters.items():
+            lines.append(f'fedsense_events_total{{name="{name}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self):
+        """Write the configured Chrome trace and Prometheus files"""
+        if self.chrome_trace_path is not None:
+            _write_atomic(self.chrome_trace_path, json.dumps(self.chrome_trace()))
+        if self.prometheus_path is not None:
+            _write_atomic(self.prometheus_path, self.prometheus_text())
+
+    def close(self):
+        """Stop an open profiler window and write final exports"""
+        if self._profiler is not None:
+            self._stop_profiler()
+        self.export()
+
+
+class NullInstrumentation:
+    """Stand-in used when instrumentation is off; every hook is a no-op"""
+
+    enabled = False
+    _context = contextlib.nullcontext()
+
+    def phase(self, name: str, sensor: Optional[str] = None):
+        return self._context
+
+    def record(self, name: str, seconds: float, sensor: Optional[str] = None,
+               started: Optional[float] = None):
+        pass
+
+    def count(self, name: str, n: int = 1):
+        pass
+
+    def begin_hour(self, hour: int):
+        pass
+
+    def end_hour(self, hour: int):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL_INSTRUMENTATION = NullInstrumentation()
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _write_atomic(path: str, text: str):
+    with open(path + '.tmp', 'w') as f:
+        f.write(text)
+    os.replace(path + '.tmp', path)
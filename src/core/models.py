@@ -1,6 +1,9 @@
+import warnings
+import numpy as np
 import torch
 import torch.nn as nn
-from typing import Optional, List
+from torch.nn.utils import parameters_to_vector
+from typing import Dict, Optional, List, Sequence
 
 
 class SensorModel(nn.Module):
@@ -18,49 +21,333 @@ class SensorModel(nn.Module):
         return self.model(x)
 
 
+class BatchedSensorModel(nn.Module):
+    """A stack of independent SensorModels evaluated as one batched matmul
+
+    Parameters carry a leading sensor dimension, so row `i` holds exactly the
+    weights of a `SensorModel`; summing per-row losses keeps the rows'
+    gradients (and Adam updates) independent.
+    """
+
+    def __init__(self, num_models: int, input_size: int = 24, hidden_size: int = 48,
+                 generator: Optional[torch.Generator] = None):
+        super().__init__()
+        self.num_models = num_models
+        self.sizes = [input_size, hidden_size, hidden_size // 2, 1]
+
+        self.weights = nn.ParameterList()
+        self.biases = nn.ParameterList()
+        for fan_in, fan_out in zip(self.sizes[:-1], self.sizes[1:]):
+            # Same bounds as nn.Linear's default initialisation
+            bound = 1 / fan_in ** 0.5
+            weight = torch.empty(num_models, fan_in, fan_out).uniform_(-bound, bound, generator=generator)
+            bias = torch.empty(num_models, 1, fan_out).uniform_(-bound, bound, generator=generator)
+            self.weights.append(nn.Parameter(weight))
+            self.biases.append(nn.Parameter(bias))
+
+    def forward(self, x: torch.Tensor, rows: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """Map (num_models, batch, input_size) windows to (num_models, batch, 1)
+
+        With `rows`, `x` holds windows for those models only.
+        """
+        last = len(self.weights) - 1
+        for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            if rows is not None:
+                weight, bias = weight[rows], bias[rows]
+            x = torch.baddbmm(bias, x, weight)
+            if i < last:
+                x = torch.relu(x)
+        return x
+
+    def _flatten(self, rows: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """(num_models, P) parameters in `SensorModel` parameter order"""
+        parts = []
+        for weight, bias in zip(self.weights, self.biases):
+            if rows is not None:
+                weight, bias = weight[rows], bias[rows]
+            parts.append(weight.transpose(1, 2).reshape(len(weight), -1))
+            parts.append(bias.reshape(len(bias), -1))
+        return torch.cat(parts, dim=1)
+
+    def flat_parameters(self, rows: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """Contiguous (num_models, P) copy; row `i` matches `parameters_to_vector` of a SensorModel
+
+        With `rows`, only those models are copied.
+        """
+        with torch.no_grad():
+            return self._flatten(rows)
+
+    def load_flat_parameters(self, flat: torch.Tensor, rows: Optional[torch.Tensor] = None):
+        """Load (num_models, P) rows, or broadcast a single (P,) vector to every row
+
+        With `rows`, only those rows are overwritten from a (len(rows), P) block.
+        """
+        count = self.num_models if rows is None else len(rows)
+        flat = flat.expand(count, -1)
+        offset = 0
+        with torch.no_grad():
+            for weight, bias in zip(self.weights, self.biases):
+                _, fan_in, fan_out = weight.shape
+                size = fan_in * fan_out
+                block = flat[:, offset:offset + size].reshape(count, fan_out, fan_in).transpose(1, 2)
+                offset += size
+                bias_block = flat[:, offset:offset + fan_out].reshape(count, 1, fan_out)
+                offset += fan_out
+                if rows is None:
+                    weight.copy_(block)
+                    bias.copy_(bias_block)
+                else:
+                    weight[rows] = block
+                    bias[rows] = bias_block
+
+    def proximal_term(self, anchor: torch.Tensor, rows: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """Sum over rows (or just `rows`) of ||w_row - anchor||^2, differentiable w.r.t. the weights"""
+        return (self._flatten(rows) - anchor).pow(2).sum()
+
+    def row_state_dict(self, row: int) -> dict:
+        """State dict of one row, loadable into a `SensorModel`"""
+        state = {}
+        for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            state[f"model.{2 * i}.weight"] = weight[row].detach().t().clone()
+            state[f"model.{2 * i}.bias"] = bias[row, 0].detach().clone()
+        return state
+
+    def load_row(self, row: int, state_dict: dict):
+        """Overwrite one row with a `SensorModel` state dict"""
+        with torch.no_grad():
+            for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+                weight[row].copy_(state_dict[f"model.{2 * i}.weight"].t())
+                bias[row, 0].copy_(state_dict[f"model.{2 * i}.bias"])
+
+
+class WindowReplayBuffer:
+    """Preallocated ring of readings exposing training windows as strided views"""
+
+    def __init__(self, window_size: int = 24, capacity: int = 256):
+        self.window_size = window_size
+        self.capacity = capacity
+        self._span = capacity + window_size
+
+        # Each reading is written twice so the latest span is always contiguous
+        self._data = torch.zeros(2 * self._span)
+        self._pos = 0
+        self._count = 0
+
+    def append(self, value: float):
+        """Add a single reading to the ring"""
+        self._data[self._pos] = value
+        self._data[self._pos + self._span] = value
+        self._pos = (self._pos + 1) % self._span
+        self._count += 1
+
+    def __len__(self) -> int:
+        """Number of complete (window, target) pairs available"""
+        return max(0, min(self._count, self._span) - self.window_size)
+
+    def series(self) -> torch.Tensor:
+        """View of the retained readings, oldest first"""
+        n = min(self._count, self._span)
+        end = self._pos + self._span
+        return self._data[end - n:end]
+
+    def windows(self) -> torch.Tensor:
+        """Zero-copy (n, window_size + 1) view of windows followed by their target"""
+        return self.series().unfold(0, self.window_size + 1, 1)
+
+    def state_dict(self) -> Dict:
+        """Ring contents and position"""
+        return {'data': self._data, 'pos': self._pos, 'count': self._count}
+
+    def load_state_dict(self, state: Dict):
+        """Restore from `state_dict`"""
+        self._data.copy_(torch.as_tensor(state['data']))
+        self._pos = state['pos']
+        self._count = state['count']
+
+
 class PatternPredictor:
-    def __init__(self):
-        self.model = SensorModel()
+    def __init__(self, window_size: int = 24, streaming: bool = False,
+                 replay_size: int = 256, batch_size: Optional[int] = None,
+                 steps_per_reading: int = 1, seed: Optional[int] = None,
+                 quantize: bool = False):
+        self.window_size = window_size
+        self.model = SensorModel(input_size=window_size)
         self.optimizer = torch.optim.Adam(self.model.parameters(), lr=0.001)
         self.criterion = nn.MSELoss()
         self.training_history: List[float] = []
 
-    def train(self, data: List[float], window_size: int = 24):
-        """Train the model on recent data"""
+        # Streaming mode trains on a bounded replay window fed one reading at a time
+        self.streaming = streaming
+        self.batch_size = batch_size
+        self.steps_per_reading = steps_per_reading
+        self.replay = WindowReplayBuffer(window_size, replay_size) if streaming else None
+        self._generator = torch.Generator()
+        if seed is not None:
+            self._generator.manual_seed(seed)
+
+        # FedProx anchor: local steps are pulled towards the last global model
+        self.proximal_mu = 0.0
+        self.proximal_anchor: Optional[torch.Tensor] = None
+
+        # Bumped on every weight change so cached inference copies know to refresh
+        self.version = 0
+        self.quantize = quantize
+        self._inference_model: Optional[nn.Module] = None
+        self._inference_version = -1
+
+    def train(self, data: Sequence[float], window_size: Optional[int] = None):
+        """Train the model on recent data (windows default to the model's `window_size`)"""
+        window_size = window_size if window_size is not None else self.window_size
         if len(data) < window_size + 1:
             return
 
-        x_data = []
-        y_data = []
+        series = torch.from_numpy(np.asarray(data, dtype=np.float32))
+        self.train_windows(series.unfold(0, window_size + 1, 1))
 
-        for i in range(len(data) - window_size):
-            x_data.append(data[i:i + window_size])
-            y_data.append(data[i + window_size])
+    def observe(self, value: float, train: bool = True):
+        """Append a reading to the replay buffer and take the configured training steps
 
-        x_tensor = torch.FloatTensor(x_data)
-        y_tensor = torch.FloatTensor(y_data)
+        With `train=False` the reading is only buffered.
+        """
+        if self.replay is None:
+            raise RuntimeError("observe() requires a predictor created with streaming=True")
+
+        self.replay.append(value)
+        available = len(self.replay)
+        if available == 0 or not train:
+            return
+
+        windows = self.replay.windows()
+        for _ in range(self.steps_per_reading):
+            if self.batch_size is not None and self.batch_size < available:
+                idx = torch.randint(available, (self.batch_size,), generator=self._generator)
+                batch = windows[idx]
+            else:
+                batch = windows
+            self.train_windows(batch)
+
+    def train_windows(self, windows: torch.Tensor):
+        """Run a single optimisation step on (n, window_size + 1) windows ending in their target"""
+        x, y = windows[:, :-1], windows[:, -1:]
 
         self.model.train()
         self.optimizer.zero_grad()
 
-        outputs = self.model(x_tensor)
-        loss = self.criterion(outputs, y_tensor.unsqueeze(1))
+        outputs = self.model(x)
+        loss = self.criterion(outputs, y)
+        if self.proximal_anchor is not None and self.proximal_mu > 0:
+            params = parameters_to_vector(self.model.parameters())
+            loss = loss + self.proximal_mu / 2 * (params - self.proximal_anchor).pow(2).sum()
 
         loss.backward()
         self.optimizer.step()
+        self.version += 1
 
         self.training_history.append(loss.item())
 
-    def predict(self, data: List[float], window_size: int = 24) -> Optional[float]:
-        """Predict next value based on recent data"""
+    def get_flat_parameters(self) -> torch.Tensor:
+        """Model parameters as one contiguous vector"""
+        return parameters_to_vector(self.model.parameters()).detach().clone()
+
+    def set_flat_parameters(self, vector: torch.Tensor):
+        """Overwrite model parameters from a flat vector"""
+        # Copy rather than vector_to_parameters, which would leave the weights
+        # as views into `vector` (shared, e.g., by every client after a round)
+        offset = 0
+        with torch.no_grad():
+            for param in self.model.parameters():
+                param.copy_(vector[offset:offset + param.numel()].view_as(param))
+                offset += param.numel()
+        self.version += 1
+
+    def set_proximal(self, anchor: Optional[torch.Tensor], mu: float):
+        """Configure the FedProx proximal term for subsequent training steps"""
+        self.proximal_anchor = anchor
+        self.proximal_mu = mu
+
+    def state_dict(self) -> Dict:
+        """Weights, optimizer state, loss history, replay buffer and RNG state"""
+        return {
+            'model': self.model.state_dict(),
+            'optimizer': self.optimizer.state_dict(),
+            'training_history': {'kind': 'series', 'total': len(self.training_history),
+                                 'values': np.asarray(self.training_history, dtype=np.float64)},
+            'replay': self.replay.state_dict() if self.replay is not None else None,
+            'generator': self._generator.get_state(),
+            'proximal_mu': self.proximal_mu,
+            'proximal_anchor': self.proximal_anchor,
+            'version': self.version
+        }
+
+    def load_state_dict(self, state: Dict):
+        """Restore from `state_dict` of a predictor with the same configuration"""
+        self.model.load_state_dict(state['model'])
+        self.optimizer.load_state_dict(state['optimizer'])
+        self.training_history = [float(v) for v in state['training_history']['values']]
+        if self.replay is not None:
+            self.replay.load_state_dict(state['replay'])
+        self._generator.set_state(state['generator'])
+        self.proximal_mu = state['proximal_mu']
+        self.proximal_anchor = state['proximal_anchor']
+        self.version = state['version']
+
+    def config(self) -> Dict:
+        """Constructor arguments that reproduce this predictor's shape"""
+        return {
+            'window_size': self.window_size,
+            'streaming': self.streaming,
+            'replay_size': self.replay.capacity if self.replay is not None else 256,
+            'batch_size': self.batch_size,
+            'steps_per_reading': self.steps_per_reading,
+            'quantize': self.quantize
+        }
+
+    def inference_model(self) -> nn.Module:
+        """Model used for prediction
+
+        With `quantize=True` this is an int8 dynamically quantized copy of
+        the model, rebuilt only when the weights have changed since.
+        """
+        if not self.quantize:
+            return self.model
+        if self._inference_version != self.version:
+            with warnings.catch_warnings():
+                # Eager dynamic quantization is deprecated upstream but still functional
+                warnings.simplefilter('ignore')
+                from torch.ao.quantization import quantize_dynamic
+                model = SensorModel(self.window_size)
+                model.load_state_dict(self.model.state_dict())
+                self._inference_model = quantize_dynamic(model.eval(), {nn.Linear}, dtype=torch.qint8)
+            self._inference_version = self.version
+        return self._inference_model
+
+    def predict_batch(self, windows) -> np.ndarray:
+        """Predict the reading after each of a (batch, window_size) array of windows"""
+        x = torch.as_tensor(np.asarray(windows, dtype=np.float32))
+        with torch.inference_mode():
+            return self.inference_model()(x)[:, 0].numpy()
+
+    def predict(self, data: Sequence[float], window_size: Optional[int] = None) -> Optional[float]:
+        """Predict next value based on recent data (windows default to the model's `window_size`)"""
+        window_size = window_size if window_size is not None else self.window_size
         if len(data) < window_size:
             return None
+        return float(self.predict_batch(np.asarray(data[-window_size:])[None])[0])
 
-        self.model.eval()
-        with torch.no_grad():
-            x = torch.FloatTensor(data[-window_size:]).unsqueeze(0)
-            prediction = self.model(x)
-            return prediction.item()
+    def forecast(self, data: Sequence[float], horizon: int) -> Optional[np.ndarray]:
+        """Autoregressive `horizon`-step forecast, feeding each prediction back in"""
+        if len(data) < self.window_size:
+            return None
+
+        series = torch.empty(self.window_size + horizon)
+        series[:self.window_size] = torch.from_numpy(
+            np.asarray(data[-self.window_size:], dtype=np.float32))
+        model = self.inference_model()
+        with torch.inference_mode():
+            for step in range(horizon):
+                window = series[step:step + self.window_size].unsqueeze(0)
+                series[self.window_size + step] = model(window)[0, 0]
+        return series[self.window_size:].numpy()
 
     def get_training_metrics(self) -> dict:
         """Get model training metrics"""
@@ -71,4 +358,4 @@ class PatternPredictor:
             'average_loss': sum(self.training_history) / len(self.training_history),
             'loss_trend': (self.training_history[-1] - self.training_history[0])
             if len(self.training_history) > 1 else 0
-        }
\ No newline at end of file
+        }
@@ -1,10 +1,62 @@
 import numpy as np
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Mean and spread of the base temperature for each pattern type
+BASE_TEMPERATURES = {
+    'factory': (25, 2),
+    'office': (22, 1),
+    'outdoor': (20, 3)
+}
+
+
+def _event_column(event: str, start_hour: int, duration: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Hour-of-day deterministic impact and stochastic activity of a single event"""
+    hours = np.arange(24)
+    active = (start_hour <= hours) & (hours < start_hour + duration)
+    phase = (hours - start_hour) / duration
+
+    if 'startup' in event:
+        return np.where(active, 4 * np.sin(np.pi * phase), 0), np.zeros(24)
+    if 'shutdown' in event:
+        return np.where(active, -2 * np.sin(np.pi * phase), 0), np.zeros(24)
+    if 'hvac' in event:
+        return np.where(active, 2 * np.cos(2 * np.pi * phase), 0), np.zeros(24)
+    # Any other event adds N(1, 0.2) while active
+    return np.zeros(24), active.astype(float)
+
+
+def event_impacts(impact: np.ndarray, counts: np.ndarray, hours,
+                  rng: np.random.Generator) -> np.ndarray:
+    """Event impacts for arrays of hours from compiled tables
+
+    `impact` and `counts` are (..., 24) tables; the result has shape
+    `np.shape(hours) + impact.shape[:-1]`. The sum of k active N(1, 0.2)
+    events is drawn directly as N(k, 0.2 * sqrt(k)).
+    """
+    hour_of_day = np.asarray(hours) % 24
+    lead = impact.ndim - 1
+    order = list(range(lead, lead + hour_of_day.ndim)) + list(range(lead))
+    deterministic = impact[..., hour_of_day].transpose(order)
+    active = counts[..., hour_of_day].transpose(order)
+    return deterministic + rng.normal(active, 0.2 * np.sqrt(active))
+
+
+def compile_event_tables(patterns: Sequence['SensorPattern']) -> Tuple[np.ndarray, np.ndarray]:
+    """Stack the compiled tables of several patterns into (len(patterns), 24) arrays"""
+    tables = [pattern.compile() for pattern in patterns]
+    return (np.stack([t[0] for t in tables]), np.stack([t[1] for t in tables]))
+
 
 class SensorPattern:
-    """Defines specific patterns for each sensor type"""
+    """Defines specific patterns for each sensor type
+
+    Known events are compiled into hour-of-day tables on first use: a 24xK
+    array of per-event deterministic impacts and a count of active
+    stochastic events per hour. Lookups for any batch of hours are then a
+    single indexing operation.
+    """
 
-    def __init__(self, pattern_type: str):
+    def __init__(self, pattern_type: str, seed: Optional[int] = None):
         self.pattern_type = pattern_type
         self.known_events = {
             'factory': {
@@ -24,26 +76,60 @@ class SensorPattern:
             }
         }
 
+        # Without a seed, draw one from the global RNG so np.random.seed still applies
+        if seed is None:
+            seed = int(np.random.randint(2 ** 31))
+        self.rng = np.random.default_rng(seed)
+
+        self.event_names: List[str] = []
+        self.event_table: Optional[np.ndarray] = None
+        self._impact: Optional[np.ndarray] = None
+        self._counts: Optional[np.ndarray] = None
+
+    def compile(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Hour-of-day deterministic impact and stochastic event count tables"""
+        if self._impact is None:
+            events = self.known_events.get(self.pattern_type, {})
+            columns = [_event_column(event, start_hour, duration)
+                       for event, (start_hour, duration) in events.items()]
+            self.event_names = list(events)
+            self.event_table = (np.stack([c[0] for c in columns], axis=1)
+                                if columns else np.zeros((24, 0)))
+            self._impact = self.event_table.sum(axis=1)
+            self._counts = (np.sum([c[1] for c in columns], axis=0)
+                            if columns else np.zeros(24))
+        return self._impact, self._counts
+
     def get_event_impact(self, hour: int) -> float:
         """Calculate temperature impact of known events"""
-        events = self.known_events.get(self.pattern_type, {})
-        impact = 0
-
-        for event, (start_hour, duration) in events.items():
-            if start_hour <= hour % 24 < start_hour + duration:
-                if 'startup' in event:
-                    impact += 4 * np.sin(np.pi * ((hour % 24) - start_hour) / duration)
-                elif 'shutdown' in event:
-                    impact -= 2 * np.sin(np.pi * ((hour % 24) - start_hour) / duration)
-                elif 'hvac' in event:
-                    impact += 2 * np.cos(2 * np.pi * ((hour % 24) - start_hour) / duration)
-                else:
-                    impact += np.random.normal(1, 0.2)
-
-        return impact
+        impact, counts = self.compile()
+        h = hour % 24
+        if counts[h]:
+            return float(impact[h] + self.rng.normal(counts[h], 0.2 * np.sqrt(counts[h])))
+        return float(impact[h])
+
+    def get_event_impacts(self, hours) -> np.ndarray:
+        """Event impacts for an array of hours in one lookup"""
+        impact, counts = self.compile()
+        return event_impacts(impact, counts, hours, self.rng)
+
+    def state_dict(self) -> Dict:
+        """Events of this pattern type and the event RNG state"""
+        return {
+            'events': dict(self.known_events.get(self.pattern_type, {})),
+            'rng': self.rng.bit_generator.state
+        }
+
+    def load_state_dict(self, state: Dict):
+        """Restore from `state_dict`; tables are recompiled on next use"""
+        self.known_events[self.pattern_type] = {
+            name: tuple(timing) for name, timing in state['events'].items()}
+        self.rng.bit_generator.state = state['rng']
+        self._impact = None
 
     def add_custom_event(self, name: str, start_hour: int, duration: int):
         """Add a custom event to the pattern"""
         if self.pattern_type not in self.known_events:
             self.known_events[self.pattern_type] = {}
-        self.known_events[self.pattern_type][name] = (start_hour, duration)
\ No newline at end of file
+        self.known_events[self.pattern_type][name] = (start_hour, duration)
+        self._impact = None
@@ -1,30 +1,254 @@
-from typing import Optional
+import math
+from bisect import bisect_right
+from typing import Dict, Optional, Sequence, Tuple, Union
+import numpy as np
+
+# Privacy scores live in [50, 100]; ten equal-width bins
+SCORE_EDGES = np.linspace(50, 100, 11)
+# Two bins for a boolean stream: not shared / shared
+FLAG_EDGES = np.array([0.0, 0.5, 1.0])
+
+
+class WindowedHistogram:
+    """Histogram and mean of the last `window` values, updated in O(1)
+
+    One slot of a ring is overwritten per `add`; the evicted value's bin
+    count and sum are subtracted, so no history is ever scanned. With
+    `shape` several series (e.g. a whole sensor fleet) advance together;
+    a single series is kept in plain Python lists, which is faster for
+    one value at a time.
+    """
+
+    def __init__(self, edges: Sequence[float], window: int = 168, shape: Tuple[int, ...] = ()):
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.edges = np.asarray(edges, dtype=float)
+        self.window = window
+        self.shape = tuple(shape)
+        self.bins = len(self.edges) - 1
+        self.seen = 0
+
+        if self.shape:
+            series = int(np.prod(self.shape))
+            self._rows = np.arange(series)
+            self._slots = np.zeros((window, series), dtype=np.int64)
+            self._values = np.zeros((window, series))
+            self._counts = np.zeros((series, self.bins), dtype=np.int64)
+            self._sum = np.zeros(series)
+        else:
+            self._inner_edges = self.edges[1:-1].tolist()
+            self._slots = [0] * window
+            self._values = [0.0] * window
+            self._counts = [0] * self.bins
+            self._sum = 0.0
+
+    def add(self, values: Union[float, np.ndarray]):
+        """Add one value per series, evicting the oldest once the window is full"""
+        if not self.shape:
+            self._add_scalar(float(values))
+            return
+
+        values = np.broadcast_to(np.asarray(values, dtype=float), self.shape).reshape(-1)
+        slot = self.seen % self.window
+        if self.seen >= self.window:
+            self._counts[self._rows, self._slots[slot]] -= 1
+            self._sum -= self._values[slot]
+
+        bins = np.clip(np.searchsorted(self.edges, values, side='right') - 1, 0, self.bins - 1)
+        self._counts[self._rows, bins] += 1
+        self._sum += values
+        self._slots[slot] = bins
+        self._values[slot] = values
+        self.seen += 1
+
+    def _add_scalar(self, value: float):
+        slot = self.seen % self.window
+        if self.seen >= self.window:
+            self._counts[self._slots[slot]] -= 1
+            self._sum -= self._values[slot]
+
+        bin_index = bisect_right(self._inner_edges, value)
+        self._counts[bin_index] += 1
+        self._sum += value
+        self._slots[slot] = bin_index
+        self._values[slot] = value
+        self.seen += 1
+
+    def __len__(self) -> int:
+        return min(self.seen, self.window)
+
+    def counts(self) -> np.ndarray:
+        """Per-bin counts over the window, shaped `shape + (bins,)`"""
+        return np.asarray(self._counts).reshape(self.shape + (self.bins,))
+
+    def mean(self) -> Union[float, np.ndarray]:
+        """Mean over the window (0 before the first value)"""
+        if not self.shape:
+            return self._sum / max(1, len(self))
+        return (self._sum / max(1, len(self))).reshape(self.shape)
+
+    def state_dict(self) -> Dict:
+        return {'seen': self.seen, 'slots': np.asarray(self._slots, dtype=np.int64),
+                'values': np.asarray(self._values, dtype=float),
+                'counts': np.asarray(self._counts, dtype=np.int64),
+                'sum': np.asarray(self._sum, dtype=float)}
+
+    def load_state_dict(self, state: Dict):
+        """Restore from `state_dict` of a histogram with the same edges, window and shape"""
+        self.seen = state['seen']
+        if self.shape:
+            self._slots[:] = state['slots']
+            self._values[:] = state['values']
+            self._counts[:] = state['counts']
+            self._sum[:] = state['sum']
+        else:
+            self._slots = np.asarray(state['slots']).tolist()
+            self._values = np.asarray(state['values']).tolist()
+            self._counts = np.asarray(state['counts']).tolist()
+            self._sum = float(state['sum'])
+
+
+class PrivacyAccountant:
+    """Differential-privacy budget of one or more sensors, updated in O(1)
+
+    Every release (a shared pattern or model update) spends its epsilon
+    and delta. Basic composition gives `sum(eps)`; the advanced
+    composition bound `sqrt(2 ln(1/slack) * sum(eps^2)) + sum(eps * (e^eps - 1))`
+    (at the cost of an extra `slack` in delta) is usually far tighter for
+    many small releases. Only running sums are kept, so the spent budget
+    is available at any time without a ledger of past releases.
+    """
+
+    def __init__(self, budget: Optional[float] = None, slack: float = 1e-5,
+                 shape: Tuple[int, ...] = ()):
+        if budget is not None and budget <= 0:
+            raise ValueError("budget must be positive")
+        if not 0 < slack < 1:
+            raise ValueError("slack must be in (0, 1)")
+        self.budget = budget
+        self.slack = slack
+        self.shape = tuple(shape)
+
+        # Releases, sum(eps), sum(eps^2), sum(eps * (e^eps - 1)) and sum(delta)
+        if self.shape:
+            self._sums = np.zeros((5, int(np.prod(self.shape))))
+        else:
+            self._sums = [0.0] * 5
+
+    def spend(self, epsilon: Union[float, np.ndarray], delta: float = 0.0,
+              mask: Optional[np.ndarray] = None):
+        """Record one release per series (only where `mask` is set)"""
+        if not self.shape:
+            if mask is None or mask:
+                epsilon = float(epsilon)
+                sums = self._sums
+                sums[0] += epsilon > 0
+                sums[1] += epsilon
+                sums[2] += epsilon * epsilon
+                sums[3] += epsilon * math.expm1(epsilon)
+                sums[4] += delta
+            return
+
+        epsilon = np.broadcast_to(np.asarray(epsilon, dtype=float), self.shape).reshape(-1)
+        delta = np.broadcast_to(np.asarray(delta, dtype=float), self.shape).reshape(-1)
+        if mask is not None:
+            mask = np.broadcast_to(mask, self.shape).reshape(-1)
+            epsilon = np.where(mask, epsilon, 0.0)
+            delta = np.where(mask, delta, 0.0)
+        self._sums += np.stack([epsilon > 0, epsilon, epsilon * epsilon,
+                                epsilon * np.expm1(epsilon), delta])
+
+    def _columns(self) -> np.ndarray:
+        return np.asarray(self._sums, dtype=float).reshape(5, -1)
+
+    def _unwrap(self, values: np.ndarray) -> Union[float, np.ndarray]:
+        return float(values[0]) if not self.shape else values.reshape(self.shape)
+
+    def _spent(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Flat epsilon and delta spent under the tighter composition bound"""
+        _, total, squares, excess, delta = self._columns()
+        advanced = np.sqrt(2 * np.log(1 / self.slack) * squares) + excess
+        tighter = advanced < total
+        return np.where(tighter, advanced, total), delta + np.where(tighter, self.slack, 0.0)
+
+    def releases(self) -> Union[float, np.ndarray]:
+        """Number of releases that spent any epsilon"""
+        return self._unwrap(self._columns()[0])
+
+    def epsilon(self) -> Union[float, np.ndarray]:
+        """Total epsilon spent, the tighter of basic and advanced composition"""
+        return self._unwrap(self._spent()[0])
+
+    def delta(self) -> Union[float, np.ndarray]:
+        """Total delta spent, including the advanced-composition slack when it is used"""
+        return self._unwrap(self._spent()[1])
+
+    def remaining(self) -> Union[float, np.ndarray]:
+        """Budget left (infinite without a budget)"""
+        budget = self.budget if self.budget is not None else np.inf
+        return self._unwrap(np.maximum(0.0, budget - self._spent()[0]))
+
+    def exhausted(self) -> Union[bool, np.ndarray]:
+        """Whether the budget has been used up"""
+        budget = self.budget if self.budget is not None else np.inf
+        spent = self._spent()[0] >= budget
+        return bool(spent[0]) if not self.shape else spent.reshape(self.shape)
+
+    def state_dict(self) -> Dict:
+        return {'sums': self._columns()}
+
+    def load_state_dict(self, state: Dict):
+        """Restore from `state_dict` of an accountant with the same shape"""
+        if self.shape:
+            self._sums[:] = state['sums']
+        else:
+            self._sums = np.asarray(state['sums'], dtype=float).reshape(-1).tolist()
 
 
 class PrivacyMetrics:
-    """Tracks privacy preservation metrics"""
+    """Tracks privacy preservation metrics
 
-    def __init__(self):
+    Everything is a running aggregate: counters, the score total, windowed
+    histograms of recent privacy scores and sharing decisions, and an
+    epsilon accountant charged `pattern_epsilon` (and `pattern_delta`) per
+    shared pattern, with `slack` as its advanced-composition delta. Raw
+    readings are never retained, and every update and query is O(1).
+    """
+
+    def __init__(self, window: int = 168, pattern_epsilon: float = 0.1,
+                 epsilon_budget: Optional[float] = None, pattern_delta: float = 0.0,
+                 slack: float = 1e-5):
         self.raw_data_saved = 0
         self.patterns_shared = 0
         self.privacy_score = 100
-        self.data_sharing_history = []
+        self.pattern_epsilon = pattern_epsilon
+        self.pattern_delta = pattern_delta
+        self._privacy_score_total = 0.0
+        self._privacy_score_min = 100.0
+
+        self.score_window = WindowedHistogram(SCORE_EDGES, window)
+        self.sharing_window = WindowedHistogram(FLAG_EDGES, window)
+        self.accountant = PrivacyAccountant(epsilon_budget, slack)
 
     def update(self, data_point: float, pattern_shared: bool):
-        """Update privacy metrics"""
+        """Update privacy metrics (the reading itself is not stored)"""
         self.raw_data_saved += 1
         if pattern_shared:
             self.patterns_shared += 1
+            self.accountant.spend(self.pattern_epsilon, self.pattern_delta)
 
         # Modified privacy score calculation to maintain higher scores
         sharing_ratio = self.patterns_shared / max(1, self.raw_data_saved)
         self.privacy_score = max(50, 100 * (1 - sharing_ratio / 2))
+        self._privacy_score_total += self.privacy_score
+        self._privacy_score_min = min(self._privacy_score_min, self.privacy_score)
+
+        self.score_window.add(self.privacy_score)
+        self.sharing_window.add(float(pattern_shared))
 
-        self.data_sharing_history.append({
-            'data_point': data_point,
-            'pattern_shared': pattern_shared,
-            'privacy_score': self.privacy_score
-        })
+    def record_model_update(self, epsilon: float, delta: float = 0.0):
+        """Charge the accountant for a model update sent to the federation"""
+        self.accountant.spend(epsilon, delta)
 
     def get_metrics(self) -> dict:
         """Get current privacy metrics"""
@@ -32,14 +256,47 @@ class PrivacyMetrics:
             'privacy_score': self.privacy_score,
             'raw_data_saved': self.raw_data_saved,
             'patterns_shared': self.patterns_shared,
-            'sharing_ratio': self.patterns_shared / max(1, self.raw_data_saved)
+            'sharing_ratio': self.patterns_shared / max(1, self.raw_data_saved),
+            'epsilon': self.accountant.epsilon(),
+            'budget_exhausted': self.accountant.exhausted()
         }
 
+    def state_dict(self) -> Dict:
+        """Counters, windowed histograms and accountant sums"""
+        return {
+            'raw_data_saved': self.raw_data_saved,
+            'patterns_shared': self.patterns_shared,
+            'privacy_score': self.privacy_score,
+            'privacy_score_total': self._privacy_score_total,
+            'privacy_score_min': self._privacy_score_min,
+            'score_window': self.score_window.state_dict(),
+            'sharing_window': self.sharing_window.state_dict(),
+            'accountant': self.accountant.state_dict()
+        }
+
+    def load_state_dict(self, state: Dict):
+        """Restore from `state_dict`"""
+        self.raw_data_saved = state['raw_data_saved']
+        self.patterns_shared = state['patterns_shared']
+        self.privacy_score = state['privacy_score']
+        self._privacy_score_total = state['privacy_score_total']
+        self._privacy_score_min = state['privacy_score_min']
+        self.score_window.load_state_dict(state['score_window'])
+        self.sharing_window.load_state_dict(state['sharing_window'])
+        self.accountant.load_state_dict(state['accountant'])
+
     def analyze_sharing_patterns(self) -> dict:
         """Analyze data sharing patterns"""
         return {
             'total_data_points': self.raw_data_saved,
             'total_patterns_shared': self.patterns_shared,
-            'average_privacy_score': sum(d['privacy_score'] for d in self.data_sharing_history) / len(
-                self.data_sharing_history) if self.data_sharing_history else 100
-        }
\ No newline at end of file
+            'average_privacy_score': self._privacy_score_total / self.raw_data_saved
+            if self.raw_data_saved else 100,
+            'min_privacy_score': self._privacy_score_min,
+            'recent_privacy_score': self.score_window.mean() if self.raw_data_saved else 100,
+            'recent_sharing_ratio': self.sharing_window.mean(),
+            'score_histogram': self.score_window.counts().tolist(),
+            'epsilon': self.accountant.epsilon(),
+            'delta': self.accountant.delta(),
+            'epsilon_remaining': self.accountant.remaining()
+        }
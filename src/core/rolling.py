@@ -0,0 +1,166 @@
+from collections import deque
+from typing import Deque, Dict, Sequence, Tuple
+import numpy as np
+
+
+class _WindowState:
+    """Accumulators for one trailing window
+
+    `total` and `squares` are sums of readings (shifted by the stream's
+    first value to limit cancellation), `weighted` is the sum of
+    index-in-window times reading for the regression slope, and the two
+    deques hold (tick, value) candidates for the window min and max.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.count = 0
+        self.total = 0.0
+        self.squares = 0.0
+        self.weighted = 0.0
+        self.minima: Deque[Tuple[int, float]] = deque()
+        self.maxima: Deque[Tuple[int, float]] = deque()
+
+
+class RollingStats:
+    """Constant-time mean, variance, min/max and trend over trailing windows
+
+    Several window sizes (e.g. 24/48/168 hours) are maintained at once from
+    one ring of the last `max(windows)` readings; each `update` touches
+    every window's accumulators in O(1) (amortized for min/max).
+    """
+
+    def __init__(self, windows: Sequence[int] = (24,)):
+        if not windows or min(windows) < 1:
+            raise ValueError("windows must be positive sizes")
+        self.windows = tuple(sorted(set(windows)))
+        self._states: Dict[int, _WindowState] = {w: _WindowState(w) for w in self.windows}
+        self._ring = np.zeros(max(self.windows))
+        self._ticks = 0
+        self._shift = 0.0
+
+    def __len__(self) -> int:
+        return self._ticks
+
+    def update(self, value: float):
+        """Add one reading to every window"""
+        value = float(value)
+        if self._ticks == 0:
+            self._shift = value
+        shifted = value - self._shift
+        tick = self._ticks
+        capacity = len(self._ring)
+
+        for state in self._states.values():
+            if state.count == state.size:
+                old = self._ring[(tick - state.size) % capacity]
+                # Remaining readings move one index down; the new one lands last
+                state.weighted += -(state.total - old) + (state.size - 1) * shifted
+                state.total += shifted - old
+                state.squares += shifted * shifted - old * old
+            else:
+                state.weighted += state.count * shifted
+                state.total += shifted
+                state.squares += shifted * shifted
+                state.count += 1
+
+            while state.minima and state.minima[-1][1] >= value:
+                state.minima.pop()
+            state.minima.append((tick, value))
+            while state.minima[0][0] <= tick - state.size:
+                state.minima.popleft()
+
+            while state.maxima and state.maxima[-1][1] <= value:
+                state.maxima.pop()
+            state.maxima.append((tick, value))
+            while state.maxima[0][0] <= tick - state.size:
+                state.maxima.popleft()
+
+        self._ring[tick % capacity] = shifted
+        self._ticks += 1
+
+    def extend(self, values: Sequence[float]):
+        """Add several readings in order"""
+        for value in values:
+            self.update(value)
+
+    def ready(self, window: int) -> bool:
+        """Whether `window` readings have been seen"""
+        return window in self._states and self._states[window].count == window
+
+    def mean(self, window: int) -> float:
+        state = self._states[window]
+        return self._shift + state.total / state.count
+
+    def variance(self, window: int) -> float:
+        """Population variance, as `np.var`"""
+        state = self._states[window]
+        mean = state.total / state.count
+        return max(0.0, state.squares / state.count - mean * mean)
+
+    def std(self, window: int) -> float:
+        return float(np.sqrt(self.variance(window)))
+
+    def min(self, window: int) -> float:
+        return self._states[window].minima[0][1]
+
+    def max(self, window: int) -> float:
+        return self._states[window].maxima[0][1]
+
+    def trend(self, window: int) -> float:
+        """Least-squares slope over the window, as `np.polyfit(..., 1)[0]`"""
+        state = self._states[window]
+        n = state.count
+        if n < 2:
+            return 0.0
+        index_sum = n * (n - 1) / 2
+        index_squares = (n - 1) * n * (2 * n - 1) / 6
+        return (n * state.weighted - index_sum * state.total) / (n * index_squares - index_sum ** 2)
+
+    def values(self, window: int) -> np.ndarray:
+        """The readings currently in `window`, oldest first"""
+        count = self._states[window].count
+        capacity = len(self._ring)
+        idx = np.arange(self._ticks - count, self._ticks) % capacity
+        return self._ring[idx] + self._shift
+
+    def state_dict(self) -> Dict:
+        """Accumulators, min/max candidates and the value ring"""
+        return {
+            'ticks': self._ticks,
+            'shift': self._shift,
+            'ring': self._ring,
+            'windows': {
+                str(w): {
+                    'count': s.count, 'total': s.total, 'squares': s.squares, 'weighted': s.weighted,
+                    'minima': [list(item) for item in s.minima],
+                    'maxima': [list(item) for item in s.maxima]
+                }
+                for w, s in self._states.items()
+            }
+        }
+
+    def load_state_dict(self, state: Dict):
+        """Restore from `state_dict` of a RollingStats with the same windows"""
+        self._ticks = state['ticks']
+        self._shift = state['shift']
+        self._ring[:] = state['ring']
+        for w, saved in state['windows'].items():
+            window = self._states[int(w)]
+            window.count = saved['count']
+            window.total = saved['total']
+            window.squares = saved['squares']
+            window.weighted = saved['weighted']
+            window.minima = deque((int(t), float(v)) for t, v in saved['minima'])
+            window.maxima = deque((int(t), float(v)) for t, v in saved['maxima'])
+
+    def summary(self, window: int) -> Dict[str, float]:
+        """Every statistic of one window"""
+        return {
+            'mean': self.mean(window),
+            'std': self.std(window),
+            'variance': self.variance(window),
+            'min': self.min(window),
+            'max': self.max(window),
+            'trend': self.trend(window)
+        }
@@ -0,0 +1,194 @@
+from typing import Dict, Optional
+import numpy as np
+
+
+class PageHinkley:
+    """Page-Hinkley test for an increase in the mean of several streams at once
+
+    Each stream keeps its running mean and the cumulative deviation
+    `sum(x - mean - delta)`; a change is signalled when that sum rises
+    more than `threshold` above its running minimum, after which the
+    stream's test restarts.
+    """
+
+    def __init__(self, delta: float = 0.005, threshold: float = 0.5, size: int = 0):
+        if threshold <= 0:
+            raise ValueError("threshold must be positive")
+        self.delta = delta
+        self.threshold = threshold
+        self.resize(size)
+
+    def resize(self, size: int):
+        """Reset the test for `size` streams"""
+        self.count = np.zeros(size, dtype=np.int64)
+        self.mean = np.zeros(size)
+        self.cumulative = np.zeros(size)
+        self.minimum = np.zeros(size)
+
+    def update(self, values: np.ndarray, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Add one value per stream (only where `mask` is set); returns where a change was detected"""
+        active = np.ones(len(self.count), dtype=bool) if mask is None else mask
+        values = np.where(active, values, 0.0)
+        self.count += active
+        self.mean += np.where(active, (values - self.mean) / np.maximum(self.count, 1), 0.0)
+        self.cumulative += np.where(active, values - self.mean - self.delta, 0.0)
+        np.minimum(self.minimum, self.cumulative, out=self.minimum)
+
+        detected = active & (self.cumulative - self.minimum > self.threshold)
+        for array in (self.count, self.mean, self.cumulative, self.minimum):
+            array[detected] = 0
+        return detected
+
+    def state_dict(self) -> Dict:
+        return {'count': self.count, 'mean': self.mean,
+                'cumulative': self.cumulative, 'minimum': self.minimum}
+
+    def load_state_dict(self, state: Dict):
+        self.count = np.array(state['count'], dtype=np.int64)
+        self.mean = np.array(state['mean'], dtype=float)
+        self.cumulative = np.array(state['cumulative'], dtype=float)
+        self.minimum = np.array(state['minimum'], dtype=float)
+
+
+class TrainingScheduler:
+    """Decides each hour which sensors take a training step
+
+    Every tick, each sensor's relative error `|prediction - reading| / |reading|`
+    (its latest prediction against the reading just observed) updates a
+    smoothed error and a Page-Hinkley drift test. A sensor is due for
+    training while it is warming up (fewer than `warmup` scored
+    predictions, so sensors that are never scored always train), when its
+    smoothed error exceeds `error_threshold`, after drift is detected
+    (until it next trains), or after `max_idle` ticks without training.
+    At most `budget` due sensors train per tick: drifting sensors first,
+    then the highest error, then the longest idle. `report()` gives the
+    training steps saved and the error of the sensors that were skipped.
+    """
+
+    def __init__(self, error_threshold: float = 0.1, drift_delta: float = 0.005,
+                 drift_threshold: float = 0.5, smoothing: float = 0.1,
+                 budget: Optional[int] = None, warmup: int = 24,
+                 max_idle: Optional[int] = None):
+        if error_threshold < 0:
+            raise ValueError("error_threshold must be non-negative")
+        if not 0 < smoothing <= 1:
+            raise ValueError("smoothing must be in (0, 1]")
+        if budget is not None and budget < 1:
+            raise ValueError("budget must be at least 1")
+        if max_idle is not None and max_idle < 1:
+            raise ValueError("max_idle must be at least 1")
+        self.error_threshold = error_threshold
+        self.smoothing = smoothing
+        self.budget = budget
+        self.warmup = warmup
+        self.max_idle = max_idle
+        self.drift = PageHinkley(drift_delta, drift_threshold)
+
+        self.size = 0
+        self._resize(0)
+        self.ticks = 0
+        self.train_steps = 0
+        self.possible_steps = 0
+        self.drift_events = 0
+        self.skipped_error_total = 0.0
+
+    def _resize(self, size: int):
+        self.size = size
+        self.error = np.zeros(size)
+        self.scored = np.zeros(size, dtype=np.int64)
+        self.idle = np.zeros(size, dtype=np.int64)
+        self.drifting = np.zeros(size, dtype=bool)
+        self.drift.resize(size)
+
+    def select(self, predictions: np.ndarray, readings: np.ndarray) -> np.ndarray:
+        """Sorted indices of the sensors to train this tick
+
+        `predictions` holds each sensor's latest prediction for the
+        readings just observed, NaN where there is none.
+        """
+        if len(readings) != self.size:
+            self._resize(len(readings))
+
+        error = np.abs(predictions - readings) / np.maximum(np.abs(readings), 1e-6)
+        known = ~np.isnan(error)
+        smoothed = np.where(self.scored > 0, (1 - self.smoothing) * self.error + self.smoothing * error, error)
+        self.error = np.where(known, smoothed, self.error)
+        self.scored += known
+        detected = self.drift.update(error, known)
+        self.drifting |= detected
+        self.idle += 1
+
+        warming = self.scored < self.warmup
+        due = warming | self.drifting | (self.error > self.error_threshold)
+        if self.max_idle is not None:
+            due |= self.idle >= self.max_idle
+        rows = np.flatnonzero(due)
+        if self.budget is not None and len(rows) > self.budget:
+            priority = np.where(warming, np.inf, self.error)
+            order = np.lexsort((-self.idle[rows], -priority[rows], ~self.drifting[rows]))
+            rows = np.sort(rows[order[:self.budget]])
+
+        skipped = np.ones(self.size, dtype=bool)
+        skipped[rows] = False
+        self.skipped_error_total += float(self.error[skipped].sum())
+        self.idle[rows] = 0
+        self.drifting[rows] = False
+        self.ticks += 1
+        self.train_steps += len(rows)
+        self.possible_steps += self.size
+        self.drift_events += int(detected.sum())
+        return rows
+
+    def report(self) -> Dict:
+        """Training steps run and saved, drift events and the error of skipped sensors"""
+        skipped = self.possible_steps - self.train_steps
+        scored = self.scored > 0
+        return {
+            'ticks': self.ticks,
+            'train_steps': self.train_steps,
+            'skipped_steps': skipped,
+            'compute_saved': skipped / self.possible_steps if self.possible_steps else 0.0,
+            'drift_events': self.drift_events,
+            'mean_error': float(self.error[scored].mean()) if scored.any() else None,
+            'skipped_error': self.skipped_error_total / skipped if skipped else None
+        }
+
+    def config(self) -> Dict:
+        return {
+            'error_threshold': self.error_threshold,
+            'drift_delta': self.drift.delta,
+            'drift_threshold': self.drift.threshold,
+            'smoothing': self.smoothing,
+            'budget': self.budget,
+            'warmup': self.warmup,
+            'max_idle': self.max_idle
+        }
+
+    def state_dict(self) -> Dict:
+        """Per-sensor error, drift and idle state plus the running totals"""
+        return {
+            'error': self.error,
+            'scored': self.scored,
+            'idle': self.idle,
+            'drifting': self.drifting,
+            'drift': self.drift.state_dict(),
+            'ticks': self.ticks,
+            'train_steps': self.train_steps,
+            'possible_steps': self.possible_steps,
+            'drift_events': self.drift_events,
+            'skipped_error_total': self.skipped_error_total
+        }
+
+    def load_state_dict(self, state: Dict):
+        """Restore from `state_dict`"""
+        self.error = np.array(state['error'], dtype=float)
+        self.size = len(self.error)
+        self.scored = np.array(state['scored'], dtype=np.int64)
+        self.idle = np.array(state['idle'], dtype=np.int64)
+        self.drifting = np.array(state['drifting'], dtype=bool)
+        self.drift.load_state_dict(state['drift'])
+        self.ticks = state['ticks']
+        self.train_steps = state['train_steps']
+        self.possible_steps = state['possible_steps']
+        self.drift_events = state['drift_events']
+        self.skipped_error_total = state['skipped_error_total']
@@ -1,35 +1,57 @@
-from typing import List, Dict, Tuple
+import os
+from typing import List, Dict, Tuple, Optional, Sequence
 import numpy as np
-from .patterns import SensorPattern
+from .history import HistoryBuffer
+from .patterns import BASE_TEMPERATURES, SensorPattern
 from .privacy import PrivacyMetrics
+from .rolling import RollingStats
 from .models import PatternPredictor
 
 
 class EnhancedSensor:
     """Enhanced sensor with pattern learning and privacy preservation"""
 
-    def __init__(self, name: str, location: Tuple[float, float], pattern_type: str):
+    def __init__(self, name: str, location: Tuple[float, float], pattern_type: str,
+                 predictor: Optional[PatternPredictor] = None,
+                 history_size: int = 1024, spill_dir: Optional[str] = None,
+                 pattern_windows: Sequence[int] = (24, 48, 168)):
         self.name = name
         self.location = location
+        self.spill_dir = spill_dir
         self.pattern = SensorPattern(pattern_type)
         self.privacy = PrivacyMetrics()
-        self.predictor = PatternPredictor()
-
-        # History tracking
-        self.temperature_history: List[float] = []
-        self.prediction_history: List[float] = []
-        self.accuracy_history: List[float] = [0.5]  # Start at 50% accuracy
+        self.predictor = predictor if predictor is not None else PatternPredictor()
+
+        # History tracking, bounded to the last `history_size` readings
+        self.temperature_history = HistoryBuffer(
+            history_size, self._spill_path(spill_dir, 'temperature'))
+        self.prediction_history = HistoryBuffer(
+            history_size, self._spill_path(spill_dir, 'prediction'))
+        self.accuracy_history = HistoryBuffer(
+            history_size, self._spill_path(spill_dir, 'accuracy'),
+            initial=[0.5])  # Start at 50% accuracy
         self.learned_patterns: Dict = {}
 
+        # Window statistics updated in O(1) per reading
+        self.rolling = RollingStats(pattern_windows)
+
         # Base temperature configuration
-        self.base_temp = {
-            'factory': 25 + np.random.normal(0, 2),
-            'office': 22 + np.random.normal(0, 1),
-            'outdoor': 20 + np.random.normal(0, 3)
-        }[pattern_type]
-
-    def generate_temperature(self, hour: int) -> float:
-        """Generate temperature with detailed patterns"""
+        mean, spread = BASE_TEMPERATURES[pattern_type]
+        self.base_temp = mean + np.random.normal(0, spread)
+
+    def _spill_path(self, spill_dir: Optional[str], series: str) -> Optional[str]:
+        """Location of the on-disk overflow file for one history series"""
+        if spill_dir is None:
+            return None
+        slug = ''.join(c if c.isalnum() else '_' for c in self.name.lower())
+        return os.path.join(spill_dir, f"{slug}_{series}.bin")
+
+    def generate_temperature(self, hour: int, train: bool = True) -> float:
+        """Generate temperature with detailed patterns
+
+        Pass `train=False` when the predictor is trained elsewhere, e.g. by a
+        parallel training backend.
+        """
         # Base temperature with daily cycle
         temp = self.base_temp + 3 * np.sin(2 * np.pi * hour / 24)
 
@@ -39,23 +61,54 @@ class EnhancedSensor:
         # Add noise
         temp += np.random.normal(0, 0.5)
 
+        return self.ingest_temperature(temp, train)
+
+    def ingest_temperature(self, temp: float, train: bool = True) -> float:
+        """Take in one reading, generated or replayed from recorded data"""
         self.temperature_history.append(temp)
+        self.rolling.update(temp)
 
         # Train predictor on new data
-        self.predictor.train(self.temperature_history)
+        if train:
+            self.train_predictor()
 
         return temp
 
+    def train_predictor(self):
+        """Train the predictor on history up to the latest reading"""
+        if self.predictor.streaming:
+            self.predictor.observe(self.temperature_history[-1])
+        else:
+            self.predictor.train(self.temperature_history)
+
+    def skip_training(self):
+        """Keep a streaming predictor's replay buffer current without training on the latest reading"""
+        if self.predictor.streaming:
+            self.predictor.observe(self.temperature_history[-1], train=False)
+
     def learn_patterns(self, window_size: int = 24) -> Dict:
-        """Analyze and learn patterns from recent data"""
+        """Analyze and learn patterns from recent data
+
+        Statistics come from the rolling accumulators when `window_size` is
+        one of the tracked `pattern_windows`, otherwise they are recomputed
+        from history.
+        """
         if len(self.temperature_history) < window_size:
             return {}
 
-        recent_data = self.temperature_history[-window_size:]
-
-        # Calculate actual metrics for patterns
-        mean_temp = np.mean(recent_data)
-        std_temp = np.std(recent_data)
+        recent_data = self.temperature_history.last(window_size)
+        if self.rolling.ready(window_size):
+            stats = self.rolling.summary(window_size)
+        else:
+            stats = {
+                'mean': np.mean(recent_data),
+                'std': np.std(recent_data),
+                'variance': np.var(recent_data),
+                'min': recent_data.min(),
+                'max': recent_data.max(),
+                'trend': np.polyfit(range(len(recent_data)), recent_data, 1)[0]
+            }
+        mean_temp = stats['mean']
 
         # Update accuracy based on prediction performance
         if len(self.prediction_history) > 0:
@@ -66,21 +119,23 @@ class EnhancedSensor:
             )
 
         patterns = {
-            'daily_range': (min(recent_data), max(recent_data)),
-            'variance': np.var(recent_data),
-            'trend': np.polyfit(range(len(recent_data)), recent_data, 1)[0],
-            'peak_hours': self._find_peak_hours(recent_data)
+            'daily_range': (float(stats['min']), float(stats['max'])),
+            'variance': stats['variance'],
+            'trend': stats['trend'],
+            'peak_hours': self._find_peak_hours(recent_data, mean_temp, stats['std'])
         }
 
         self.learned_patterns = patterns
         return patterns
 
-    def _find_peak_hours(self, data: List[float]) -> List[int]:
+    def multiscale_patterns(self) -> Dict[int, Dict[str, float]]:
+        """Rolling statistics of every tracked window that has filled"""
+        return {window: self.rolling.summary(window)
+                for window in self.rolling.windows if self.rolling.ready(window)}
+
+    def _find_peak_hours(self, data: np.ndarray, mean_temp: float, std_temp: float) -> List[int]:
         """Identify hours with peak temperatures"""
-        mean_temp = np.mean(data)
-        peak_hours = [i for i, temp in enumerate(data)
-                      if temp > mean_temp + np.std(data)]
-        return peak_hours
+        return np.flatnonzero(data > mean_temp + std_temp).tolist()
 
     def predict_next_temperature(self) -> float:
         """Predict next temperature value"""
@@ -89,6 +144,44 @@ class EnhancedSensor:
             self.prediction_history.append(prediction)
         return prediction if prediction is not None else self.temperature_history[-1]
 
+    def config(self) -> Dict:
+        """Constructor arguments that rebuild an equivalent (untrained) sensor"""
+        return {
+            'name': self.name,
+            'location': tuple(self.location),
+            'pattern_type': self.pattern.pattern_type,
+            'history_size': self.temperature_history.retention,
+            'spill_dir': self.spill_dir,
+            'pattern_windows': self.rolling.windows,
+            'predictor': self.predictor.config()
+        }
+
+    def state_dict(self) -> Dict:
+        """Everything that changes as the sensor runs"""
+        return {
+            'base_temp': self.base_temp,
+            'pattern': self.pattern.state_dict(),
+            'privacy': self.privacy.state_dict(),
+            'predictor': self.predictor.state_dict(),
+            'temperature_history': self.temperature_history.state_dict(),
+            'prediction_history': self.prediction_history.state_dict(),
+            'accuracy_history': self.accuracy_history.state_dict(),
+            'learned_patterns': self.learned_patterns,
+            'rolling': self.rolling.state_dict()
+        }
+
+    def load_state_dict(self, state: Dict):
+        """Restore from `state_dict` of a sensor with the same configuration"""
+        self.base_temp = state['base_temp']
+        self.pattern.load_state_dict(state['pattern'])
+        self.privacy.load_state_dict(state['privacy'])
+        self.predictor.load_state_dict(state['predictor'])
+        self.temperature_history.load_state_dict(state['temperature_history'])
+        self.prediction_history.load_state_dict(state['prediction_history'])
+        self.accuracy_history.load_state_dict(state['accuracy_history'])
+        self.learned_patterns = state['learned_patterns']
+        self.rolling.load_state_dict(state['rolling'])
+
     def get_metrics(self) -> Dict:
         """Get comprehensive sensor metrics"""
         return {
@@ -0,0 +1,79 @@
+import torch
+from typing import Dict, Optional, Type
+
+
+class AggregationStrategy:
+    """Combines stacked client parameter vectors into a global model"""
+
+    name = 'base'
+
+    # Weight of the client-side proximal term (only FedProx uses it)
+    proximal_mu = 0.0
+
+    def aggregate(self, updates: torch.Tensor, weights: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """Reduce a (clients, P) matrix to a single (P,) vector"""
+        raise NotImplementedError
+
+    def max_share(self, weights: Optional[torch.Tensor], clients: int) -> float:
+        """Largest fraction of the aggregate any one client's update contributes"""
+        if weights is None:
+            return 1 / clients
+        return float(weights.max() / weights.sum())
+
+
+class FedAvg(AggregationStrategy):
+    """Sample-weighted mean of client parameters"""
+
+    name = 'fedavg'
+
+    def aggregate(self, updates: torch.Tensor, weights: Optional[torch.Tensor] = None) -> torch.Tensor:
+        if weights is None:
+            return updates.mean(dim=0)
+        weights = weights.to(updates.dtype)
+        return weights @ updates / weights.sum()
+
+
+class FedProx(FedAvg):
+    """FedAvg aggregation with a proximal term on clients' local objective"""
+
+    name = 'fedprox'
+
+    def __init__(self, mu: float = 0.01):
+        self.proximal_mu = mu
+
+
+class TrimmedMean(AggregationStrategy):
+    """Coordinate-wise mean after discarding the most extreme client values"""
+
+    name = 'trimmed_mean'
+
+    def __init__(self, trim_ratio: float = 0.1):
+        if not 0 <= trim_ratio < 0.5:
+            raise ValueError("trim_ratio must be in [0, 0.5)")
+        self.trim_ratio = trim_ratio
+
+    def aggregate(self, updates: torch.Tensor, weights: Optional[torch.Tensor] = None) -> torch.Tensor:
+        clients = updates.shape[0]
+        trim = int(clients * self.trim_ratio)
+        if trim == 0:
+            return updates.mean(dim=0)
+        ordered, _ = torch.sort(updates, dim=0)
+        return ordered[trim:clients - trim].mean(dim=0)
+
+    def max_share(self, weights: Optional[torch.Tensor], clients: int) -> float:
+        return 1 / (clients - 2 * int(clients * self.trim_ratio))
+
+
+STRATEGIES: Dict[str, Type[AggregationStrategy]] = {
+    FedAvg.name: FedAvg,
+    FedProx.name: FedProx,
+    TrimmedMean.name: TrimmedMean
+}
+
+
+def get_strategy(name: str, **kwargs) -> AggregationStrategy:
+    """Instantiate an aggregation strategy by name"""
+    if name not in STRATEGIES:
+        raise ValueError(f"Unknown aggregation strategy '{name}'. "
+                         f"Choose from: {', '.join(STRATEGIES)}")
+    return STRATEGIES[name](**kwargs)
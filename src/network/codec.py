@@ -0,0 +1,169 @@
+import struct
+from typing import Dict, Hashable, Optional
+import numpy as np
+import torch
+
+# magic, version, flags, bits, length, nnz, low, scale
+_HEADER = struct.Struct('!2sBBBIIff')
+_MAGIC = b'FS'
+_VERSION = 1
+
+_FLAG_DELTA = 1
+_FLAG_SPARSE = 2
+_FLAG_SHORT_INDEX = 4
+
+
+def _pack_nibbles(values: np.ndarray) -> np.ndarray:
+    """Pack 4-bit codes two per byte"""
+    if len(values) % 2:
+        values = np.append(values, 0)
+    return (values[0::2] << 4 | values[1::2]).astype(np.uint8)
+
+
+def _unpack_nibbles(packed: np.ndarray, count: int) -> np.ndarray:
+    """Inverse of `_pack_nibbles`"""
+    values = np.empty(2 * len(packed), dtype=np.uint8)
+    values[0::2] = packed >> 4
+    values[1::2] = packed & 0x0F
+    return values[:count]
+
+
+def decode_update(data: bytes, reference: Optional[torch.Tensor] = None) -> torch.Tensor:
+    """Decode a wire-format update back into a full parameter vector"""
+    magic, version, flags, bits, length, nnz, low, scale = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("Not a FedSense model update")
+
+    offset = _HEADER.size
+    indices = None
+    if flags & _FLAG_SPARSE:
+        index_type = np.uint16 if flags & _FLAG_SHORT_INDEX else np.uint32
+        indices = np.frombuffer(data, dtype=index_type, count=nnz, offset=offset).astype(np.int64)
+        offset += nnz * np.dtype(index_type).itemsize
+
+    if bits == 32:
+        values = np.frombuffer(data, dtype=np.float32, count=nnz, offset=offset)
+    else:
+        if bits == 8:
+            codes = np.frombuffer(data, dtype=np.uint8, count=nnz, offset=offset)
+        else:
+            codes = _unpack_nibbles(np.frombuffer(data, dtype=np.uint8, offset=offset), nnz)
+        values = low + codes.astype(np.float32) * scale
+
+    if indices is None:
+        vector = torch.from_numpy(np.array(values, dtype=np.float32))
+    else:
+        vector = torch.zeros(length)
+        vector[torch.from_numpy(indices)] = torch.from_numpy(np.array(values, dtype=np.float32))
+
+    if flags & _FLAG_DELTA and reference is not None:
+        vector = vector + reference
+    return vector
+
+
+class UpdateCodec:
+    """Compresses model updates for federation traffic
+
+    Supports sending weight deltas against the last global model, top-k
+    sparsification with per-client error feedback, 8/4-bit min-max
+    quantization and a compact self-describing binary format.
+    """
+
+    def __init__(self, delta: bool = True, topk: Optional[float] = None,
+                 bits: Optional[int] = None, error_feedback: bool = True):
+        if bits not in (None, 4, 8):
+            raise ValueError("bits must be None, 4 or 8")
+        if topk is not None and not 0 < topk <= 1:
+            raise ValueError("topk must be a fraction in (0, 1]")
+
+        self.delta = delta
+        self.topk = topk
+        self.bits = bits
+        self.error_feedback = error_feedback
+
+        self.residuals: Dict[Hashable, torch.Tensor] = {}
+        self.bytes_encoded = 0
+        self.bytes_raw = 0
+
+    def config(self) -> Dict:
+        """Constructor arguments"""
+        return {'delta': self.delta, 'topk': self.topk, 'bits': self.bits,
+                'error_feedback': self.error_feedback}
+
+    def state_dict(self) -> Dict:
+        """Per-client residuals and byte counters"""
+        return {'residuals': self.residuals, 'bytes_encoded': self.bytes_encoded,
+                'bytes_raw': self.bytes_raw}
+
+    def load_state_dict(self, state: Dict):
+        """Restore from `state_dict`"""
+        self.residuals = {client: torch.as_tensor(residual)
+                          for client, residual in state['residuals'].items()}
+        self.bytes_encoded = state['bytes_encoded']
+        self.bytes_raw = state['bytes_raw']
+
+    @property
+    def compression_ratio(self) -> float:
+        """Raw fp32 size over encoded size across everything encoded so far"""
+        return self.bytes_raw / self.bytes_encoded if self.bytes_encoded else 1.0
+
+    def encode(self, vector: torch.Tensor, reference: Optional[torch.Tensor] = None,
+               client: Hashable = None) -> bytes:
+        """Encode one client's parameter vector"""
+        vector = vector.detach().float()
+        delta = self.delta and reference is not None
+        target = vector - reference if delta else vector.clone()
+
+        # Error feedback: add back what earlier rounds failed to transmit
+        lossy = self.topk is not None or self.bits is not None
+        if lossy and self.error_feedback and client in self.residuals:
+            target += self.residuals[client]
+
+        length = target.numel()
+        flags = _FLAG_DELTA if delta else 0
+        indices = None
+        values = target
+        if self.topk is not None and self.topk < 1:
+            k = max(1, int(length * self.topk))
+            indices = torch.topk(target.abs(), k, sorted=False).indices.sort().values
+            values = target[indices]
+            flags |= _FLAG_SPARSE
+            if length <= np.iinfo(np.uint16).max + 1:
+                flags |= _FLAG_SHORT_INDEX
+
+        values_np = values.numpy()
+        low, scale = 0.0, 0.0
+        if self.bits is None:
+            body = values_np.astype(np.float32).tobytes()
+            sent = values_np
+        else:
+            levels = 2 ** self.bits - 1
+            low = float(values_np.min())
+            scale = float(values_np.max() - low) / levels or 1.0
+            codes = np.clip(np.rint((values_np - low) / scale), 0, levels).astype(np.uint8)
+            body = codes.tobytes() if self.bits == 8 else _pack_nibbles(codes).tobytes()
+            sent = low + codes.astype(np.float32) * np.float32(scale)
+
+        header = _HEADER.pack(_MAGIC, _VERSION, flags, self.bits or 32, length,
+                              len(values_np), low, scale)
+        index_bytes = b''
+        if indices is not None:
+            index_type = np.uint16 if flags & _FLAG_SHORT_INDEX else np.uint32
+            index_bytes = indices.numpy().astype(index_type).tobytes()
+        data = header + index_bytes + body
+
+        if lossy and self.error_feedback:
+            transmitted = torch.zeros(length)
+            if indices is None:
+                transmitted = torch.from_numpy(np.asarray(sent, dtype=np.float32))
+            else:
+                transmitted[indices] = torch.from_numpy(np.asarray(sent, dtype=np.float32))
+            self.residuals[client] = target - transmitted
+
+        self.bytes_encoded += len(data)
+        self.bytes_raw += length * 4
+        return data
+
+    def decode(self, data: bytes, reference: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """Decode an update produced by any codec configuration"""
+        return decode_update(data, reference)
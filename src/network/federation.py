@@ -1,44 +1,273 @@
+import contextlib
+import time
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional
+from ..core.anomaly import AnomalyDetector
+from ..core.fleet import SensorFleet
+from ..core.inference import FleetInference
+from ..core.instrumentation import NULL_INSTRUMENTATION, Instrumentation
+from ..core.models import PatternPredictor
+from ..core.patterns import compile_event_tables
+from ..core.scheduler import TrainingScheduler
 from ..core.sensor import EnhancedSensor
+from ..storage.checkpoint import Checkpointer, load_checkpoint, set_global_rng_state
+from ..storage.recorder import MetricsRecorder
+from ..storage.replay import ReplaySource
+from ..visualization.console import NetworkConsole
 from ..visualization.plotter import NetworkPlotter
+from .parallel import ParallelTrainer
+from .library import PatternLibrary
+from .privatization import PATTERN_FIELDS, Privatizer, patterns_to_arrays
+from .rounds import FederationEngine
+from .topology import DEFAULT_TOPOLOGY, build_sensors
 from rich.console import Console
 
 console = Console()
 
+# Hours of history each sensor learns its shared patterns from
+PATTERN_WINDOW = 24
+
 
 class EnhancedFederatedNetwork:
     """Manages a network of federated sensors with visualization"""
 
-    def __init__(self):
-        self.sensors = [
-            EnhancedSensor("Factory Floor", (0, 0), "factory"),
-            EnhancedSensor("Office Building", (1, 0), "office"),
-            EnhancedSensor("Outdoor Area", (2, 0), "outdoor")
-        ]
+    def __init__(self, sensors: Optional[List[EnhancedSensor]] = None,
+                 fleet: Optional[SensorFleet] = None,
+                 federation: Optional[FederationEngine] = None,
+                 trainer: Optional[ParallelTrainer] = None,
+                 plotter: Optional[NetworkPlotter] = None,
+                 recorder: Optional[MetricsRecorder] = None,
+                 inference: Optional[FleetInference] = None,
+                 checkpointer: Optional[Checkpointer] = None,
+                 instrumentation: Optional[Instrumentation] = None,
+                 privatizer: Optional[Privatizer] = None,
+                 pattern_library: Optional[PatternLibrary] = None,
+                 scheduler: Optional[TrainingScheduler] = None,
+                 detector: Optional[AnomalyDetector] = None):
+        # In fleet mode every sensor is a view over one row of the batched fleet
+        if sensors is not None and fleet is not None:
+            raise ValueError("Pass either sensors or a fleet, not both")
+        self.fleet = fleet
+        if fleet is not None:
+            self.sensors = fleet.views()
+        elif sensors is not None:
+            self.sensors = list(sensors)
+        else:
+            self.sensors = build_sensors(DEFAULT_TOPOLOGY)
 
         self.current_hour = 0
         self.global_predictions = []
-        self.pattern_library = {}
+        # Versioned, indexed store of the patterns each sensor shares
+        self.pattern_library = pattern_library if pattern_library is not None else PatternLibrary()
+
+        # Optional federated aggregation of the sensors' models
+        self.federation = federation
+
+        # Optional process-pool backend for local training
+        if trainer is not None and fleet is not None:
+            raise ValueError("A fleet trains as one batched model; a parallel trainer is not used")
+        self.trainer = trainer
+
+        # Optional error- and drift-triggered choice of which sensors train each hour
+        if scheduler is not None and trainer is not None:
+            raise ValueError("A parallel trainer trains every sensor; a scheduler is not used")
+        self.scheduler = scheduler
+        if fleet is not None:
+            fleet.scheduler = scheduler
+
+        # Optional streaming anomaly scores, expecting each sensor's known events
+        self.detector = detector
+        if detector is not None:
+            if fleet is not None:
+                detector.set_events(fleet.event_impact, fleet.event_counts)
+            else:
+                detector.set_events(*compile_event_tables([s.pattern for s in self.sensors]))
+
+        # Optional batched next-hour predictions for individual sensors
+        if inference is not None and fleet is not None:
+            raise ValueError("A fleet predicts with its own batched model; inference is not used")
+        # The scheduler and the detector score each sensor's forecast of the reading it then receives
+        if (scheduler is not None or detector is not None) and fleet is None and inference is None:
+            inference = FleetInference([s.predictor for s in self.sensors])
+        self.inference = inference
+
+        # Optional periodic snapshots of the full simulation state
+        if checkpointer is not None and trainer is not None:
+            raise ValueError("Checkpointing does not capture parallel trainer workers")
+        self.checkpointer = checkpointer
+
+        # Optional streaming export of per-hour series
+        self.recorder = recorder
+
+        # Optional differentially private release of patterns and model updates
+        self.privatizer = privatizer
+        if privatizer is not None:
+            self._configure_privacy(privatizer)
+        # Privatized uploads are clipped around a model every client starts from
+        if federation is not None and federation.privatizer is not None and federation.global_model is None:
+            federation.seed_model(self)
 
         # Initialize visualization
-        self.plotter = NetworkPlotter()
+        self.plotter = plotter if plotter is not None else NetworkPlotter()
+
+        # Per-phase timers; the null stand-in keeps the hooks free when off
+        self.instrumentation = instrumentation if instrumentation is not None else NULL_INSTRUMENTATION
+        if fleet is not None:
+            fleet.instrumentation = self.instrumentation
+
+    def _configure_privacy(self, privatizer: Privatizer):
+        """Charge sensors the privatizer's per-release cost and privatize model uploads"""
+        if self.federation is not None:
+            self.federation.privatizer = privatizer
+        if self.fleet is not None:
+            self.fleet.pattern_epsilon = privatizer.pattern_epsilon
+            self.fleet.pattern_delta = privatizer.release_delta
+        else:
+            for sensor in self.sensors:
+                sensor.privacy.pattern_epsilon = privatizer.pattern_epsilon
+                sensor.privacy.pattern_delta = privatizer.release_delta
 
-    def update(self, hour: int):
-        """Update network state"""
+    def update(self, hour: int, readings: Optional[np.ndarray] = None):
+        """Update network state
+
+        `readings` (one per sensor, in sensor order) are ingested instead of
+        generating synthetic ones, e.g. from a `ReplaySource`.
+        """
+        if readings is not None and len(readings) != len(self.sensors):
+            raise ValueError(f"Expected {len(self.sensors)} readings, got {len(readings)}")
         self.current_hour = hour
+        timer = self.instrumentation
+        timer.begin_hour(hour)
+
+        with timer.phase('update'):
+            if self.fleet is not None:
+                self.fleet.step(hour, readings)
+                if self.fleet.has_patterns:
+                    fleet = self.fleet
+                    stats = np.stack([fleet.pattern_stats[field] for field in PATTERN_FIELDS], axis=1)
+                    self._publish_patterns(fleet.names, stats, fleet.peak_mask.T, hour, timer)
+            else:
+                self._update_sensors(hour, timer, readings)
+
+            if self.detector is not None:
+                with timer.phase('anomaly'):
+                    alerts = self._detect_anomalies(hour)
+                timer.count('anomalies', len(alerts))
+
+            if self.federation is not None:
+                with timer.phase('federation'):
+                    round_stats = self.federation.step(hour, self)
+                    if round_stats is not None:
+                        timer.count('rounds')
+                        if self.trainer is not None:
+                            self.trainer.push_weights(self.sensors, self.federation.global_model,
+                                                      self.federation.strategy.proximal_mu)
+
+            if self.recorder is not None:
+                with timer.phase('record'):
+                    self.recorder.record(self, hour)
+
+            if self.checkpointer is not None:
+                with timer.phase('checkpoint'):
+                    self.checkpointer.maybe_save(self, hour)
 
-        # Update each sensor
-        for sensor in self.sensors:
-            temp = sensor.generate_temperature(hour)
-            patterns = sensor.learn_patterns()
-            sensor.privacy.update(temp, bool(patterns))
+            # Update visualization
+            with timer.phase('plot'):
+                self.plotter.update_plots(self.sensors, hour)
+
+        timer.end_hour(hour)
+
+    def _update_sensors(self, hour: int, timer, readings: Optional[np.ndarray] = None):
+        """Generate, train, learn and account for each individual sensor"""
+        timed = timer.enabled
+        train = self.trainer is None
+        scheduled = self._schedule_sensors(hour, timer, readings) if self.scheduler is not None else None
+        shared = []
+        for i, sensor in enumerate(self.sensors):
+            name = sensor.name if timed else None
+            if scheduled is None:
+                with timer.phase('generate', name):
+                    temp = self._read_sensor(sensor, hour, readings, i)
+            else:
+                temp = sensor.temperature_history[-1]
+            if scheduled is not None and not scheduled[i]:
+                sensor.skip_training()
+            elif train:
+                with timer.phase('train', name):
+                    sensor.train_predictor()
+            with timer.phase('learn_patterns', name):
+                patterns = sensor.learn_patterns(PATTERN_WINDOW)
+            with timer.phase('privacy', name):
+                sensor.privacy.update(temp, bool(patterns))
 
             if patterns:
-                self.pattern_library[sensor.name] = patterns
+                shared.append((sensor.name, patterns))
+        timer.count('readings', len(self.sensors))
+
+        if shared:
+            names, patterns = zip(*shared)
+            self._publish_patterns(names, *patterns_to_arrays(patterns, PATTERN_WINDOW), hour, timer)
+
+        if self.trainer is not None:
+            with timer.phase('train'):
+                self.trainer.train(self.sensors)
+
+        if self.inference is not None:
+            with timer.phase('inference'):
+                self.inference.predict_sensors(self.sensors)
 
-        # Update visualization
-        self.plotter.update_plots(self.sensors, hour)
+    @staticmethod
+    def _read_sensor(sensor: EnhancedSensor, hour: int, readings: Optional[np.ndarray], i: int) -> float:
+        """A sensor's reading for the hour: generated, or its column of replayed `readings`"""
+        if readings is None:
+            return sensor.generate_temperature(hour, train=False)
+        return sensor.ingest_temperature(float(readings[i]), train=False)
+
+    def _schedule_sensors(self, hour: int, timer, replayed: Optional[np.ndarray] = None) -> np.ndarray:
+        """Take in every sensor's reading, then mark the sensors the scheduler picks to train"""
+        readings = np.empty(len(self.sensors))
+        predictions = np.full(len(self.sensors), np.nan)
+        for i, sensor in enumerate(self.sensors):
+            with timer.phase('generate', sensor.name if timer.enabled else None):
+                readings[i] = self._read_sensor(sensor, hour, replayed, i)
+            if len(sensor.prediction_history):
+                predictions[i] = sensor.prediction_history[-1]
+
+        with timer.phase('schedule'):
+            due = np.zeros(len(self.sensors), dtype=bool)
+            due[self.scheduler.select(predictions, readings)] = True
+        return due
+
+    def _detect_anomalies(self, hour: int) -> np.ndarray:
+        """Score this hour's readings; returns alerting rows
+
+        Readings are scored against the forecasts the detector held from the
+        previous tick, and this tick's forecasts are handed over to be
+        scored against the next readings.
+        """
+        if self.fleet is not None:
+            fleet = self.fleet
+            readings = fleet.temperature_history[-1]
+            if len(fleet.prediction_history):
+                forecasts = fleet.prediction_history[-1]
+            else:
+                forecasts = np.full(fleet.size, np.nan)
+        else:
+            readings = np.empty(len(self.sensors))
+            forecasts = np.full(len(self.sensors), np.nan)
+            for i, sensor in enumerate(self.sensors):
+                readings[i] = sensor.temperature_history[-1]
+                if len(sensor.prediction_history):
+                    forecasts[i] = sensor.prediction_history[-1]
+        return self.detector.update(hour, readings, forecasts)
+
+    def _publish_patterns(self, names, stats: np.ndarray, peaks: np.ndarray, hour: int, timer):
+        """Add one hour of shared patterns to the library, privatized when configured"""
+        if self.privatizer is not None:
+            with timer.phase('privatize'):
+                stats, peaks = self.privatizer.privatize_stats(stats, peaks)
+        with timer.phase('library'):
+            self.pattern_library.add(names, stats, peaks, hour)
 
     def get_network_metrics(self) -> Dict:
         """Get comprehensive network metrics"""
@@ -48,41 +277,181 @@ class EnhancedFederatedNetwork:
                 for sensor in self.sensors
             },
             'global_patterns': self.pattern_library,
-            'network_health': self._calculate_network_health()
+            'network_health': self._calculate_network_health(),
+            'federation': self.federation.get_metrics() if self.federation is not None else None,
+            'training': self.scheduler.report() if self.scheduler is not None else None,
+            'anomalies': (self.detector.report([s.name for s in self.sensors])
+                          if self.detector is not None else None)
         }
 
     def _calculate_network_health(self) -> Dict:
         """Calculate overall network health metrics"""
+        if self.fleet is not None:
+            return self.fleet.get_health()
+
         accuracies = [s.accuracy_history[-1] for s in self.sensors]
         privacy_scores = [s.privacy.privacy_score for s in self.sensors]
 
         return {
             'average_accuracy': np.mean(accuracies),
             'average_privacy': np.mean(privacy_scores),
+            'max_epsilon': max(s.privacy.accountant.epsilon() for s in self.sensors),
             'active_sensors': len(self.sensors),
             'pattern_coverage': len(self.pattern_library) / len(self.sensors)
         }
 
-    def run_simulation(self, hours: int = 100):
-        """Run the complete simulation"""
+    def config(self) -> Dict:
+        """Everything needed to rebuild this network's components before loading state"""
+        return {
+            'mode': 'fleet' if self.fleet is not None else 'sensors',
+            'fleet': self.fleet.config() if self.fleet is not None else None,
+            'sensors': [s.config() for s in self.sensors] if self.fleet is None else None,
+            'federation': self.federation.config() if self.federation is not None else None,
+            'privatizer': self.privatizer.config() if self.privatizer is not None else None,
+            'pattern_library': self.pattern_library.config(),
+            'scheduler': self.scheduler.config() if self.scheduler is not None else None,
+            'detector': self.detector.config() if self.detector is not None else None
+        }
+
+    def state_dict(self) -> Dict:
+        """Simulation state of every component (the plotter is not included)"""
+        return {
+            'current_hour': self.current_hour,
+            'global_predictions': self.global_predictions,
+            'pattern_library': self.pattern_library.state_dict(),
+            'fleet': self.fleet.state_dict() if self.fleet is not None else None,
+            'sensors': [s.state_dict() for s in self.sensors] if self.fleet is None else None,
+            'federation': self.federation.state_dict() if self.federation is not None else None,
+            'recorder': self.recorder.state_dict() if self.recorder is not None else None,
+            'privatizer': self.privatizer.state_dict() if self.privatizer is not None else None,
+            'scheduler': self.scheduler.state_dict() if self.scheduler is not None else None,
+            'detector': self.detector.state_dict() if self.detector is not None else None
+        }
+
+    def load_state_dict(self, state: Dict):
+        """Restore from `state_dict` of a network with the same configuration"""
+        self.current_hour = state['current_hour']
+        self.global_predictions = list(state['global_predictions'])
+        if self.fleet is not None:
+            self.fleet.load_state_dict(state['fleet'])
+        else:
+            for sensor, sensor_state in zip(self.sensors, state['sensors']):
+                sensor.load_state_dict(sensor_state)
+        if self.federation is not None:
+            self.federation.load_state_dict(state['federation'])
+        if self.recorder is not None and state['recorder'] is not None:
+            self.recorder.load_state_dict(state['recorder'])
+        if self.privatizer is not None:
+            self.privatizer.load_state_dict(state['privatizer'])
+        self.pattern_library.load_state_dict(state['pattern_library'])
+        if self.scheduler is not None:
+            self.scheduler.load_state_dict(state['scheduler'])
+        if self.detector is not None:
+            self.detector.load_state_dict(state['detector'])
+
+    @classmethod
+    def from_config(cls, config: Dict, **kwargs) -> 'EnhancedFederatedNetwork':
+        """Rebuild the components described by `config()`, untrained"""
+        if config['federation'] is not None:
+            kwargs.setdefault('federation', FederationEngine.from_config(config['federation']))
+        if config.get('privatizer') is not None:
+            kwargs.setdefault('privatizer', Privatizer(**config['privatizer']))
+        if config.get('pattern_library') is not None:
+            kwargs.setdefault('pattern_library', PatternLibrary(**config['pattern_library']))
+        if config.get('scheduler') is not None:
+            kwargs.setdefault('scheduler', TrainingScheduler(**config['scheduler']))
+        if config.get('detector') is not None:
+            kwargs.setdefault('detector', AnomalyDetector(**config['detector']))
+        if config['mode'] == 'fleet':
+            fleet_config = dict(config['fleet'])
+            return cls(fleet=SensorFleet(fleet_config.pop('names'), fleet_config.pop('locations'),
+                                         fleet_config.pop('pattern_types'), **fleet_config), **kwargs)
+
+        sensors = []
+        for sensor_config in config['sensors']:
+            sensor_config = dict(sensor_config)
+            predictor = PatternPredictor(**sensor_config.pop('predictor'))
+            sensors.append(EnhancedSensor(predictor=predictor, **sensor_config))
+        return cls(sensors=sensors, **kwargs)
+
+    @classmethod
+    def from_checkpoint(cls, directory: str, snapshot: Optional[str] = None,
+                        **kwargs) -> 'EnhancedFederatedNetwork':
+        """Restore a network, including global RNG state, from a Checkpointer directory
+
+        Continue it with `run_simulation(hours, start_hour=network.current_hour + 1)`.
+        """
+        checkpoint = load_checkpoint(directory, snapshot)
+        network = cls.from_config(checkpoint['config'], **kwargs)
+        network.load_state_dict(checkpoint['state'])
+        set_global_rng_state(checkpoint['global_rng'])
+        return network
+
+    def run_simulation(self, hours: Optional[int] = 100, interval: float = 0.0, start_hour: int = 0,
+                       monitor: Optional[NetworkConsole] = None,
+                       source: Optional[ReplaySource] = None):
+        """Run the complete simulation, pacing hours at least `interval` seconds apart
+
+        `start_hour` continues a restored network from the hour after its
+        last snapshot. With a `monitor` console and instrumentation enabled,
+        a live per-phase latency table is shown while the run progresses.
+        With a replay `source`, its recorded hours in [start_hour, hours)
+        are ingested instead of generated readings (`hours=None` replays
+        to the end of the data).
+        """
         console.print("[bold blue]Enhanced Federated Learning Simulation[/bold blue]")
         console.print("\n[yellow]Showing detailed pattern analysis and privacy metrics[/yellow]")
 
+        live = contextlib.nullcontext()
+        if monitor is not None and self.instrumentation.enabled:
+            live = monitor.live_instrumentation(self.instrumentation)
+
         try:
-            for hour in range(hours):
-                self.update(hour)
-
-                if hour % 10 == 0:
-                    metrics = self.get_network_metrics()
-                    health = metrics['network_health']
-                    console.print(f"\n[cyan]Hour {hour}[/cyan]")
-                    console.print(f"Network Health:")
-                    console.print(f"  Accuracy: {health['average_accuracy']:.2%}")
-                    console.print(f"  Privacy: {health['average_privacy']:.1f}%")
-                    console.print(f"  Pattern Coverage: {health['pattern_coverage']:.1%}")
+            with live:
+                if source is None:
+                    ticks = ((hour, None) for hour in range(start_hour, hours))
+                else:
+                    ticks = source.ticks(start_hour, hours)
+                for hour, readings in ticks:
+                    started = time.perf_counter()
+                    self.update(hour, readings)
+
+                    if hour % 10 == 0:
+                        metrics = self.get_network_metrics()
+                        health = metrics['network_health']
+                        console.print(f"\n[cyan]Hour {hour}[/cyan]")
+                        console.print(f"Network Health:")
+                        console.print(f"  Accuracy: {health['average_accuracy']:.2%}")
+                        console.print(f"  Privacy: {health['average_privacy']:.1f}%")
+                        console.print(f"  Pattern Coverage: {health['pattern_coverage']:.1%}")
+                        if metrics['training'] is not None:
+                            console.print(f"  Training Saved: {metrics['training']['compute_saved']:.1%}")
+                        if metrics['anomalies'] is not None:
+                            anomalies = metrics['anomalies']
+                            console.print(f"  Anomalies: {anomalies['alerts']} "
+                                          f"({anomalies['sensors_alerted']} sensors)")
+                            for alert in anomalies['recent'][:3]:
+                                console.print(f"    [red]{alert['sensor']}[/red] hour {alert['hour']}: "
+                                              f"reading {alert['reading']:.2f} (score {alert['score']:.1f})")
+
+                    remaining = interval - (time.perf_counter() - started)
+                    if remaining > 0:
+                        time.sleep(remaining)
 
         except KeyboardInterrupt:
             console.print("\n[red]Simulation interrupted by user[/red]")
+        finally:
+            if source is not None:
+                source.close()
+            if self.trainer is not None:
+                self.trainer.close()
+            if self.federation is not None and self.federation.hierarchy is not None:
+                self.federation.hierarchy.close()
+            if self.recorder is not None:
+                self.recorder.close()
+            if self.checkpointer is not None:
+                self.checkpointer.close()
+            self.instrumentation.close()
 
         console.print("\n[bold green]Simulation Complete![/bold green]")
         self.plotter.show()
\ No newline at end of file
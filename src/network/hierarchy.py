@@ -0,0 +1,166 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+import torch
+from .aggregation import AggregationStrategy
+from .library import FEATURES, PatternLibrary
+from .topology import assign_cells
+
+
+class Upload(NamedTuple):
+    """Client uploads of one aggregation group, after clipping and encoding"""
+    updates: torch.Tensor
+    weights: Optional[torch.Tensor]
+    losses: Sequence[float]
+    bytes_up: int
+    error_sq: float
+    norm_sq: float
+
+
+class EdgeSummary(NamedTuple):
+    """What an edge aggregator forwards: its cell's model, total weight and drift"""
+    model: torch.Tensor
+    weight: float
+    drift_sum: float
+
+
+def reduce_cell(strategy: AggregationStrategy, upload: Upload) -> EdgeSummary:
+    """Aggregate one cell's uploads into the summary it forwards upward"""
+    model = strategy.aggregate(upload.updates, upload.weights)
+    weight = float(upload.weights.sum()) if upload.weights is not None else float(len(upload.updates))
+    drift_sum = float((upload.updates - model).norm(dim=1).sum())
+    return EdgeSummary(model, weight, drift_sum)
+
+
+class CellHierarchy:
+    """Two-tier aggregation: sensors -> spatial edge cells -> coordinator
+
+    Sensors are grouped into cells by location, on a grid of `cell_size`
+    or as `num_cells` k-means clusters (see `assign_cells`). In a round,
+    each cell's participants upload to their edge aggregator, which
+    reduces them with the engine's strategy; the coordinator only combines
+    one summary per cell, weighted by the cell's total client weight (so
+    FedAvg gives the same model as a flat round). Uploads are gathered,
+    clipped and encoded one cell at a time on the calling thread, which
+    keeps noise and codec state deterministic and holds at most a few
+    cells' updates in memory, while edge reductions run on `workers`
+    threads. Edge aggregators also average their sensors' latest pattern
+    vectors into `cell_patterns`.
+    """
+
+    def __init__(self, cell_size: Optional[float] = None, num_cells: Optional[int] = None,
+                 workers: Optional[int] = None, seed: Optional[int] = None):
+        if (cell_size is None) == (num_cells is None):
+            raise ValueError("Pass exactly one of cell_size and num_cells")
+        if workers is not None and workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.cell_size = cell_size
+        self.num_cells = num_cells
+        self.workers = workers
+        self.seed = seed
+
+        self.cells: Optional[np.ndarray] = None
+        self.cell_patterns = np.zeros((0, len(FEATURES)))
+        self._names: Tuple[str, ...] = ()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def assign(self, sensors: Sequence) -> np.ndarray:
+        """Cell of every sensor, recomputed only when the sensors change"""
+        names = tuple(s.name for s in sensors)
+        if self.cells is None or names != self._names:
+            self.cells = assign_cells([s.location for s in sensors], self.cell_size,
+                                      self.num_cells, self.seed)
+            self._names = names
+        return self.cells
+
+    @property
+    def num_assigned(self) -> int:
+        return int(self.cells.max()) + 1 if self.cells is not None and len(self.cells) else 0
+
+    def groups(self, participants: np.ndarray) -> List[np.ndarray]:
+        """Participants split by cell, in cell order (empty cells omitted)"""
+        cells = self.cells[participants]
+        order = np.argsort(cells, kind='stable')
+        ordered = cells[order]
+        bounds = np.flatnonzero(np.diff(ordered)) + 1
+        return np.split(participants[order], bounds)
+
+    def aggregate(self, engine, network, participants: np.ndarray):
+        """Run both tiers for `engine`; returns the global model, combined upload totals and tier stats"""
+        self.assign(network.sensors)
+        strategy = engine.strategy
+        pool = self._executor()
+        # Enough reductions in flight to keep the workers busy without holding every cell
+        limit = 2 * (self.workers or os.cpu_count() or 1)
+
+        summaries: List[EdgeSummary] = []
+        pending = []
+        losses: List[np.ndarray] = []
+        weights: List[torch.Tensor] = []
+        bytes_up, error_sq, norm_sq = 0, 0.0, 0.0
+        for group in self.groups(participants):
+            upload = engine._collect(network, group)
+            bytes_up += upload.bytes_up
+            error_sq += upload.error_sq
+            norm_sq += upload.norm_sq
+            losses.append(np.asarray(upload.losses, dtype=float))
+            if upload.weights is not None:
+                weights.append(upload.weights)
+
+            if pool is None:
+                summaries.append(reduce_cell(strategy, upload))
+                continue
+            pending.append(pool.submit(reduce_cell, strategy, upload))
+            if len(pending) > limit:
+                summaries.append(pending.pop(0).result())
+        summaries.extend(future.result() for future in pending)
+
+        models = torch.stack([s.model for s in summaries])
+        cell_weights = torch.tensor([s.weight for s in summaries], dtype=models.dtype)
+        global_model = cell_weights @ models / cell_weights.sum()
+
+        self.cell_patterns = self.summarize_patterns(network.pattern_library)
+        bytes_per_model = models.shape[1] * models.element_size()
+        tier = {
+            'cells': len(summaries),
+            # One summary up and one model down per cell on the backbone
+            'bytes_edge': 2 * len(summaries) * bytes_per_model,
+            'edge_drift': float((models - global_model).norm(dim=1).mean())
+        }
+        # Client weights are kept so the engine can size aggregate noise
+        upload = Upload(None, torch.cat(weights) if weights else None,
+                        np.concatenate(losses) if losses else [],
+                        bytes_up, error_sq, norm_sq)
+        client_drift = sum(s.drift_sum for s in summaries) / max(1, len(participants))
+        return global_model, upload, client_drift, tier
+
+    def summarize_patterns(self, library: PatternLibrary) -> np.ndarray:
+        """(cells, features) mean latest pattern vector of each cell's sensors"""
+        names, vectors = library.vectors()
+        index = {name: i for i, name in enumerate(self._names)}
+        known = [i for i, name in enumerate(names) if name in index]
+        cells = self.cells[[index[names[i]] for i in known]]
+
+        sums = np.zeros((self.num_assigned, len(FEATURES)))
+        np.add.at(sums, cells, vectors[known])
+        counts = np.bincount(cells, minlength=self.num_assigned)
+        return sums / np.maximum(counts, 1)[:, None]
+
+    def _executor(self) -> Optional[ThreadPoolExecutor]:
+        if self.workers == 1:
+            return None
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.workers or os.cpu_count() or 1,
+                                            thread_name_prefix='edge')
+        return self._pool
+
+    def close(self):
+        """Stop the edge worker threads"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def config(self) -> Dict:
+        return {'cell_size': self.cell_size, 'num_cells': self.num_cells,
+                'workers': self.workers, 'seed': self.seed}
@@ -0,0 +1,268 @@
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from ..core.history import HistoryBuffer
+from .privatization import PATTERN_FIELDS, patterns_to_arrays
+
+HOURS_PER_DAY = 24
+
+# Pattern vector layout: range, variance and trend, then a peak-hour histogram
+FEATURES = PATTERN_FIELDS + tuple(f"peak_{h:02d}" for h in range(HOURS_PER_DAY))
+METRICS = ('euclidean', 'cosine')
+
+# Leading columns of each stored row, ahead of the pattern vector
+_HOUR, _SENSOR = 0, 1
+
+
+def kmeans(points: np.ndarray, k: int, iterations: int = 25,
+           seed: Optional[int] = None) -> np.ndarray:
+    """Lloyd's k-means on (n, d) points; returns each point's cluster label
+
+    Distances are one matrix multiply per iteration, so it scales to large
+    fleets. Stops early once assignments no longer change.
+    """
+    if not len(points):
+        return np.zeros(0, dtype=np.int64)
+    k = min(k, len(points))
+    rng = np.random.default_rng(seed)
+    centroids = points[rng.choice(len(points), size=k, replace=False)].astype(float)
+    squares = np.einsum('ij,ij->i', points, points)
+
+    labels = np.full(len(points), -1, dtype=np.int64)
+    for _ in range(iterations):
+        distances = squares[:, None] + np.einsum('ij,ij->i', centroids, centroids) - 2 * points @ centroids.T
+        new_labels = distances.argmin(axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, points)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return labels
+
+
+class PatternLibrary(Mapping):
+    """Versioned, queryable store of every sensor's learned patterns
+
+    Each release is a row of `FEATURES`: daily range, variance, trend and a
+    histogram of peak hours by hour of day. Rows are kept in columnar ring
+    storage tagged with their hour and sensor, so a sensor's pattern history
+    or all patterns in a time range come from one slice. The latest vector
+    of every sensor is indexed for nearest-neighbour queries and k-means
+    clustering; the standardized index matrix is rebuilt lazily, once per
+    library version, and queries are batched matrix multiplies.
+
+    As a mapping, `library[name]` is the sensor's latest patterns in
+    `learn_patterns` format, with `peak_hours` as hours of the day.
+    """
+
+    def __init__(self, capacity: int = 65_536, record_every: int = 1):
+        if record_every < 1:
+            raise ValueError("record_every must be at least 1")
+        self.capacity = capacity
+        self.record_every = record_every
+        self.rows = HistoryBuffer(capacity, shape=(2 + len(FEATURES),))
+
+        self.names: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._latest = np.zeros((0, len(FEATURES)))
+        self._latest_hour = np.zeros(0, dtype=np.int64)
+        self.version = 0
+        self._last_ids: Tuple[tuple, np.ndarray] = ((), np.zeros(0, dtype=np.int64))
+        self._index: Optional[Tuple[int, np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = None
+
+    def _sensor_ids(self, names: Sequence[str]) -> np.ndarray:
+        """Ids of `names`, registering new sensors"""
+        names = tuple(names)
+        if names == self._last_ids[0]:
+            return self._last_ids[1]
+
+        for name in names:
+            if name not in self._ids:
+                self._ids[name] = len(self.names)
+                self.names.append(name)
+        if len(self.names) > len(self._latest):
+            grow = len(self.names) - len(self._latest)
+            self._latest = np.vstack([self._latest, np.zeros((grow, len(FEATURES)))])
+            self._latest_hour = np.concatenate([self._latest_hour, np.full(grow, -1)])
+        ids = np.fromiter((self._ids[name] for name in names), dtype=np.int64, count=len(names))
+        # Fleets publish the same sensors every hour
+        self._last_ids = (names, ids)
+        return ids
+
+    def add(self, names: Sequence[str], stats: np.ndarray, peaks: np.ndarray, hour: int):
+        """Record one hour's patterns for several sensors
+
+        `stats` is (sensors, 4) range/variance/trend and `peaks` the
+        (sensors, window) peak masks of windows ending at `hour`.
+        """
+        if not len(names):
+            return
+        ids = self._sensor_ids(names)
+        window = peaks.shape[1]
+        # Fold window positions onto hours of the day
+        fold = np.zeros((window, HOURS_PER_DAY))
+        fold[np.arange(window), (hour - window + 1 + np.arange(window)) % HOURS_PER_DAY] = 1
+
+        vectors = np.concatenate([stats, peaks @ fold], axis=1)
+        self._latest[ids] = vectors
+        self._latest_hour[ids] = hour
+        self.version += 1
+
+        if hour % self.record_every == 0:
+            rows = np.empty((len(ids), 2 + len(FEATURES)))
+            rows[:, _HOUR] = hour
+            rows[:, _SENSOR] = ids
+            rows[:, 2:] = vectors
+            self.rows.extend(rows)
+
+    def add_patterns(self, named_patterns: Sequence[Tuple[str, Dict]], hour: int, window: int = 24):
+        """`add` for (name, `learn_patterns` dict) pairs"""
+        if named_patterns:
+            names, patterns = zip(*named_patterns)
+            self.add(names, *patterns_to_arrays(patterns, window), hour)
+
+    def __getitem__(self, name: str) -> Dict:
+        sensor = self._ids.get(name)
+        if sensor is None or self._latest_hour[sensor] < 0:
+            raise KeyError(name)
+        low, high, variance, trend = self._latest[sensor, :len(PATTERN_FIELDS)].tolist()
+        return {
+            'daily_range': (low, high),
+            'variance': variance,
+            'trend': trend,
+            'peak_hours': np.flatnonzero(self._latest[sensor, len(PATTERN_FIELDS):]).tolist()
+        }
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.names[i] for i in np.flatnonzero(self._latest_hour >= 0))
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._latest_hour >= 0))
+
+    def vectors(self) -> Tuple[List[str], np.ndarray]:
+        """Names and latest pattern vectors of every sensor with patterns"""
+        present = np.flatnonzero(self._latest_hour >= 0)
+        return [self.names[i] for i in present], self._latest[present]
+
+    def history(self, name: str, start: Optional[int] = None,
+                end: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Recorded hours and pattern vectors of one sensor, optionally in [start, end)"""
+        hours, sensors, vectors = self._range(start, end)
+        mine = sensors == self._ids[name]
+        return hours[mine], vectors[mine]
+
+    def between(self, start: Optional[int] = None,
+                end: Optional[int] = None) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Sensor names, hours and pattern vectors of every row recorded in [start, end)"""
+        hours, sensors, vectors = self._range(start, end)
+        return [self.names[i] for i in sensors], hours, vectors
+
+    def _range(self, start: Optional[int], end: Optional[int]):
+        """Rows in an hour range; hours are recorded in order, so this is a binary search"""
+        rows = self.rows.view()
+        hours = rows[:, _HOUR]
+        low = np.searchsorted(hours, start, side='left') if start is not None else 0
+        high = np.searchsorted(hours, end, side='left') if end is not None else len(rows)
+        block = rows[low:high]
+        return block[:, _HOUR].astype(np.int64), block[:, _SENSOR].astype(np.int64), block[:, 2:]
+
+    def _standardized(self):
+        """Cached index: present sensor ids, z-scored latest vectors, squared norms and scaling"""
+        if self._index is None or self._index[0] != self.version:
+            present = np.flatnonzero(self._latest_hour >= 0)
+            vectors = self._latest[present]
+            mean = vectors.mean(axis=0) if len(vectors) else np.zeros(len(FEATURES))
+            scale = vectors.std(axis=0) if len(vectors) else np.ones(len(FEATURES))
+            scale[scale < 1e-12] = 1.0
+            matrix = (vectors - mean) / scale
+            self._index = (self.version, present, matrix, np.einsum('ij,ij->i', matrix, matrix),
+                           np.stack([mean, scale]))
+        return self._index[1:]
+
+    def _distances(self, queries: np.ndarray, metric: str) -> np.ndarray:
+        """(queries, sensors) distances from standardized query vectors to the index"""
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}'. Choose from: {', '.join(METRICS)}")
+        _, matrix, squares, _ = self._standardized()
+        products = queries @ matrix.T
+        if metric == 'cosine':
+            norms = np.sqrt(np.einsum('ij,ij->i', queries, queries))[:, None] * np.sqrt(squares)
+            return 1 - products / np.maximum(norms, 1e-12)
+        query_squares = np.einsum('ij,ij->i', queries, queries)[:, None]
+        return np.sqrt(np.maximum(query_squares + squares - 2 * products, 0))
+
+    def similar(self, query: Union[str, np.ndarray], k: int = 5,
+                metric: str = 'euclidean') -> List[Tuple[str, float]]:
+        """The `k` sensors whose latest patterns are closest to a sensor's or a vector"""
+        present, _, _, scaling = self._standardized()
+        if isinstance(query, str):
+            vector = self._latest[self._ids[query]]
+        else:
+            vector = np.asarray(query, dtype=float)
+        distances = self._distances(((vector - scaling[0]) / scaling[1])[None], metric)[0]
+
+        if isinstance(query, str):
+            distances[present == self._ids[query]] = np.inf
+        k = min(k, len(distances) - isinstance(query, str))
+        if k <= 0:
+            return []
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [(self.names[present[i]], float(distances[i])) for i in nearest]
+
+    def neighbors(self, k: int = 5, metric: str = 'euclidean',
+                  block: int = 1024) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Each sensor's `k` nearest other sensors
+
+        Returns the names, (sensors, k) neighbour indices into those names
+        and their distances. Distances are computed `block` rows at a time,
+        so memory stays bounded for large fleets.
+        """
+        present, matrix, _, _ = self._standardized()
+        k = min(k, len(present) - 1)
+        indices = np.zeros((len(present), max(k, 0)), dtype=np.int64)
+        distances = np.zeros((len(present), max(k, 0)))
+        if k > 0:
+            for start in range(0, len(present), block):
+                rows = np.arange(start, min(start + block, len(present)))
+                d = self._distances(matrix[rows], metric)
+                d[np.arange(len(rows)), rows] = np.inf
+                nearest = np.argpartition(d, k - 1, axis=1)[:, :k]
+                order = np.argsort(np.take_along_axis(d, nearest, axis=1), axis=1)
+                indices[rows] = np.take_along_axis(nearest, order, axis=1)
+                distances[rows] = np.take_along_axis(d, indices[rows], axis=1)
+        return [self.names[i] for i in present], indices, distances
+
+    def cluster(self, k: int, iterations: int = 25, seed: Optional[int] = None) -> Dict[str, int]:
+        """Group sensors by behaviour with k-means on their standardized latest patterns"""
+        present, matrix, _, _ = self._standardized()
+        labels = kmeans(matrix, k, iterations, seed)
+        return {self.names[i]: int(label) for i, label in zip(present, labels)}
+
+    def config(self) -> Dict:
+        return {'capacity': self.capacity, 'record_every': self.record_every}
+
+    def state_dict(self) -> Dict:
+        """Sensor registry, latest vectors and the recorded rows as an append-only series"""
+        return {
+            'names': self.names,
+            'latest': self._latest,
+            'latest_hour': self._latest_hour,
+            'version': self.version,
+            'rows': self.rows.state_dict()
+        }
+
+    def load_state_dict(self, state: Dict):
+        """Restore from `state_dict` of a library with the same capacity"""
+        self.names = list(state['names'])
+        self._ids = {name: i for i, name in enumerate(self.names)}
+        self._latest = np.array(state['latest'])
+        self._latest_hour = np.array(state['latest_hour'])
+        self.version = state['version']
+        self.rows.load_state_dict(state['rows'])
+        self._last_ids = ((), np.zeros(0, dtype=np.int64))
+        self._index = None
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from typing import Dict, Optional
+import numpy as np
+from ..core.models import PatternPredictor
+from ..core.sensor import BASE_TEMPERATURES, EnhancedSensor
+from .codec import UpdateCodec
+from .server import FederationCoordinator, SensorClient
+from .transport import QueueTransport, TcpTransport
+
+
+async def _load_test(num_clients: int, hours: int, transport: str, round_period: float,
+                     round_deadline: float, hour_interval: float, straggler_fraction: float,
+                     straggler_delay: float, batch_size: int,
+                     codec_options: Optional[Dict]) -> Dict:
+    coordinator = FederationCoordinator(round_deadline=round_deadline)
+    server = None
+    if transport == 'tcp':
+        server = await coordinator.serve_tcp('127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+    elif transport != 'queue':
+        raise ValueError(f"Unknown transport '{transport}'. Choose from: queue, tcp")
+
+    pattern_types = list(BASE_TEMPERATURES)
+    stragglers = int(num_clients * straggler_fraction)
+    clients = []
+    handlers = []
+    for i in range(num_clients):
+        sensor = EnhancedSensor(f"Sensor {i}", (i, 0), pattern_types[i % len(pattern_types)],
+                                predictor=PatternPredictor(streaming=True, replay_size=64))
+        if transport == 'tcp':
+            client_end = await TcpTransport.connect('127.0.0.1', port)
+        else:
+            client_end, server_end = QueueTransport.pair()
+            handlers.append(asyncio.create_task(coordinator.attach(server_end)))
+        codec = UpdateCodec(**codec_options) if codec_options is not None else None
+        clients.append(SensorClient(sensor, client_end, batch_size=batch_size,
+                                    update_delay=straggler_delay if i < stragglers else 0.0,
+                                    codec=codec))
+
+    started = time.perf_counter()
+    runs = asyncio.gather(*(c.run(hours, hour_interval) for c in clients))
+    while not runs.done():
+        await asyncio.wait([runs], timeout=round_period)
+        if not runs.done():
+            await coordinator.run_round()
+    await runs
+    elapsed = time.perf_counter() - started
+    await asyncio.gather(*handlers)
+
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+
+    latencies = np.array([r['latency'] for r in coordinator.rounds]) if coordinator.rounds else np.zeros(1)
+    readings = sum(coordinator.readings_received.values())
+    updates = sum(r['participants'] for r in coordinator.rounds)
+    return {
+        'clients': num_clients,
+        'hours': hours,
+        'transport': transport,
+        'rounds': len(coordinator.rounds),
+        'round_latency_mean': float(latencies.mean()),
+        'round_latency_p50': float(np.percentile(latencies, 50)),
+        'round_latency_p95': float(np.percentile(latencies, 95)),
+        'readings_ingested': readings,
+        'readings_per_sec': readings / elapsed,
+        'updates_per_sec': updates / elapsed,
+        'stragglers_dropped': sum(r['stragglers'] for r in coordinator.rounds),
+        'late_updates': coordinator.late_updates,
+        'update_bytes_per_round': coordinator.update_bytes / max(1, len(coordinator.rounds)),
+        'bytes_sent': sum(c.transport.bytes_sent for c in clients),
+        'wall_time': elapsed
+    }
+
+
+def run_load_test(num_clients: int = 10, hours: int = 48, transport: str = 'queue',
+                  round_period: float = 0.5, round_deadline: float = 0.25,
+                  hour_interval: float = 0.0, straggler_fraction: float = 0.0,
+                  straggler_delay: float = 1.0, batch_size: int = 24,
+                  codec_options: Optional[Dict] = None) -> Dict:
+    """Run N simulated clients against a local coordinator and report latency and throughput
+
+    `codec_options` are passed to an `UpdateCodec` per client to compress updates.
+    """
+    return asyncio.run(_load_test(num_clients, hours, transport, round_period, round_deadline,
+                                  hour_interval, straggler_fraction, straggler_delay, batch_size,
+                                  codec_options))
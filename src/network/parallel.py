@@ -0,0 +1,178 @@
+import multiprocessing as mp
+import os
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional
+import numpy as np
+import torch
+from ..core.models import PatternPredictor
+
+
+def _worker_loop(conn, worker_id: int, rows: List[int], names: Dict[str, str],
+                 num_sensors: int, param_count: int, span: int, window_size: int,
+                 lr: float, threads: int, pin_cpu: bool):
+    """Own the predictors for a slice of sensors and train them on command"""
+    torch.set_num_threads(threads)
+    if pin_cpu and hasattr(os, 'sched_setaffinity'):
+        cpus = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, {cpus[worker_id % len(cpus)]})
+
+    segments = {key: SharedMemory(name=name) for key, name in names.items()}
+    weights = torch.from_numpy(np.ndarray((num_sensors + 1, param_count), dtype=np.float32,
+                                          buffer=segments['weights'].buf))
+    history = np.ndarray((num_sensors, span), dtype=np.float32, buffer=segments['history'].buf)
+    counts = np.ndarray((num_sensors,), dtype=np.int64, buffer=segments['counts'].buf)
+
+    predictors = {row: PatternPredictor(window_size) for row in rows}
+    for predictor in predictors.values():
+        for group in predictor.optimizer.param_groups:
+            group['lr'] = lr
+
+    try:
+        while True:
+            command, reload, mu = conn.recv()
+            if command == 'stop':
+                break
+
+            if reload:
+                # Weights changed in the parent, e.g. after a federation round
+                anchor = weights[num_sensors].clone() if mu > 0 else None
+                for row, predictor in predictors.items():
+                    predictor.set_flat_parameters(weights[row])
+                    predictor.set_proximal(anchor, mu)
+
+            losses = {}
+            for row, predictor in predictors.items():
+                count = int(counts[row])
+                if count < window_size + 1:
+                    continue
+                series = torch.from_numpy(history[row, span - count:])
+                predictor.train_windows(series.unfold(0, window_size + 1, 1))
+                weights[row] = predictor.get_flat_parameters()
+                losses[row] = predictor.training_history[-1]
+
+            conn.send(losses)
+    finally:
+        del weights, history, counts
+        for segment in segments.values():
+            segment.close()
+
+
+class ParallelTrainer:
+    """Trains every sensor's predictor on a pool of worker processes
+
+    Model weights and recent history windows are exchanged through shared
+    memory rather than pickled; the pipes only carry small commands and
+    per-sensor losses. Each worker owns the predictors (and optimizer state)
+    of a contiguous slice of sensors.
+    """
+
+    def __init__(self, num_workers: Optional[int] = None, window_size: int = 24,
+                 replay_size: int = 128, lr: float = 0.001, threads_per_worker: int = 1,
+                 pin_cpus: bool = False, start_method: str = 'spawn'):
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.window_size = window_size
+        self.span = replay_size + window_size
+        self.lr = lr
+        self.threads_per_worker = threads_per_worker
+        self.pin_cpus = pin_cpus
+        self.context = mp.get_context(start_method)
+
+        self._segments: Dict[str, SharedMemory] = {}
+        self._workers = []
+        self._connections = []
+        self._reload = True
+        self._proximal_mu = 0.0
+
+    @property
+    def started(self) -> bool:
+        return bool(self._workers)
+
+    def start(self, sensors: List):
+        """Allocate shared buffers and launch the workers"""
+        if self.started:
+            return
+
+        num_sensors = len(sensors)
+        param_count = sensors[0].predictor.get_flat_parameters().numel()
+        sizes = {
+            'weights': (num_sensors + 1) * param_count * 4,
+            'history': num_sensors * self.span * 4,
+            'counts': num_sensors * 8
+        }
+        self._segments = {key: SharedMemory(create=True, size=size) for key, size in sizes.items()}
+        self._weights = torch.from_numpy(np.ndarray((num_sensors + 1, param_count), dtype=np.float32,
+                                                    buffer=self._segments['weights'].buf))
+        self._history = np.ndarray((num_sensors, self.span), dtype=np.float32,
+                                   buffer=self._segments['history'].buf)
+        self._counts = np.ndarray((num_sensors,), dtype=np.int64, buffer=self._segments['counts'].buf)
+        self.push_weights(sensors)
+
+        names = {key: segment.name for key, segment in self._segments.items()}
+        workers = min(self.num_workers, num_sensors)
+        for worker_id, rows in enumerate(np.array_split(np.arange(num_sensors), workers)):
+            parent, child = self.context.Pipe()
+            process = self.context.Process(
+                target=_worker_loop,
+                args=(child, worker_id, rows.tolist(), names, num_sensors, param_count,
+                      self.span, self.window_size, self.lr, self.threads_per_worker, self.pin_cpus),
+                daemon=True
+            )
+            process.start()
+            self._workers.append(process)
+            self._connections.append(parent)
+
+    def push_weights(self, sensors: List, anchor: Optional[torch.Tensor] = None, mu: float = 0.0):
+        """Publish the parent's model weights (and FedProx anchor) to the workers"""
+        for row, sensor in enumerate(sensors):
+            self._weights[row] = sensor.predictor.get_flat_parameters()
+        if anchor is not None:
+            self._weights[len(sensors)] = anchor
+        self._proximal_mu = mu
+        self._reload = True
+
+    def train(self, sensors: List):
+        """Run one local training step for every sensor across the pool"""
+        if not self.started:
+            self.start(sensors)
+
+        for row, sensor in enumerate(sensors):
+            recent = sensor.temperature_history.last(self.span)
+            self._history[row, self.span - len(recent):] = recent
+            self._counts[row] = len(recent)
+
+        for connection in self._connections:
+            connection.send(('train', self._reload, self._proximal_mu))
+        self._reload = False
+
+        for connection in self._connections:
+            for row, loss in connection.recv().items():
+                sensors[row].predictor.training_history.append(loss)
+
+        # Bring trained weights back so the parent can predict locally
+        for row, sensor in enumerate(sensors):
+            sensor.predictor.set_flat_parameters(self._weights[row])
+
+    def close(self):
+        """Stop the workers and release shared memory"""
+        for connection in self._connections:
+            try:
+                connection.send(('stop', False, 0.0))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._workers:
+            process.join(timeout=5)
+        self._workers = []
+        self._connections = []
+
+        if self._segments:
+            del self._weights, self._history, self._counts
+            for segment in self._segments.values():
+                segment.close()
+                segment.unlink()
+            self._segments = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,218 @@
+import math
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Only model-update noise needs torch, so it is imported on first use
+if TYPE_CHECKING:
+    import torch
+
+MECHANISMS = ('gaussian', 'laplace')
+
+# Numeric pattern statistics released per sensor, in column order
+PATTERN_FIELDS = ('min', 'max', 'variance', 'trend')
+
+# Public clipping range of each statistic; its width is the statistic's sensitivity.
+# The defaults cover the built-in sensor patterns' 24-hour windows with some margin.
+DEFAULT_BOUNDS = {
+    'min': (5.0, 35.0),
+    'max': (10.0, 40.0),
+    'variance': (0.0, 10.0),
+    'trend': (-0.5, 0.5)
+}
+
+
+def _normal_cdf(x: float) -> float:
+    return 0.5 * math.erfc(-x / math.sqrt(2))
+
+
+def gaussian_sigma(sensitivity: float, epsilon: float, delta: float) -> float:
+    """Smallest Gaussian noise scale giving (epsilon, delta)-DP for an L2 sensitivity
+
+    Uses the exact condition of the analytic Gaussian mechanism (Balle &
+    Wang, 2018), which is valid for any epsilon, unlike the classical
+    `sqrt(2 ln(1.25/delta)) / epsilon` bound that needs epsilon < 1.
+    """
+    if epsilon <= 0 or not 0 < delta < 1:
+        raise ValueError("epsilon must be positive and delta in (0, 1)")
+
+    def achieved_delta(sigma: float) -> float:
+        a = sensitivity / (2 * sigma)
+        b = epsilon * sigma / sensitivity
+        return _normal_cdf(a - b) - math.exp(epsilon) * _normal_cdf(-a - b)
+
+    low, high = 1e-6 * sensitivity, sensitivity
+    while achieved_delta(high) > delta:
+        high *= 2
+    for _ in range(60):
+        middle = (low + high) / 2
+        if achieved_delta(middle) > delta:
+            low = middle
+        else:
+            high = middle
+    return high
+
+
+def laplace_scale(sensitivity: float, epsilon: float) -> float:
+    """Laplace noise scale giving epsilon-DP for an L1 sensitivity"""
+    if epsilon <= 0:
+        raise ValueError("epsilon must be positive")
+    return sensitivity / epsilon
+
+
+def patterns_to_arrays(patterns: Sequence[Dict], window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Stack `learn_patterns` dicts into (n, fields) statistics and (n, window) peak masks"""
+    stats = np.empty((len(patterns), len(PATTERN_FIELDS)))
+    peaks = np.zeros((len(patterns), window), dtype=bool)
+    for row, pattern in enumerate(patterns):
+        stats[row] = (*pattern['daily_range'], pattern['variance'], pattern['trend'])
+        peaks[row, [h for h in pattern['peak_hours'] if h < window]] = True
+    return stats, peaks
+
+
+def row_to_pattern(stats: np.ndarray, peaks: np.ndarray) -> Dict:
+    """One row of `patterns_to_arrays` back in `learn_patterns` format"""
+    low, high, variance, trend = stats.tolist()
+    return {
+        'daily_range': (low, high),
+        'variance': variance,
+        'trend': trend,
+        'peak_hours': np.flatnonzero(peaks).tolist()
+    }
+
+
+class Privatizer:
+    """Differentially private release of pattern statistics and model updates
+
+    Every release is vectorized across all sensors at once:
+
+    - Pattern statistics are clipped to public `bounds` and perturbed as
+      one vector. Measured in units of each statistic's range, a sensor's
+      vector moves by at most `sqrt(fields)` in L2 (Gaussian noise) or
+      `fields` in L1 (Laplace noise), and one release spends
+      `(1 - peak_share)` of `pattern_epsilon` and the full delta. Peak-hour
+      masks use randomized response with the remaining share spread over
+      the window's hours. Results are post-processed back into range.
+    - Model updates are clipped, as deltas against the current global model,
+      to `clip_norm` (L2 for Gaussian, L1 for Laplace noise). Noise is added
+      once to their aggregate (as in DP-FedAvg), scaled by the largest share
+      of it any one client holds, to give `update_epsilon` per round.
+
+    Each sensor's privacy accountant is charged the epsilon and delta of
+    what it releases.
+    """
+
+    def __init__(self, mechanism: str = 'gaussian', pattern_epsilon: float = 1.0,
+                 update_epsilon: float = 1.0, delta: float = 1e-5,
+                 bounds: Optional[Dict[str, Tuple[float, float]]] = None,
+                 peak_share: float = 0.25, clip_norm: float = 1.0,
+                 seed: Optional[int] = None):
+        if mechanism not in MECHANISMS:
+            raise ValueError(f"Unknown mechanism '{mechanism}'. Choose from: {', '.join(MECHANISMS)}")
+        if pattern_epsilon <= 0 or update_epsilon <= 0:
+            raise ValueError("epsilon must be positive")
+        if not 0 <= peak_share < 1:
+            raise ValueError("peak_share must be in [0, 1)")
+        if clip_norm <= 0:
+            raise ValueError("clip_norm must be positive")
+
+        self.mechanism = mechanism
+        self.pattern_epsilon = pattern_epsilon
+        self.update_epsilon = update_epsilon
+        self.delta = delta
+        self.bounds = {**DEFAULT_BOUNDS, **(bounds or {})}
+        self.peak_share = peak_share
+        self.clip_norm = clip_norm
+        self.seed = seed
+
+        import torch
+        self.rng = np.random.default_rng(seed)
+        self.generator = torch.Generator()
+        if seed is not None:
+            self.generator.manual_seed(seed)
+
+        self._low, self._high = (np.array(side, dtype=float)
+                                 for side in zip(*(self.bounds[f] for f in PATTERN_FIELDS)))
+        if np.any(self._high <= self._low):
+            raise ValueError("Each bound must be an increasing (low, high) pair")
+        fields = len(PATTERN_FIELDS)
+        sensitivity = math.sqrt(fields) if mechanism == 'gaussian' else fields
+        self._stats_scale = (self._high - self._low) * self._scale(
+            sensitivity, (1 - peak_share) * pattern_epsilon, self.delta)
+        # Replacing one client's clipped update moves its share of the aggregate
+        # by at most twice the clip norm
+        self._update_scale = self._scale(2 * clip_norm, update_epsilon, self.delta)
+
+    def _scale(self, sensitivity: float, epsilon: float, delta: float) -> float:
+        if self.mechanism == 'gaussian':
+            return gaussian_sigma(sensitivity, epsilon, delta)
+        return laplace_scale(sensitivity, epsilon)
+
+    @property
+    def release_delta(self) -> float:
+        """Delta spent by one pattern or update release (zero for Laplace noise)"""
+        return self.delta if self.mechanism == 'gaussian' else 0.0
+
+    def privatize_stats(self, stats: np.ndarray, peaks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Noisy copies of (n, fields) statistics and (n, window) boolean peak masks"""
+        stats = np.clip(stats, self._low, self._high)
+        if self.mechanism == 'gaussian':
+            noise = self.rng.standard_normal(stats.shape)
+        else:
+            noise = self.rng.laplace(size=stats.shape)
+        noisy = np.clip(stats + noise * self._stats_scale, self._low, self._high)
+        # Post-processing: a range is reported low to high
+        noisy[:, :2].sort(axis=1)
+
+        if self.peak_share > 0 and peaks.shape[1]:
+            bit_epsilon = self.peak_share * self.pattern_epsilon / peaks.shape[1]
+            flip = self.rng.random(peaks.shape) < 1 / (1 + math.exp(bit_epsilon))
+            peaks = peaks ^ flip
+        else:
+            peaks = np.zeros_like(peaks)
+        return noisy, peaks
+
+    def privatize_patterns(self, patterns: Sequence[Dict], window: int = 24) -> List[Dict]:
+        """`privatize_stats` for a batch of `learn_patterns` dicts"""
+        if not patterns:
+            return []
+        stats, peaks = self.privatize_stats(*patterns_to_arrays(patterns, window))
+        return [row_to_pattern(s, p) for s, p in zip(stats, peaks)]
+
+    def clip_updates(self, updates: 'torch.Tensor', reference: 'torch.Tensor') -> 'torch.Tensor':
+        """(clients, parameters) updates with their deltas from `reference` clipped to `clip_norm`"""
+        deltas = updates - reference
+        norms = deltas.norm(p=2 if self.mechanism == 'gaussian' else 1, dim=1, keepdim=True)
+        deltas.mul_((self.clip_norm / norms.clamp_min(1e-12)).clamp(max=1.0))
+        return deltas.add_(reference)
+
+    def privatize_aggregate(self, model: 'torch.Tensor', share: float) -> 'torch.Tensor':
+        """Add noise to an aggregate of clipped updates, none weighing more than `share`"""
+        import torch
+        if self.mechanism == 'gaussian':
+            noise = torch.randn(model.shape, generator=self.generator, dtype=model.dtype)
+        else:
+            uniform = torch.rand(model.shape, generator=self.generator, dtype=model.dtype)
+            noise = torch.distributions.Laplace(0.0, 1.0).icdf(uniform.clamp(1e-7, 1 - 1e-7))
+        return model + noise * (self._update_scale * share)
+
+    def config(self) -> Dict:
+        """Constructor arguments (besides the seed) that rebuild this privatizer"""
+        return {
+            'mechanism': self.mechanism,
+            'pattern_epsilon': self.pattern_epsilon,
+            'update_epsilon': self.update_epsilon,
+            'delta': self.delta,
+            'bounds': {field: list(bound) for field, bound in self.bounds.items()},
+            'peak_share': self.peak_share,
+            'clip_norm': self.clip_norm
+        }
+
+    def state_dict(self) -> Dict:
+        """Noise RNG states"""
+        return {'rng': self.rng.bit_generator.state, 'generator': self.generator.get_state()}
+
+    def load_state_dict(self, state: Dict):
+        """Restore from `state_dict`"""
+        self.rng.bit_generator.state = state['rng']
+        self.generator.set_state(state['generator'])
+
@@ -0,0 +1,251 @@
+import numpy as np
+import torch
+from typing import Dict, List, Optional
+from .aggregation import AggregationStrategy, FedAvg, FedProx, TrimmedMean, get_strategy
+from .codec import UpdateCodec, decode_update
+from .hierarchy import CellHierarchy, Upload
+from .privatization import Privatizer
+
+
+class FederationEngine:
+    """Runs periodic federated aggregation rounds over the network's sensor models
+
+    Client models are flattened into contiguous parameter vectors and stacked,
+    so each round is a single vectorized reduction by the configured strategy.
+    The aggregated model is broadcast back to every sensor. With a `codec`,
+    client uploads after the first (bootstrap) round pass through its
+    encoder as deltas against the global model and are aggregated from the
+    decoded (lossy) vectors, so bandwidth can be traded against accuracy.
+    With a `privatizer`, every client starts from one shared model
+    (`seed_model`), uploads are clipped around the global model (in one
+    batched tensor operation) before encoding, noise is added once to the
+    aggregate and each participant's privacy accountant is charged the
+    privatizer's epsilon; without one, `update_epsilon` is charged as a
+    nominal cost. With a `hierarchy`,
+    clients are aggregated per spatial cell by edge aggregators and the
+    round combines the cell summaries (see `CellHierarchy`).
+    """
+
+    def __init__(self, strategy: Optional[AggregationStrategy] = None,
+                 round_interval: int = 24, participation: float = 1.0,
+                 codec: Optional[UpdateCodec] = None, seed: Optional[int] = None,
+                 update_epsilon: Optional[float] = None,
+                 privatizer: Optional[Privatizer] = None,
+                 hierarchy: Optional[CellHierarchy] = None):
+        if not 0 < participation <= 1:
+            raise ValueError("participation must be in (0, 1]")
+
+        self.strategy = strategy if strategy is not None else FedAvg()
+        self.round_interval = round_interval
+        self.participation = participation
+        self.codec = codec
+        self.update_epsilon = update_epsilon
+        self.privatizer = privatizer
+        self.hierarchy = hierarchy
+        self.rng = np.random.default_rng(seed)
+
+        self.global_model: Optional[torch.Tensor] = None
+        self.rounds: List[Dict] = []
+
+    def should_run(self, hour: int) -> bool:
+        """Whether a round is scheduled at this hour"""
+        return hour > 0 and hour % self.round_interval == 0
+
+    def step(self, hour: int, network) -> Optional[Dict]:
+        """Run a round if one is due at this hour"""
+        if not self.should_run(hour):
+            return None
+        return self.run_round(network, hour)
+
+    def seed_model(self, network):
+        """Broadcast the first client's untrained weights as the initial global model
+
+        Privatized uploads are clipped as deltas from the global model, so
+        clients must share one before any training; an untrained model
+        depends on no data and costs no privacy budget.
+        """
+        if network.fleet is not None:
+            model = network.fleet.model.flat_parameters(torch.tensor([0]))[0]
+        else:
+            model = network.sensors[0].predictor.get_flat_parameters()
+        self.global_model = model
+        self._broadcast(network, model)
+
+    def sample_clients(self, num_clients: int) -> np.ndarray:
+        """Indices of the clients taking part in this round"""
+        count = max(1, int(round(self.participation * num_clients)))
+        if count >= num_clients:
+            return np.arange(num_clients)
+        return np.sort(self.rng.choice(num_clients, size=count, replace=False))
+
+    def run_round(self, network, hour: int) -> Dict:
+        """Aggregate participating clients' models and broadcast the result"""
+        num_clients = network.fleet.size if network.fleet is not None else len(network.sensors)
+        if self.privatizer is not None and self.global_model is None:
+            raise ValueError("Privatized rounds need a shared initial model; call seed_model before training")
+        participants = self.sample_clients(num_clients)
+        if self.privatizer is not None:
+            self._charge(network, participants, self.privatizer.update_epsilon,
+                         self.privatizer.release_delta)
+        elif self.update_epsilon:
+            self._charge(network, participants, self.update_epsilon)
+
+        if self.hierarchy is not None:
+            global_model, upload, client_drift, tier = self.hierarchy.aggregate(self, network, participants)
+        else:
+            upload = self._collect(network, participants)
+            global_model = self.strategy.aggregate(upload.updates, upload.weights)
+            client_drift = float((upload.updates - global_model).norm(dim=1).mean())
+            tier = {}
+        if self.privatizer is not None:
+            share = self.strategy.max_share(upload.weights, len(participants))
+            global_model = self.privatizer.privatize_aggregate(global_model, share)
+        self.global_model = global_model
+        self._broadcast(network, global_model)
+
+        bytes_per_model = global_model.shape[0] * global_model.element_size()
+        stats = {
+            'round': len(self.rounds) + 1,
+            'hour': hour,
+            'strategy': self.strategy.name,
+            'participants': len(participants),
+            'bytes_up': upload.bytes_up,
+            'bytes_down': num_clients * bytes_per_model,
+            'reconstruction_error': (upload.error_sq ** 0.5 / max(upload.norm_sq ** 0.5, 1e-12)
+                                     if upload.error_sq else 0.0),
+            'client_drift': client_drift,
+            'mean_loss': float(np.mean(upload.losses)) if len(upload.losses) else None,
+            'mean_accuracy': self._mean_accuracy(network),
+            **tier
+        }
+        self.rounds.append(stats)
+        return stats
+
+    def _broadcast(self, network, global_model: torch.Tensor):
+        """Load `global_model` into every client and anchor their proximal terms to it"""
+        if network.fleet is not None:
+            network.fleet.model.load_flat_parameters(global_model)
+            network.fleet.set_proximal(global_model, self.strategy.proximal_mu)
+        else:
+            for sensor in network.sensors:
+                sensor.predictor.set_flat_parameters(global_model)
+                sensor.predictor.set_proximal(global_model, self.strategy.proximal_mu)
+
+    def _collect(self, network, clients: np.ndarray) -> Upload:
+        """Gather, clip and encode the uploads of `clients`"""
+        if network.fleet is not None:
+            updates, weights, losses = self._gather_fleet(network.fleet, clients)
+        else:
+            updates, weights, losses = self._gather_sensors(network.sensors, clients)
+        if self.privatizer is not None:
+            updates = self.privatizer.clip_updates(updates, self.global_model)
+
+        bytes_up = updates.shape[0] * updates.shape[1] * updates.element_size()
+        error_sq = norm_sq = 0.0
+        if self.codec is not None and self.global_model is not None:
+            reference = self.global_model
+            encoded = [self.codec.encode(update, reference, client=int(client))
+                       for update, client in zip(updates, clients)]
+            decoded = torch.stack([decode_update(data, reference) for data in encoded])
+            bytes_up = sum(len(data) for data in encoded)
+            error_sq = float((decoded - updates).square().sum())
+            norm_sq = float(updates.square().sum())
+            updates = decoded
+        return Upload(updates, weights, losses, bytes_up, error_sq, norm_sq)
+
+    def _charge(self, network, participants: np.ndarray, epsilon: float, delta: float = 0.0):
+        """Spend one upload's epsilon and delta from every participant's privacy budget"""
+        if network.fleet is not None:
+            mask = np.zeros(network.fleet.size, dtype=bool)
+            mask[participants] = True
+            network.fleet.accountant.spend(epsilon, delta, mask)
+        else:
+            for i in participants:
+                network.sensors[i].privacy.record_model_update(epsilon, delta)
+
+    def _gather_fleet(self, fleet, clients: np.ndarray):
+        """Rows of the fleet's batched model belonging to `clients`
+
+        Losses are reported only for clients that trained since their last
+        upload, so rows the scheduler skipped do not repeat stale values.
+        """
+        updates = fleet.model.flat_parameters(torch.from_numpy(clients))
+        fresh = clients[fleet.loss_fresh[clients]]
+        losses = fleet.loss_last[fresh]
+        fleet.loss_fresh[fresh] = False
+        return updates, None, losses
+
+    def _gather_sensors(self, sensors, clients: np.ndarray):
+        """Stack `clients`' predictor parameters, weighted by sample count"""
+        chosen = [sensors[i] for i in clients]
+        updates = torch.stack([s.predictor.get_flat_parameters() for s in chosen])
+        weights = torch.tensor([max(1, len(s.temperature_history)) for s in chosen], dtype=torch.float32)
+        losses = [s.predictor.training_history[-1] for s in chosen if s.predictor.training_history]
+        return updates, weights, losses
+
+    def _mean_accuracy(self, network) -> float:
+        """Network-wide accuracy at the time of the round"""
+        if network.fleet is not None:
+            return float(np.mean(network.fleet.accuracy_history[-1]))
+        return float(np.mean([s.accuracy_history[-1] for s in network.sensors]))
+
+    def config(self) -> Dict:
+        """Constructor arguments (besides the seed) that rebuild this engine"""
+        options = {}
+        if isinstance(self.strategy, FedProx):
+            options['mu'] = self.strategy.proximal_mu
+        elif isinstance(self.strategy, TrimmedMean):
+            options['trim_ratio'] = self.strategy.trim_ratio
+        return {
+            'strategy': self.strategy.name,
+            'strategy_options': options,
+            'round_interval': self.round_interval,
+            'participation': self.participation,
+            'codec': self.codec.config() if self.codec is not None else None,
+            'update_epsilon': self.update_epsilon,
+            'hierarchy': self.hierarchy.config() if self.hierarchy is not None else None
+        }
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'FederationEngine':
+        """Engine built from `config()`"""
+        codec = UpdateCodec(**config['codec']) if config['codec'] is not None else None
+        hierarchy = CellHierarchy(**config['hierarchy']) if config.get('hierarchy') else None
+        return cls(get_strategy(config['strategy'], **config['strategy_options']),
+                   config['round_interval'], config['participation'], codec,
+                   update_epsilon=config.get('update_epsilon'), hierarchy=hierarchy)
+
+    def state_dict(self) -> Dict:
+        """Global model, round log, sampling RNG and codec state"""
+        return {
+            'rng': self.rng.bit_generator.state,
+            'global_model': self.global_model,
+            'rounds': self.rounds,
+            'codec': self.codec.state_dict() if self.codec is not None else None
+        }
+
+    def load_state_dict(self, state: Dict):
+        """Restore from `state_dict`"""
+        self.rng.bit_generator.state = state['rng']
+        self.global_model = state['global_model']
+        self.rounds = list(state['rounds'])
+        if self.codec is not None:
+            self.codec.load_state_dict(state['codec'])
+
+    def get_metrics(self) -> Dict:
+        """Summary of communication cost and convergence so far"""
+        if not self.rounds:
+            return {'rounds': 0, 'total_bytes': 0, 'bytes_per_round': 0, 'compression_ratio': 1.0,
+                    'client_drift': None, 'mean_loss': None, 'mean_accuracy': None}
+
+        last = self.rounds[-1]
+        total_bytes = sum(r['bytes_up'] + r['bytes_down'] + r.get('bytes_edge', 0) for r in self.rounds)
+        return {
+            'rounds': len(self.rounds),
+            'total_bytes': total_bytes,
+            'bytes_per_round': total_bytes / len(self.rounds),
+            'compression_ratio': self.codec.compression_ratio if self.codec is not None else 1.0,
+            'client_drift': last['client_drift'],
+            'mean_loss': last['mean_loss'],
+            'mean_accuracy': last['mean_accuracy']
+        }
@@ -0,0 +1,227 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+import torch
+from ..core.sensor import EnhancedSensor
+from .aggregation import AggregationStrategy, FedAvg
+from .codec import UpdateCodec, decode_update
+from .transport import TcpTransport, Transport
+
+
+class FederationCoordinator:
+    """Asyncio coordinator that ingests sensor readings and runs deadline-bound rounds
+
+    Each round broadcasts the current global model to every connected client
+    and aggregates whatever updates arrive before `round_deadline` seconds
+    have passed, so a slow sensor cannot stall the round.
+    """
+
+    def __init__(self, strategy: Optional[AggregationStrategy] = None,
+                 round_deadline: float = 1.0, min_updates: int = 1):
+        self.strategy = strategy if strategy is not None else FedAvg()
+        self.round_deadline = round_deadline
+        self.min_updates = min_updates
+
+        self.clients: Dict[str, Transport] = {}
+        self.global_model: Optional[torch.Tensor] = None
+        self.readings_received: Dict[str, int] = {}
+        self.latest_readings: Dict[str, float] = {}
+        self.rounds: List[Dict] = []
+        self.late_updates = 0
+        self.update_bytes = 0
+
+        self._round_id = 0
+        self._round_reference: Optional[torch.Tensor] = None
+        self._pending: Optional[Dict[str, Tuple[torch.Tensor, int]]] = None
+        self._expected = 0
+        self._round_complete: Optional[asyncio.Event] = None
+
+    async def attach(self, transport: Transport):
+        """Serve one client connection until it closes"""
+        try:
+            header, _ = await transport.recv()
+        except ConnectionError:
+            return
+        client_id = header['client_id']
+        self.clients[client_id] = transport
+        self.readings_received.setdefault(client_id, 0)
+
+        try:
+            while True:
+                header, payload = await transport.recv()
+                self._handle(client_id, header, payload)
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.pop(client_id, None)
+
+    async def serve_tcp(self, host: str = '127.0.0.1', port: int = 8765) -> asyncio.AbstractServer:
+        """Accept clients over TCP; port 0 picks a free port"""
+        async def handle(reader, writer):
+            await self.attach(TcpTransport(reader, writer))
+            writer.close()
+
+        return await asyncio.start_server(handle, host, port)
+
+    def _handle(self, client_id: str, header: Dict, payload: bytes):
+        """Dispatch a message from a connected client"""
+        kind = header['type']
+        if kind == 'readings':
+            readings = np.frombuffer(payload, dtype=np.float64)
+            self.readings_received[client_id] += len(readings)
+            if len(readings):
+                self.latest_readings[client_id] = float(readings[-1])
+        elif kind == 'update':
+            if self._pending is None or header['round'] != self._round_id:
+                # Arrived after its round's deadline
+                self.late_updates += 1
+                return
+            if header.get('encoded'):
+                vector = decode_update(payload, self._round_reference)
+            else:
+                vector = torch.from_numpy(np.frombuffer(payload, dtype=np.float32).copy())
+            self._pending[client_id] = (vector, header['samples'])
+            self.update_bytes += len(payload)
+            if len(self._pending) >= self._expected:
+                self._round_complete.set()
+
+    async def run_round(self) -> Optional[Dict]:
+        """Broadcast the global model, wait for updates until the deadline and aggregate"""
+        if not self.clients:
+            return None
+
+        self._round_id += 1
+        started = time.perf_counter()
+        self._pending = {}
+        self._expected = len(self.clients)
+        self._round_complete = asyncio.Event()
+        self._round_reference = self.global_model
+
+        payload = self.global_model.numpy().tobytes() if self.global_model is not None else b''
+        header = {'type': 'round_start', 'round': self._round_id}
+        await asyncio.gather(*(t.send(header, payload) for t in list(self.clients.values())),
+                             return_exceptions=True)
+
+        try:
+            await asyncio.wait_for(self._round_complete.wait(), self.round_deadline)
+        except asyncio.TimeoutError:
+            pass
+
+        received, self._pending = self._pending, None
+        aggregated = len(received) >= self.min_updates
+        if aggregated:
+            updates = torch.stack([vector for vector, _ in received.values()])
+            weights = torch.tensor([samples for _, samples in received.values()], dtype=torch.float32)
+            self.global_model = self.strategy.aggregate(updates, weights)
+
+        stats = {
+            'round': self._round_id,
+            'participants': len(received),
+            'stragglers': self._expected - len(received),
+            'aggregated': aggregated,
+            'latency': time.perf_counter() - started
+        }
+        self.rounds.append(stats)
+        return stats
+
+    async def stop_clients(self):
+        """Ask every connected client to stop"""
+        await asyncio.gather(*(t.send({'type': 'stop'}) for t in list(self.clients.values())),
+                             return_exceptions=True)
+
+
+class SensorClient:
+    """Runs an EnhancedSensor and talks to the coordinator over a transport
+
+    Readings are sent in batches of `batch_size`; model updates are sent from
+    their own task so local generation never waits on the network.
+    `update_delay` simulates a slow (straggling) device, and an optional
+    `codec` compresses updates relative to the last global model received
+    (the first update, before any global model exists, is sent raw).
+    """
+
+    def __init__(self, sensor: EnhancedSensor, transport: Transport,
+                 batch_size: int = 24, update_delay: float = 0.0,
+                 client_id: Optional[str] = None, codec: Optional[UpdateCodec] = None):
+        self.sensor = sensor
+        self.transport = transport
+        self.codec = codec
+        self.batch_size = batch_size
+        self.update_delay = update_delay
+        self.client_id = client_id or sensor.name
+
+        self.rounds_joined = 0
+        self._buffer: List[float] = []
+        self._tasks: Set[asyncio.Task] = set()
+        self._stopped = False
+        self._global_model: Optional[torch.Tensor] = None
+
+    async def run(self, hours: int, hour_interval: float = 0.0):
+        """Simulate `hours` readings, streaming them to the coordinator"""
+        await self.transport.send({'type': 'hello', 'client_id': self.client_id})
+        listener = asyncio.create_task(self._listen())
+
+        try:
+            for hour in range(hours):
+                if self._stopped:
+                    break
+                temp = self.sensor.generate_temperature(hour)
+                patterns = self.sensor.learn_patterns()
+                self.sensor.privacy.update(temp, bool(patterns))
+
+                self._buffer.append(temp)
+                if len(self._buffer) >= self.batch_size:
+                    await self._flush()
+                await asyncio.sleep(hour_interval)
+
+            await self._flush()
+        finally:
+            listener.cancel()
+            for task in list(self._tasks):
+                task.cancel()
+            await self.transport.close()
+
+    async def _flush(self):
+        """Send buffered readings as one message"""
+        if not self._buffer:
+            return
+        payload = np.asarray(self._buffer, dtype=np.float64).tobytes()
+        self._buffer = []
+        await self.transport.send({'type': 'readings'}, payload)
+
+    async def _listen(self):
+        """Handle round announcements from the coordinator"""
+        try:
+            while True:
+                header, payload = await self.transport.recv()
+                if header['type'] == 'round_start':
+                    if payload:
+                        global_model = torch.from_numpy(np.frombuffer(payload, dtype=np.float32).copy())
+                        self.sensor.predictor.set_flat_parameters(global_model)
+                        self._global_model = global_model
+                    task = asyncio.create_task(self._send_update(header['round']))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                elif header['type'] == 'stop':
+                    self._stopped = True
+        except ConnectionError:
+            pass
+
+    async def _send_update(self, round_id: int):
+        """Ship the local model for a round"""
+        if self.update_delay:
+            await asyncio.sleep(self.update_delay)
+        vector = self.sensor.predictor.get_flat_parameters()
+        header = {'type': 'update', 'round': round_id,
+                  'samples': max(1, len(self.sensor.temperature_history))}
+        if self.codec is not None and self._global_model is not None:
+            header['encoded'] = True
+            payload = self.codec.encode(vector, self._global_model)
+        else:
+            payload = vector.numpy().tobytes()
+        try:
+            await self.transport.send(header, payload)
+            self.rounds_joined += 1
+        except ConnectionError:
+            pass
@@ -0,0 +1,131 @@
+import json
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+from ..core.patterns import BASE_TEMPERATURES
+
+# Sensors and fleets pull in torch, so they are imported where they are built
+if TYPE_CHECKING:
+    from ..core.fleet import SensorFleet
+    from ..core.sensor import EnhancedSensor
+
+
+class SensorSpec(NamedTuple):
+    """Name, location and pattern type of one sensor in a topology"""
+    name: str
+    location: Tuple[float, float]
+    pattern_type: str
+
+
+# The original three-sensor demo network
+DEFAULT_TOPOLOGY = [
+    SensorSpec("Factory Floor", (0, 0), "factory"),
+    SensorSpec("Office Building", (1, 0), "office"),
+    SensorSpec("Outdoor Area", (2, 0), "outdoor")
+]
+
+LAYOUTS = ('line', 'grid', 'random')
+
+
+def _locations(num_sensors: int, layout: str, spacing: float,
+               rng: np.random.Generator) -> List[Tuple[float, float]]:
+    """Sensor coordinates for a layout"""
+    if layout == 'line':
+        return [(i * spacing, 0.0) for i in range(num_sensors)]
+    if layout == 'grid':
+        width = int(np.ceil(np.sqrt(num_sensors)))
+        return [((i % width) * spacing, (i // width) * spacing) for i in range(num_sensors)]
+    if layout == 'random':
+        extent = spacing * np.sqrt(num_sensors)
+        points = rng.uniform(0, extent, size=(num_sensors, 2))
+        return [(float(x), float(y)) for x, y in points]
+    raise ValueError(f"Unknown layout '{layout}'. Choose from: {', '.join(LAYOUTS)}")
+
+
+def build_topology(num_sensors: int = 3, layout: str = 'line',
+                   pattern_mix: Optional[Dict[str, float]] = None,
+                   spacing: float = 1.0, seed: Optional[int] = None) -> List[SensorSpec]:
+    """Generate `num_sensors` specs with a mix of pattern types
+
+    `pattern_mix` maps pattern type to relative weight; by default the
+    types are used in equal proportion, assigned round-robin.
+    """
+    if num_sensors < 1:
+        raise ValueError("num_sensors must be at least 1")
+
+    rng = np.random.default_rng(seed)
+    if pattern_mix is None:
+        types = list(BASE_TEMPERATURES)
+        pattern_types = [types[i % len(types)] for i in range(num_sensors)]
+    else:
+        unknown = set(pattern_mix) - set(BASE_TEMPERATURES)
+        if unknown:
+            raise ValueError(f"Unknown pattern types: {', '.join(sorted(unknown))}")
+        types = list(pattern_mix)
+        weights = np.asarray([pattern_mix[t] for t in types], dtype=float)
+        pattern_types = list(rng.choice(types, size=num_sensors, p=weights / weights.sum()))
+
+    locations = _locations(num_sensors, layout, spacing, rng)
+    counters = {t: 0 for t in BASE_TEMPERATURES}
+    specs = []
+    for pattern_type, location in zip(pattern_types, locations):
+        counters[pattern_type] += 1
+        name = f"{pattern_type.capitalize()} {counters[pattern_type]}"
+        specs.append(SensorSpec(name, location, str(pattern_type)))
+    return specs
+
+
+def assign_cells(locations, cell_size: Optional[float] = None,
+                 num_cells: Optional[int] = None, seed: Optional[int] = None) -> np.ndarray:
+    """Spatial cell index (0..cells-1) of each location
+
+    With `cell_size`, cells are squares of a regular grid; with
+    `num_cells`, locations are clustered by k-means so cells follow the
+    sensors' actual distribution.
+    """
+    points = np.asarray(locations, dtype=float).reshape(-1, 2)
+    if (cell_size is None) == (num_cells is None):
+        raise ValueError("Pass exactly one of cell_size and num_cells")
+    if cell_size is not None:
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        grid = np.floor(points / cell_size).astype(np.int64)
+        _, cells = np.unique(grid, axis=0, return_inverse=True)
+        return cells.reshape(-1)
+    if num_cells < 1:
+        raise ValueError("num_cells must be at least 1")
+    from .library import kmeans
+    _, cells = np.unique(kmeans(points, num_cells, seed=seed), return_inverse=True)
+    return cells.reshape(-1)
+
+
+def load_topology(path: str) -> List[SensorSpec]:
+    """Read a topology from JSON
+
+    Either an explicit list,
+        {"sensors": [{"name": ..., "location": [x, y], "pattern_type": ...}, ...]}
+    or generator settings passed to `build_topology`,
+        {"generate": {"num_sensors": 100, "layout": "grid", "pattern_mix": {...}}}
+    """
+    with open(path) as f:
+        config = json.load(f)
+
+    if 'sensors' in config:
+        return [SensorSpec(s['name'], tuple(s['location']), s['pattern_type'])
+                for s in config['sensors']]
+    if 'generate' in config:
+        return build_topology(**config['generate'])
+    raise ValueError("Topology file needs a 'sensors' or 'generate' section")
+
+
+def build_sensors(specs: List[SensorSpec], **sensor_kwargs) -> List['EnhancedSensor']:
+    """Individual sensors for a topology"""
+    from ..core.sensor import EnhancedSensor
+    return [EnhancedSensor(spec.name, spec.location, spec.pattern_type, **sensor_kwargs)
+            for spec in specs]
+
+
+def build_fleet(specs: List[SensorSpec], **fleet_kwargs) -> 'SensorFleet':
+    """A batched fleet for a topology"""
+    from ..core.fleet import SensorFleet
+    names, locations, pattern_types = zip(*specs)
+    return SensorFleet(names, locations, pattern_types, **fleet_kwargs)
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import struct
+from typing import Dict, Tuple
+
+# A message is a small JSON header plus an opaque binary payload
+Message = Tuple[Dict, bytes]
+
+_FRAME = struct.Struct('!II')
+
+
+def _encode_header(header: Dict) -> bytes:
+    return json.dumps(header, separators=(',', ':')).encode()
+
+
+def encode_frame(header: Dict, payload: bytes = b'') -> bytes:
+    """Length-prefixed wire encoding of a message"""
+    encoded = _encode_header(header)
+    return _FRAME.pack(len(encoded), len(payload)) + encoded + payload
+
+
+def frame_size(header: Dict, payload: bytes = b'') -> int:
+    """Length of `encode_frame(header, payload)`, without copying the payload"""
+    return _FRAME.size + len(_encode_header(header)) + len(payload)
+
+
+class Transport:
+    """Bidirectional message channel between a sensor client and the coordinator"""
+
+    def __init__(self):
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    async def send(self, header: Dict, payload: bytes = b''):
+        raise NotImplementedError
+
+    async def recv(self) -> Message:
+        """Next message; raises ConnectionError once the peer has closed"""
+        raise NotImplementedError
+
+    async def close(self):
+        raise NotImplementedError
+
+
+class QueueTransport(Transport):
+    """In-process transport over a pair of asyncio queues"""
+
+    def __init__(self, inbox: asyncio.Queue, outbox: asyncio.Queue):
+        super().__init__()
+        self.inbox = inbox
+        self.outbox = outbox
+        self.closed = False
+
+    @classmethod
+    def pair(cls, maxsize: int = 0) -> Tuple['QueueTransport', 'QueueTransport']:
+        """Two connected ends, e.g. (client side, coordinator side)"""
+        a, b = asyncio.Queue(maxsize), asyncio.Queue(maxsize)
+        return cls(a, b), cls(b, a)
+
+    async def send(self, header: Dict, payload: bytes = b''):
+        if self.closed:
+            raise ConnectionError("transport is closed")
+        # Account for the bytes the same message would take on the wire
+        self.bytes_sent += frame_size(header, payload)
+        await self.outbox.put((header, payload))
+
+    async def recv(self) -> Message:
+        message = await self.inbox.get()
+        if message is None:
+            raise ConnectionError("peer closed the transport")
+        header, payload = message
+        self.bytes_received += frame_size(header, payload)
+        return message
+
+    async def close(self):
+        if not self.closed:
+            self.closed = True
+            await self.outbox.put(None)
+
+
+class TcpTransport(Transport):
+    """Length-prefixed framing over an asyncio TCP stream"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        super().__init__()
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host: str = '127.0.0.1', port: int = 8765) -> 'TcpTransport':
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def send(self, header: Dict, payload: bytes = b''):
+        frame = encode_frame(header, payload)
+        self.writer.write(frame)
+        await self.writer.drain()
+        self.bytes_sent += len(frame)
+
+    async def recv(self) -> Message:
+        try:
+            prefix = await self.reader.readexactly(_FRAME.size)
+            header_size, payload_size = _FRAME.unpack(prefix)
+            header = json.loads(await self.reader.readexactly(header_size))
+            payload = await self.reader.readexactly(payload_size) if payload_size else b''
+        except asyncio.IncompleteReadError as e:
+            raise ConnectionError("peer closed the connection") from e
+
+        self.bytes_received += _FRAME.size + header_size + payload_size
+        return header, payload
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
@@ -0,0 +1,306 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+from typing import Any, Dict, List, Optional
+import numpy as np
+import torch
+
+LATEST_FILE = 'LATEST'
+BLOB_DIR = 'blobs'
+
+
+def _blob_name(array: np.ndarray) -> str:
+    """Content address of an array, including its dtype and shape"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{array.dtype.str}{array.shape}".encode())
+    digest.update(np.ascontiguousarray(array).data)
+    return digest.hexdigest()
+
+
+def global_rng_state() -> Dict:
+    """Process-wide NumPy and torch RNG states"""
+    kind, keys, pos, has_gauss, cached = np.random.get_state()
+    return {'numpy': [kind, keys, pos, has_gauss, cached], 'torch': torch.get_rng_state()}
+
+
+def set_global_rng_state(state: Dict):
+    """Restore `global_rng_state`"""
+    kind, keys, pos, has_gauss, cached = state['numpy']
+    np.random.set_state((kind, np.asarray(keys, dtype=np.uint32), pos, has_gauss, cached))
+    torch.set_rng_state(torch.as_tensor(state['torch'], dtype=torch.uint8))
+
+
+class _Encoder:
+    """Turns a state tree into JSON plus a list of arrays to store
+
+    Arrays and tensors are copied (the live objects keep changing while the
+    writer runs) and referenced by position in `arrays`. Append-only series
+    (`{'kind': 'series', 'total': n, 'values': ...}`) are split into blocks
+    aligned on absolute row numbers; complete blocks never change, so they
+    are hashed and written once and later snapshots only reference them.
+    """
+
+    def __init__(self, blocks: Dict[str, Dict[int, str]], block_rows: int):
+        self.blocks = blocks
+        self.block_rows = block_rows
+        self.arrays: List[np.ndarray] = []
+        self.named: Dict[str, np.ndarray] = {}
+
+    def _array(self, array: np.ndarray) -> int:
+        self.arrays.append(np.array(array, copy=True))
+        return len(self.arrays) - 1
+
+    def _series(self, path: str, series: Dict) -> Dict:
+        values = np.asarray(series['values'])
+        total = series['total']
+        low = total - len(values)
+        rows = self.block_rows
+        known = self.blocks.setdefault(path, {})
+
+        pieces = []
+        for block in range(low // rows, (total - 1) // rows + 1 if total else 0):
+            start, end = max(block * rows, low), min((block + 1) * rows, total)
+            part = values[start - low:end - low]
+            if start == block * rows and end == (block + 1) * rows:
+                if block not in known:
+                    name = _blob_name(part)
+                    self.named[name] = np.array(part, copy=True)
+                    known[block] = name
+                pieces.append([start, end, known[block]])
+            else:
+                pieces.append([start, end, self._array(part)])
+
+        # Blocks that left the retained range will not be referenced again
+        for block in [b for b in known if b < low // rows]:
+            del known[block]
+
+        return {'total': total, 'dtype': values.dtype.str, 'shape': list(values.shape[1:]),
+                'pieces': pieces}
+
+    def encode(self, obj: Any, path: str = '') -> Any:
+        if isinstance(obj, torch.Tensor):
+            return {'__tensor__': self._array(obj.detach().cpu().numpy())}
+        if isinstance(obj, np.ndarray):
+            return {'__array__': self._array(obj)}
+        if isinstance(obj, np.generic):
+            return {'__scalar__': obj.dtype.str, 'value': obj.item()}
+        if isinstance(obj, dict):
+            if obj.get('kind') == 'series':
+                return {'__series__': self._series(path, obj)}
+            if all(isinstance(key, str) for key in obj):
+                return {key: self.encode(value, f"{path}/{key}") for key, value in obj.items()}
+            return {'__items__': [[self.encode(key), self.encode(value, f"{path}/{key}")]
+                                  for key, value in obj.items()]}
+        if isinstance(obj, tuple):
+            return {'__tuple__': [self.encode(v, f"{path}/{i}") for i, v in enumerate(obj)]}
+        if isinstance(obj, list):
+            return [self.encode(v, f"{path}/{i}") for i, v in enumerate(obj)]
+        return obj
+
+
+def _decode(obj: Any, blobs: List[str], load) -> Any:
+    """Inverse of `_Encoder.encode`, loading arrays through `load(name)`"""
+    if isinstance(obj, list):
+        return [_decode(v, blobs, load) for v in obj]
+    if not isinstance(obj, dict):
+        return obj
+    if '__array__' in obj:
+        return load(blobs[obj['__array__']])
+    if '__tensor__' in obj:
+        return torch.from_numpy(np.array(load(blobs[obj['__tensor__']])))
+    if '__scalar__' in obj:
+        return np.dtype(obj['__scalar__']).type(obj['value'])
+    if '__tuple__' in obj:
+        return tuple(_decode(v, blobs, load) for v in obj['__tuple__'])
+    if '__items__' in obj:
+        return {_decode(k, blobs, load): _decode(v, blobs, load) for k, v in obj['__items__']}
+    if '__series__' in obj:
+        series = obj['__series__']
+        parts = [load(ref if isinstance(ref, str) else blobs[ref]) for _, _, ref in series['pieces']]
+        values = (np.concatenate(parts) if parts else
+                  np.zeros([0] + series['shape'], dtype=np.dtype(series['dtype'])))
+        return {'kind': 'series', 'total': series['total'], 'values': values}
+    return {k: _decode(v, blobs, load) for k, v in obj.items()}
+
+
+class Checkpointer:
+    """Periodic, incremental snapshots of an EnhancedFederatedNetwork
+
+    A snapshot is a JSON manifest describing the state tree plus
+    content-addressed `.npy` blobs. Unchanged arrays map to existing blobs
+    and completed history blocks are written exactly once, so each
+    snapshot only writes what changed since the previous one. The state is
+    captured (copied) on the caller's thread; hashing and writing happen on
+    a background thread when `background` is set. The newest `keep`
+    snapshots are retained and unreferenced blobs are removed.
+    """
+
+    def __init__(self, directory: str, every: int = 24, keep: int = 2,
+                 block_rows: int = 256, background: bool = True,
+                 metadata: Optional[Dict] = None):
+        if every < 1 or keep < 1:
+            raise ValueError("every and keep must be at least 1")
+        self.directory = directory
+        self.every = every
+        self.keep = keep
+        self.block_rows = block_rows
+        self.metadata = metadata or {}
+        os.makedirs(os.path.join(directory, BLOB_DIR), exist_ok=True)
+
+        self.snapshots_written = 0
+        self.bytes_written = 0
+        self._blocks: Dict[str, Dict[int, str]] = {}
+        self._error: Optional[BaseException] = None
+        self._queue: Optional[queue.Queue] = None
+        self._writer: Optional[threading.Thread] = None
+        if background:
+            self._queue = queue.Queue(maxsize=1)
+            self._writer = threading.Thread(target=self._write_loop, daemon=True)
+            self._writer.start()
+
+    def maybe_save(self, network, hour: int) -> bool:
+        """Snapshot after every `every`-th hour"""
+        if (hour + 1) % self.every:
+            return False
+        self.save(network)
+        return True
+
+    def save(self, network):
+        """Capture the network now and write the snapshot (in the background if enabled)"""
+        if self._error is not None:
+            raise RuntimeError("Checkpoint writer failed") from self._error
+
+        tree = {
+            'config': network.config(),
+            'state': network.state_dict(),
+            'global_rng': global_rng_state()
+        }
+        encoder = _Encoder(self._blocks, self.block_rows)
+        encoded = encoder.encode(tree)
+        job = (network.current_hour, encoded, encoder.arrays, encoder.named)
+
+        if self._queue is not None:
+            self._queue.put(job)
+        else:
+            self._write(*job)
+
+    def _write_loop(self):
+        """Background writer"""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            try:
+                self._write(*job)
+            except BaseException as e:
+                self._error = e
+
+    def _store(self, name: str, array: np.ndarray):
+        """Write a blob unless it already exists"""
+        path = os.path.join(self.directory, BLOB_DIR, f"{name}.npy")
+        if not os.path.exists(path):
+            np.save(path + '.tmp.npy', array)
+            os.replace(path + '.tmp.npy', path)
+            self.bytes_written += array.nbytes
+
+    def _write(self, hour: int, encoded: Dict, arrays: List[np.ndarray], named: Dict[str, np.ndarray]):
+        """Write blobs, then the manifest, then advance LATEST"""
+        blobs = []
+        for array in arrays:
+            name = _blob_name(array)
+            self._store(name, array)
+            blobs.append(name)
+        for name, array in named.items():
+            self._store(name, array)
+
+        manifest = {
+            'version': 1,
+            'hour': hour,
+            'metadata': self.metadata,
+            'blobs': blobs,
+            'series_blobs': sorted(_series_refs(encoded)),
+            'tree': encoded
+        }
+        snapshot = f"snapshot_{hour:08d}.json"
+        path = os.path.join(self.directory, snapshot)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(manifest, f)
+        os.replace(path + '.tmp', path)
+
+        latest = os.path.join(self.directory, LATEST_FILE)
+        with open(latest + '.tmp', 'w') as f:
+            f.write(snapshot)
+        os.replace(latest + '.tmp', latest)
+
+        self.snapshots_written += 1
+        self._prune()
+
+    def _prune(self):
+        """Keep the newest `keep` snapshots and the blobs they reference"""
+        snapshots = list_snapshots(self.directory)
+        for old in snapshots[:-self.keep]:
+            os.remove(os.path.join(self.directory, old))
+
+        referenced = set()
+        for snapshot in snapshots[-self.keep:]:
+            with open(os.path.join(self.directory, snapshot)) as f:
+                manifest = json.load(f)
+            referenced.update(manifest['blobs'])
+            referenced.update(manifest['series_blobs'])
+
+        blob_dir = os.path.join(self.directory, BLOB_DIR)
+        for filename in os.listdir(blob_dir):
+            if filename.endswith('.npy') and filename[:-4] not in referenced:
+                os.remove(os.path.join(blob_dir, filename))
+
+    def close(self):
+        """Wait for pending snapshots to be written"""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        if self._error is not None:
+            raise RuntimeError("Checkpoint writer failed") from self._error
+
+
+def _series_refs(obj: Any) -> List[str]:
+    """Blob names referenced directly by series pieces"""
+    refs = []
+    if isinstance(obj, dict):
+        if '__series__' in obj:
+            refs.extend(ref for _, _, ref in obj['__series__']['pieces'] if isinstance(ref, str))
+        else:
+            for value in obj.values():
+                refs.extend(_series_refs(value))
+    elif isinstance(obj, list):
+        for value in obj:
+            refs.extend(_series_refs(value))
+    return refs
+
+
+def list_snapshots(directory: str) -> List[str]:
+    """Snapshot manifests in a checkpoint directory, oldest first"""
+    return sorted(f for f in os.listdir(directory)
+                  if f.startswith('snapshot_') and f.endswith('.json'))
+
+
+def load_checkpoint(directory: str, snapshot: Optional[str] = None) -> Dict:
+    """Decode a snapshot (the latest by default)
+
+    Returns a dict with 'hour', 'metadata', 'config', 'state' and
+    'global_rng'. Arrays are memory-mapped from the blob files.
+    """
+    if snapshot is None:
+        with open(os.path.join(directory, LATEST_FILE)) as f:
+            snapshot = f.read().strip()
+    with open(os.path.join(directory, snapshot)) as f:
+        manifest = json.load(f)
+
+    def load(name: str) -> np.ndarray:
+        return np.load(os.path.join(directory, BLOB_DIR, f"{name}.npy"), mmap_mode='r')
+
+    tree = _decode(manifest['tree'], manifest['blobs'], load)
+    tree['hour'] = manifest['hour']
+    tree['metadata'] = manifest['metadata']
+    return tree
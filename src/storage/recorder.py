@@ -0,0 +1,258 @@
+import json
+import os
+import queue
+import threading
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+# Per-hour series recorded for every sensor
+SERIES = (
+    'temperature',
+    'prediction',
+    'accuracy',
+    'privacy_score',
+    'range_min',
+    'range_max',
+    'variance',
+    'trend',
+    'peak_mask',
+    'anomaly_score'
+)
+
+INDEX_FILE = 'index.json'
+
+
+def _peak_mask(peak_hours: Sequence[int]) -> int:
+    """Encode peak hour offsets (< 32) as a bitmask"""
+    mask = 0
+    for hour in peak_hours:
+        if hour < 32:
+            mask |= 1 << hour
+    return mask
+
+
+class MetricsRecorder:
+    """Streams per-hour network series to chunked, memory-mappable columnar files
+
+    Rows accumulate in preallocated chunk buffers of `chunk_hours` hours;
+    full chunks are handed to a background thread that writes one `.npy`
+    file per series into `chunk_NNNNNN/` and updates `index.json`, so a run
+    never holds more than a couple of chunks in memory.
+    """
+
+    def __init__(self, directory: str, chunk_hours: int = 1024, queue_size: int = 4):
+        self.directory = directory
+        self.chunk_hours = chunk_hours
+        os.makedirs(directory, exist_ok=True)
+
+        self.sensor_names: Optional[List[str]] = None
+        self.index: Dict = {'version': 1, 'sensors': None, 'series': list(SERIES), 'chunks': []}
+        self._buffers: Optional[Dict[str, np.ndarray]] = None
+        self._hours: Optional[np.ndarray] = None
+        self._rows = 0
+        self._chunk_id = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._error: Optional[BaseException] = None
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _allocate(self, num_sensors: int):
+        """Fresh chunk buffers"""
+        shape = (self.chunk_hours, num_sensors)
+        self._buffers = {name: np.full(shape, np.nan) for name in SERIES if name != 'peak_mask'}
+        self._buffers['peak_mask'] = np.zeros(shape, dtype=np.uint32)
+        self._hours = np.zeros(self.chunk_hours, dtype=np.int64)
+        self._rows = 0
+
+    def record(self, network, hour: int):
+        """Append one row per series for the network's current state"""
+        if self._error is not None:
+            raise RuntimeError("Metrics writer failed") from self._error
+
+        if self.sensor_names is None:
+            self.sensor_names = [s.name for s in network.sensors]
+            self.index['sensors'] = self.sensor_names
+            self._allocate(len(self.sensor_names))
+
+        row = self._rows
+        if network.fleet is not None:
+            self._record_fleet(network.fleet, row)
+        else:
+            self._record_sensors(network.sensors, row)
+        if network.detector is not None:
+            self._buffers['anomaly_score'][row] = network.detector.scores
+        self._hours[row] = hour
+        self._rows += 1
+
+        if self._rows == self.chunk_hours:
+            self.flush()
+
+    def _record_fleet(self, fleet, row: int):
+        """Copy a row straight out of the fleet arrays"""
+        buffers = self._buffers
+        buffers['temperature'][row] = fleet.temperature_history[-1]
+        if len(fleet.prediction_history):
+            buffers['prediction'][row] = fleet.prediction_history[-1]
+        buffers['accuracy'][row] = fleet.accuracy_history[-1]
+        buffers['privacy_score'][row] = fleet.privacy_score
+        if fleet.has_patterns:
+            stats = fleet.pattern_stats
+            buffers['range_min'][row] = stats['min']
+            buffers['range_max'][row] = stats['max']
+            buffers['variance'][row] = stats['variance']
+            buffers['trend'][row] = stats['trend']
+            weights = (1 << np.arange(min(32, fleet.window_size), dtype=np.uint64))
+            buffers['peak_mask'][row] = weights @ fleet.peak_mask[:len(weights)].astype(np.uint64)
+
+    def _record_sensors(self, sensors: List, row: int):
+        """Gather a row from individual sensors"""
+        buffers = self._buffers
+        for col, sensor in enumerate(sensors):
+            buffers['temperature'][row, col] = sensor.temperature_history[-1]
+            if len(sensor.prediction_history):
+                buffers['prediction'][row, col] = sensor.prediction_history[-1]
+            buffers['accuracy'][row, col] = sensor.accuracy_history[-1]
+            buffers['privacy_score'][row, col] = sensor.privacy.privacy_score
+
+            patterns = sensor.learned_patterns
+            if patterns:
+                buffers['range_min'][row, col], buffers['range_max'][row, col] = patterns['daily_range']
+                buffers['variance'][row, col] = patterns['variance']
+                buffers['trend'][row, col] = patterns['trend']
+                buffers['peak_mask'][row, col] = _peak_mask(patterns['peak_hours'])
+
+    def flush(self):
+        """Hand the current (possibly partial) chunk to the writer thread"""
+        if self._buffers is None or self._rows == 0:
+            return
+        rows = self._rows
+        chunk = {name: buffer[:rows] for name, buffer in self._buffers.items()}
+        chunk['hour'] = self._hours[:rows]
+        self._queue.put((self._chunk_id, chunk))
+        self._chunk_id += 1
+        self._allocate(len(self.sensor_names))
+
+    def _write_loop(self):
+        """Background writer: one directory of .npy files per chunk"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            chunk_id, chunk = item
+            try:
+                name = f"chunk_{chunk_id:06d}"
+                path = os.path.join(self.directory, name)
+                os.makedirs(path, exist_ok=True)
+                for series, values in chunk.items():
+                    np.save(os.path.join(path, f"{series}.npy"), values)
+
+                hours = chunk['hour']
+                self.index['chunks'].append({
+                    'path': name,
+                    'rows': len(hours),
+                    'start_hour': int(hours[0]),
+                    'end_hour': int(hours[-1])
+                })
+                self._write_index()
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _write_index(self):
+        """Atomically replace index.json"""
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def state_dict(self) -> Dict:
+        """Position and unflushed rows, once every queued chunk is on disk"""
+        self._queue.join()
+        if self._error is not None:
+            raise RuntimeError("Metrics writer failed") from self._error
+        return {
+            'sensors': self.sensor_names,
+            'chunk_id': self._chunk_id,
+            'rows': self._rows,
+            'hours': self._hours[:self._rows] if self._buffers is not None else None,
+            'buffers': ({name: buffer[:self._rows] for name, buffer in self._buffers.items()}
+                        if self._buffers is not None else None)
+        }
+
+    def load_state_dict(self, state: Dict):
+        """Continue a recording from `state_dict`, dropping chunks written after it"""
+        self.sensor_names = state['sensors']
+        self.index['sensors'] = self.sensor_names
+        self._chunk_id = state['chunk_id']
+
+        path = os.path.join(self.directory, INDEX_FILE)
+        if os.path.exists(path):
+            with open(path) as f:
+                chunks = json.load(f)['chunks']
+            self.index['chunks'] = [c for c in chunks
+                                    if int(c['path'].rsplit('_', 1)[1]) < self._chunk_id]
+            self._write_index()
+
+        if self.sensor_names is not None:
+            self._allocate(len(self.sensor_names))
+            rows = state['rows']
+            for name, values in state['buffers'].items():
+                self._buffers[name][:rows] = values
+            self._hours[:rows] = state['hours']
+            self._rows = rows
+
+    def close(self):
+        """Flush pending rows and wait for the writer to finish"""
+        if self._writer.is_alive():
+            self.flush()
+            self._queue.put(None)
+            self._writer.join()
+        if self._error is not None:
+            raise RuntimeError("Metrics writer failed") from self._error
+
+
+class RecordingReader:
+    """Memory-mapped access to a directory written by MetricsRecorder"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            self.index = json.load(f)
+        self.sensors: List[str] = self.index['sensors'] or []
+        self.chunks: List[Dict] = self.index['chunks']
+
+    def __len__(self) -> int:
+        return sum(chunk['rows'] for chunk in self.chunks)
+
+    def chunk(self, position: int, series: str) -> np.ndarray:
+        """Memory-mapped (rows, sensors) array of one series in one chunk"""
+        path = os.path.join(self.directory, self.chunks[position]['path'], f"{series}.npy")
+        return np.load(path, mmap_mode='r')
+
+    def series(self, name: str, sensor: Optional[str] = None,
+               start_hour: Optional[int] = None, end_hour: Optional[int] = None) -> np.ndarray:
+        """Values of a series over an hour range, optionally for one sensor
+
+        Only chunks overlapping the range are touched.
+        """
+        column = self.sensors.index(sensor) if sensor is not None else slice(None)
+        parts = []
+        for position, chunk in enumerate(self.chunks):
+            if start_hour is not None and chunk['end_hour'] < start_hour:
+                continue
+            if end_hour is not None and chunk['start_hour'] > end_hour:
+                continue
+            hours = self.chunk(position, 'hour')
+            keep = np.ones(len(hours), dtype=bool)
+            if start_hour is not None:
+                keep &= hours >= start_hour
+            if end_hour is not None:
+                keep &= hours <= end_hour
+            parts.append(self.chunk(position, name)[keep][:, column])
+
+        if not parts:
+            return np.zeros((0,) if sensor is not None else (0, len(self.sensors)))
+        return np.concatenate(parts)
@@ -0,0 +1,341 @@
+import csv
+import itertools
+import os
+import queue
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from .recorder import INDEX_FILE, RecordingReader
+
+FORMATS = ('npy', 'csv', 'recording')
+
+# Header of a long-format CSV: one reading per row
+LONG_COLUMNS = ('timestamp', 'sensor', 'value')
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+
+
+def detect_format(path: str) -> str:
+    """Replay format of `path`: a MetricsRecorder directory, `.npy` or `.csv` file"""
+    if os.path.isdir(path):
+        if os.path.exists(os.path.join(path, INDEX_FILE)):
+            return 'recording'
+        raise ValueError(f"{path} is not a MetricsRecorder directory")
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension in ('npy', 'csv'):
+        return extension
+    raise ValueError(f"Cannot tell the format of {path}; choose from: {', '.join(FORMATS)}")
+
+
+def parse_timestamps(values: Sequence[str]) -> np.ndarray:
+    """Seconds since the epoch of numeric or ISO 8601 (UTC) timestamps"""
+    try:
+        return np.asarray(values, dtype=float)
+    except ValueError:
+        stamps = np.array([v.rstrip('Z') for v in values], dtype='datetime64[ms]')
+        return stamps.astype(np.int64) / 1e3
+
+
+def _parse_values(values: Sequence[str]) -> np.ndarray:
+    """Floats, with empty cells as NaN"""
+    return np.array([v or 'nan' for v in values], dtype=float)
+
+
+class HourlyAligner:
+    """Folds timestamped readings of a fixed set of sensors into hourly ticks
+
+    Hours are counted from midnight (UTC) of `origin`, so `hour % 24` is
+    the hour of day. A sensor's readings within one hour are averaged and
+    hours it did not report are NaN. Rows should arrive in time order:
+    the latest hour stays open until `drain(final=True)`, and rows for an
+    hour already drained are dropped and counted in `late_rows`.
+    """
+
+    def __init__(self, size: int, origin: float):
+        self.size = size
+        self.origin = np.floor(origin / SECONDS_PER_DAY) * SECONDS_PER_DAY
+        self.next_hour: Optional[int] = None
+        self.sums = np.zeros((0, size))
+        self.counts = np.zeros((0, size), dtype=np.int64)
+        self.late_rows = 0
+
+    def add(self, timestamps: np.ndarray, sensors: np.ndarray, values: np.ndarray):
+        """Accumulate readings given as parallel arrays of timestamps, sensor indices and values"""
+        hours = np.floor((timestamps - self.origin) / SECONDS_PER_HOUR).astype(np.int64)
+        known = ~np.isnan(values)
+        if self.next_hour is None:
+            if not known.any():
+                return
+            self.next_hour = int(hours[known].min())
+        late = hours < self.next_hour
+        self.late_rows += int(np.count_nonzero(late & known))
+        keep = known & ~late
+        if not keep.any():
+            return
+
+        rows = hours[keep] - self.next_hour
+        span = int(rows.max()) + 1
+        if span > len(self.sums):
+            grow = span - len(self.sums)
+            self.sums = np.vstack([self.sums, np.zeros((grow, self.size))])
+            self.counts = np.vstack([self.counts, np.zeros((grow, self.size), dtype=np.int64)])
+        cells = rows * self.size + sensors[keep]
+        total = len(self.sums) * self.size
+        self.sums += np.bincount(cells, weights=values[keep], minlength=total).reshape(self.sums.shape)
+        self.counts += np.bincount(cells, minlength=total).reshape(self.counts.shape)
+
+    def drain(self, final: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """Hours and (hours, sensors) mean readings of every closed hour"""
+        ready = len(self.sums) if final else max(len(self.sums) - 1, 0)
+        hours = np.arange(ready, dtype=np.int64) + (self.next_hour or 0)
+        with np.errstate(invalid='ignore'):
+            means = self.sums[:ready] / self.counts[:ready]
+        self.sums = self.sums[ready:]
+        self.counts = self.counts[ready:]
+        if ready:
+            self.next_hour += ready
+        return hours, means
+
+
+class _GapFiller:
+    """Forward-fills hours a sensor did not report
+
+    Hours before a sensor's first reading repeat that reading, so blocks
+    are held back until every sensor has reported at least once.
+    """
+
+    def __init__(self, names: Sequence[str]):
+        self.names = names
+        self.last = np.full(len(names), np.nan)
+        self.held: List[Tuple[np.ndarray, np.ndarray]] = []
+
+    def push(self, hours: np.ndarray, values: np.ndarray) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        if not len(hours):
+            return None
+        filled = _forward_fill(values, self.last)
+        self.last = filled[-1].copy()
+        self.held.append((hours, filled))
+        if np.isnan(self.last).any():
+            return None
+
+        hours = np.concatenate([h for h, _ in self.held])
+        filled = np.concatenate([v for _, v in self.held])
+        self.held = []
+        # Back-fill the start of sensors that reported late
+        first = _forward_fill(filled[::-1], np.full(len(self.names), np.nan))[-1]
+        return hours, np.where(np.isnan(filled), first, filled)
+
+    def finish(self):
+        if self.held:
+            missing = [name for name, value in zip(self.names, self.last) if np.isnan(value)]
+            raise ValueError(f"No readings for sensors: {', '.join(missing[:10])}")
+
+
+def _forward_fill(values: np.ndarray, last: np.ndarray) -> np.ndarray:
+    """Each NaN replaced by the latest earlier value in its column, or `last`"""
+    rows = np.where(np.isnan(values), -1, np.arange(len(values))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = values[np.maximum(rows, 0), np.arange(values.shape[1])]
+    return np.where(rows >= 0, filled, last)
+
+
+class ReplaySource:
+    """Recorded sensor readings replayed as hourly ticks for `EnhancedFederatedNetwork`
+
+    Reads a memory-mapped `.npy` array of (hours, sensors) readings (e.g.
+    from `fedsense generate`), the temperature series of a
+    `MetricsRecorder` directory, or a CSV file. A CSV is either long,
+    with a `timestamp,sensor,value` header and one reading per row, or
+    wide, with a timestamp column followed by one column per sensor.
+    Timestamps are epoch seconds or ISO 8601 in UTC and are aligned to
+    hourly ticks by `HourlyAligner`. A long CSV is scanned once for its
+    sensor names unless `names` are given.
+
+    Hours a sensor did not report repeat its previous reading. Files are
+    read `chunk_hours` hours (or `chunk_rows` CSV rows) at a time on a
+    background thread, up to `prefetch` blocks ahead, so disk I/O and
+    parsing overlap the network update. Ticks are yielded as fast as they
+    are consumed, or paced to `realtime_factor` simulated seconds per
+    wall-clock second.
+    """
+
+    def __init__(self, path: str, format: Optional[str] = None,
+                 names: Optional[Sequence[str]] = None, start_hour: int = 0,
+                 chunk_hours: int = 1024, chunk_rows: int = 1_000_000, prefetch: int = 4,
+                 realtime_factor: Optional[float] = None):
+        if chunk_hours < 1 or chunk_rows < 1 or prefetch < 1:
+            raise ValueError("chunk_hours, chunk_rows and prefetch must be at least 1")
+        if realtime_factor is not None and realtime_factor <= 0:
+            raise ValueError("realtime_factor must be positive")
+        self.path = path
+        self.format = format if format is not None else detect_format(path)
+        if self.format not in FORMATS:
+            raise ValueError(f"Unknown format '{self.format}'. Choose from: {', '.join(FORMATS)}")
+        self.start_hour = start_hour
+        self.chunk_hours = chunk_hours
+        self.chunk_rows = chunk_rows
+        self.prefetch = prefetch
+        self.realtime_factor = realtime_factor
+
+        self.names = list(names) if names is not None else self._read_names()
+        self.size = len(self.names)
+        self._ids = {name: i for i, name in enumerate(self.names)}
+
+        self.ticks_read = 0
+        self.late_rows = 0
+        self.read_seconds = 0.0
+        self.wait_seconds = 0.0
+        self._queue: Optional[queue.Queue] = None
+        self._reader: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def _read_names(self) -> List[str]:
+        """Sensor names stored with the data, or `sensor_{i}` for bare arrays"""
+        if self.format == 'recording':
+            return list(RecordingReader(self.path).sensors)
+        if self.format == 'npy':
+            columns = np.load(self.path, mmap_mode='r').shape[1]
+            return [f"sensor_{i}" for i in range(columns)]
+
+        with open(self.path, newline='') as f:
+            reader = csv.reader(f)
+            header = [column.strip() for column in next(reader)]
+            if tuple(c.lower() for c in header) != LONG_COLUMNS:
+                return header[1:]
+            return list(dict.fromkeys(row[1] for row in reader if row))
+
+    def _blocks(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """(hours, (hours, sensors) readings) blocks straight from the file, gaps as NaN"""
+        if self.format == 'npy':
+            data = np.load(self.path, mmap_mode='r')
+            for start in range(0, len(data), self.chunk_hours):
+                # Copying pages the block in on the reader thread
+                block = np.array(data[start:start + self.chunk_hours], dtype=float)
+                yield self.start_hour + start + np.arange(len(block)), block
+        elif self.format == 'recording':
+            recording = RecordingReader(self.path)
+            columns = [recording.sensors.index(name) for name in self.names]
+            for position in range(len(recording.chunks)):
+                hours = np.array(recording.chunk(position, 'hour'))
+                yield hours, np.array(recording.chunk(position, 'temperature')[:, columns], dtype=float)
+        else:
+            yield from self._csv_blocks()
+
+    def _csv_blocks(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        with open(self.path, newline='') as f:
+            reader = csv.reader(f)
+            header = [column.strip() for column in next(reader)]
+            long = tuple(c.lower() for c in header) == LONG_COLUMNS
+            if not long:
+                columns = np.array([self._ids.get(name, -1) for name in header[1:]])
+            aligner = None
+
+            while True:
+                rows = [row for row in itertools.islice(reader, self.chunk_rows) if row]
+                if not rows:
+                    break
+                cells = list(zip(*rows))
+                timestamps = parse_timestamps(cells[0])
+                if aligner is None:
+                    aligner = HourlyAligner(self.size, float(timestamps[0]))
+
+                if long:
+                    labels, inverse = np.unique(np.array(cells[1]), return_inverse=True)
+                    sensors = np.array([self._ids.get(label, -1) for label in labels])[inverse]
+                    values = _parse_values(cells[2])
+                else:
+                    values = np.stack([_parse_values(column) for column in cells[1:]], axis=1)
+                    sensors = np.broadcast_to(columns, values.shape).ravel()
+                    timestamps = np.repeat(timestamps, values.shape[1])
+                    values = values.ravel()
+                known = sensors >= 0
+                aligner.add(timestamps[known], sensors[known], values[known])
+                self.late_rows = aligner.late_rows
+                yield aligner.drain()
+
+            if aligner is not None:
+                yield aligner.drain(final=True)
+
+    def _read_loop(self):
+        """Background reader: aligned, gap-filled blocks into the prefetch queue"""
+        try:
+            filler = _GapFiller(self.names)
+            blocks = self._blocks()
+            while not self._stop.is_set():
+                started = time.perf_counter()
+                block = next(blocks, None)
+                if block is None:
+                    filler.finish()
+                    break
+                ready = filler.push(*block)
+                self.read_seconds += time.perf_counter() - started
+                if ready is not None:
+                    self._put(ready)
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._put(None)
+
+    def _put(self, item):
+        """Queue `item`, giving up once the source is closed"""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def ticks(self, start: Optional[int] = None, end: Optional[int] = None) -> Iterator[Tuple[int, np.ndarray]]:
+        """(hour, readings) for each recorded hour in [start, end), read ahead on a background thread"""
+        self.close()
+        self._stop.clear()
+        self._error = None
+        self._queue = queue.Queue(maxsize=self.prefetch)
+        self._reader = threading.Thread(target=self._read_loop, name='replay-reader', daemon=True)
+        self._reader.start()
+
+        paced = 0
+        began = time.perf_counter()
+        try:
+            while True:
+                waited = time.perf_counter()
+                item = self._queue.get()
+                self.wait_seconds += time.perf_counter() - waited
+                if item is None:
+                    break
+                hours, values = item
+                for hour, readings in zip(hours.tolist(), values):
+                    if start is not None and hour < start:
+                        continue
+                    if end is not None and hour >= end:
+                        return
+                    if self.realtime_factor is not None:
+                        # Deadlines from the first tick, so pacing does not drift
+                        delay = began + paced * SECONDS_PER_HOUR / self.realtime_factor - time.perf_counter()
+                        if delay > 0:
+                            time.sleep(delay)
+                    paced += 1
+                    self.ticks_read += 1
+                    yield hour, readings
+            if self._error is not None:
+                raise RuntimeError(f"Replay of {self.path} failed") from self._error
+        finally:
+            self.close()
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        return self.ticks()
+
+    def stats(self) -> Dict:
+        """Ticks replayed, late CSV rows dropped and time spent reading vs waiting for data"""
+        return {'ticks': self.ticks_read, 'late_rows': self.late_rows,
+                'read_seconds': self.read_seconds, 'wait_seconds': self.wait_seconds}
+
+    def close(self):
+        """Stop the reader thread"""
+        if self._reader is not None:
+            self._stop.set()
+            self._reader.join()
+            self._reader = None
@@ -1,7 +1,9 @@
 from rich.console import Console
+from rich.live import Live
 from rich.table import Table
 from rich.panel import Panel
 from typing import List, Dict
+from ..core.instrumentation import Instrumentation
 from ..core.sensor import EnhancedSensor
 
 class NetworkConsole:
@@ -48,6 +50,7 @@ class NetworkConsole:
             f"Network Health Metrics\n\n"
             f"Average Accuracy: {health['average_accuracy']:.2%}\n"
             f"Average Privacy: {health['average_privacy']:.1f}%\n"
+            f"Max Epsilon Spent: {health['max_epsilon']:.2f}\n"
             f"Active Sensors: {health['active_sensors']}\n"
             f"Pattern Coverage: {health['pattern_coverage']:.1%}",
             title="Network Status"
@@ -65,4 +68,41 @@ class NetworkConsole:
 
     def print_simulation_complete(self):
         """Print simulation completion message"""
-        self.console.print("\n[bold green]Simulation Complete![/bold green]")
\ No newline at end of file
+        self.console.print("\n[bold green]Simulation Complete![/bold green]")
+
+    def instrumentation_table(self, instrumentation: Instrumentation, slowest: int = 3) -> Table:
+        """Per-phase latency percentiles, with the slowest sensors of each phase"""
+        hours = instrumentation.counters.get('hours', 0)
+        table = Table(title=f"Update Phases ({hours} hours)")
+        table.add_column("Phase")
+        table.add_column("Count", justify="right")
+        table.add_column("Mean", justify="right")
+        table.add_column("p50", justify="right")
+        table.add_column("p90", justify="right")
+        table.add_column("p99", justify="right")
+        table.add_column("Total", justify="right")
+        table.add_column("Slowest sensors (p90)")
+
+        for row in instrumentation.summary():
+            sensors = instrumentation.slowest_sensors(row['phase'], slowest)
+            table.add_row(
+                row['phase'],
+                str(row['count']),
+                _milliseconds(row['mean']),
+                _milliseconds(row['p50']),
+                _milliseconds(row['p90']),
+                _milliseconds(row['p99']),
+                f"{row['total']:.2f}s",
+                ', '.join(f"{name} {_milliseconds(p90)}" for name, p90 in sensors)
+            )
+        return table
+
+    def live_instrumentation(self, instrumentation: Instrumentation,
+                             refresh_per_second: float = 2) -> Live:
+        """Live-refreshing phase table; use as a context manager around a run"""
+        return Live(get_renderable=lambda: self.instrumentation_table(instrumentation),
+                    console=self.console, refresh_per_second=refresh_per_second)
+
+
+def _milliseconds(seconds: float) -> str:
+    return f"{seconds * 1e3:.3f}ms"
@@ -1,22 +1,64 @@
+import os
+import queue
+import threading
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from matplotlib.gridspec import GridSpec
-from typing import List
+from typing import Dict, List, Optional
 from ..core.sensor import EnhancedSensor
 
 
 class NetworkPlotter:
-    """Handles all visualization aspects of the network"""
+    """Handles all visualization aspects of the network
+
+    Artists are created once and updated in place with `set_data`; on
+    interactive backends only the changed artists are redrawn (blitting).
+    `headless=True` renders to an off-screen Agg canvas, `render_every`
+    skips hours between renders, and `background=True` (headless only)
+    renders snapshots on a worker thread so the simulation never waits.
+    Networks larger than `max_sensor_lines` are drawn as fleet aggregates
+    (percentile bands, per-pattern means and a privacy histogram).
+    """
+
+    def __init__(self, headless: bool = False, render_every: int = 1,
+                 background: bool = False, blit: bool = True,
+                 frame_dir: Optional[str] = None, max_sensor_lines: int = 8):
+        if background and not headless:
+            raise ValueError("Background rendering requires headless=True; GUI backends are not thread-safe")
+
+        self.headless = headless
+        self.render_every = max(1, render_every)
+        self.blit = blit and not headless
+        self.frame_dir = frame_dir
+        self.max_sensor_lines = max_sensor_lines
+        self.frames_rendered = 0
 
-    def __init__(self):
         plt.style.use('dark_background')
-        self.fig = plt.figure(figsize=(15, 10))
+        if headless:
+            self.fig = Figure(figsize=(15, 10))
+            FigureCanvasAgg(self.fig)
+        else:
+            plt.ion()
+            self.fig = plt.figure(figsize=(15, 10))
         self.gs = GridSpec(4, 3, figure=self.fig)
         self.setup_plots()
 
-        self.colors = ['#FF9999', '#99FF99', '#9999FF']
+        self.colors = ['#FF9999', '#99FF99', '#9999FF', '#FFCC99',
+                       '#CC99FF', '#99FFFF', '#FFFF99', '#FF99CC']
         self.fig.patch.set_facecolor('#1C1C1C')
-        plt.tight_layout()
+        self.fig.tight_layout()
+
+        self._artists: Optional[Dict] = None
+        self._backgrounds = None
+        self._lock = threading.Lock()
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        if background:
+            self._queue = queue.Queue(maxsize=1)
+            self._thread = threading.Thread(target=self._render_loop, daemon=True)
+            self._thread.start()
 
     def setup_plots(self):
         """Initialize all plot areas"""
@@ -34,90 +76,333 @@ class NetworkPlotter:
         # Privacy metrics plot
         self.privacy_ax = self.fig.add_subplot(self.gs[3, :])
 
+    @property
+    def axes(self) -> List:
+        return [self.temp_ax, self.pattern_ax, self.privacy_ax] + self.sensor_axes
+
     def update_plots(self, sensors: List[EnhancedSensor], hour: int):
-        """Update all visualization components"""
-        self._clear_plots()
-        self._plot_temperatures(sensors)
-        self._plot_sensor_insights(sensors)
-        self._plot_pattern_analysis(sensors)
-        self._plot_privacy_metrics(sensors)
-
-        plt.tight_layout()
-        plt.pause(0.1)
-
-    def _clear_plots(self):
-        """Clear all plots for updating"""
-        for ax in [self.temp_ax, self.pattern_ax, self.privacy_ax] + self.sensor_axes:
-            ax.clear()
-
-    def _plot_temperatures(self, sensors: List[EnhancedSensor]):
-        """Plot main temperature readings"""
-        window = min(48, len(sensors[0].temperature_history))
-
-        for i, sensor in enumerate(sensors):
-            data = sensor.temperature_history[-window:]
-            times = list(range(len(data)))
-            self.temp_ax.plot(times, data, label=sensor.name, color=self.colors[i])
+        """Update all visualization components (every `render_every` hours)"""
+        if hour % self.render_every != 0:
+            return
+
+        if len(sensors) > self.max_sensor_lines:
+            snapshot = self._aggregate_snapshot(sensors, hour)
+        else:
+            snapshot = self._snapshot(sensors, hour)
+        if self._queue is None:
+            self._render(snapshot)
+            return
+
+        # Keep only the newest snapshot; the worker renders whatever is latest
+        try:
+            self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        self._queue.put_nowait(snapshot)
+
+    def _snapshot(self, sensors: List[EnhancedSensor], hour: int) -> Dict:
+        """Copy the data needed for one frame so rendering can happen later"""
+        return {
+            'hour': hour,
+            'names': [s.name for s in sensors],
+            'temperatures': [np.array(s.temperature_history[-48:], dtype=float) for s in sensors],
+            'accuracies': [np.array(s.accuracy_history[-48:], dtype=float)
+                           for s in sensors[:len(self.sensor_axes)]],
+            'privacy': np.array([s.privacy.privacy_score for s in sensors], dtype=float)
+        }
+
+    def _aggregate_snapshot(self, sensors: List[EnhancedSensor], hour: int) -> Dict:
+        """Reduce a large network to fleet-level series for one frame"""
+        fleet = getattr(sensors[0], 'fleet', None)
+        if fleet is not None:
+            temps = np.array(fleet.temperature_history.last(48), dtype=float)
+            accuracies = np.array(fleet.accuracy_history.last(48), dtype=float)
+            privacy = np.array(fleet.privacy_score, dtype=float)
+            pattern_types = np.asarray(fleet.pattern_types)
+        else:
+            temps = np.stack([np.asarray(s.temperature_history[-48:], dtype=float) for s in sensors], axis=1)
+            length = min(48, min(len(s.accuracy_history) for s in sensors))
+            accuracies = np.stack([np.asarray(s.accuracy_history[-length:], dtype=float)
+                                   for s in sensors], axis=1)
+            privacy = np.array([s.privacy.privacy_score for s in sensors], dtype=float)
+            pattern_types = np.asarray([s.pattern.pattern_type for s in sensors])
+
+        recent = temps[-24:] if len(temps) >= 24 else temps[:0]
+        p10, p90 = np.percentile(accuracies, [10, 90], axis=1)
+        counts, edges = np.histogram(privacy, bins=10, range=(50, 100))
+        return {
+            'hour': hour,
+            'aggregate': True,
+            'size': len(sensors),
+            'temperature': {
+                'Mean': temps.mean(axis=1),
+                'P10': np.percentile(temps, 10, axis=1),
+                'P90': np.percentile(temps, 90, axis=1)
+            },
+            'accuracy': [accuracies.mean(axis=1), accuracies.min(axis=1), p90 - p10],
+            'patterns': {t: recent[:, pattern_types == t].mean(axis=1) for t in np.unique(pattern_types)},
+            'privacy_counts': counts,
+            'privacy_edges': edges
+        }
+
+    def _render_loop(self):
+        """Background worker rendering queued snapshots"""
+        while True:
+            snapshot = self._queue.get()
+            if snapshot is None:
+                break
+            self._render(snapshot)
+
+    def _render(self, snapshot: Dict):
+        """Push a snapshot into the persistent artists and redraw what changed"""
+        with self._lock:
+            aggregate = snapshot.get('aggregate', False)
+            if self._artists is None:
+                if aggregate:
+                    self._create_aggregate_artists(snapshot)
+                else:
+                    self._create_artists(snapshot)
+
+            if aggregate:
+                full_redraw = self._update_aggregate_artists(snapshot)
+            else:
+                full_redraw = self._update_artists(snapshot)
+
+            if self.headless:
+                if self.frame_dir is not None:
+                    os.makedirs(self.frame_dir, exist_ok=True)
+                    self.fig.savefig(os.path.join(self.frame_dir, f"frame_{snapshot['hour']:06d}.png"),
+                                     facecolor='#1C1C1C')
+            elif self.blit and not full_redraw and self._backgrounds is not None:
+                self._blit()
+            else:
+                self._full_draw()
+            self.frames_rendered += 1
+
+    def _color(self, i: int) -> str:
+        return self.colors[i % len(self.colors)]
+
+    def _create_artists(self, snapshot: Dict):
+        """Create every line, bar and label once"""
+        names = snapshot['names']
+        animated = self.blit
 
         self.temp_ax.set_title("Temperature Readings with Pattern Detection", color='white')
+        self.temp_ax.set_xlim(0, 47)
+        temp_lines = [self.temp_ax.plot([], [], label=name, color=self._color(i), animated=animated)[0]
+                      for i, name in enumerate(names)]
         self.temp_ax.legend(loc='upper right')
         self.temp_ax.grid(True, alpha=0.2)
 
-    def _plot_sensor_insights(self, sensors: List[EnhancedSensor]):
-        """Plot individual sensor accuracy trends"""
-        window = min(48, len(sensors[0].temperature_history))
-
-        for i, (sensor, ax) in enumerate(zip(sensors, self.sensor_axes)):
-            if len(sensor.accuracy_history) > 0:
-                acc_data = sensor.accuracy_history[-window:]
-                times = list(range(len(acc_data)))
-                ax.plot(times, acc_data, color=self.colors[i])
-                ax.set_title(f"{sensor.name}\nAccuracy: {acc_data[-1]:.2%}")
-                ax.set_ylim(0, 1)
-                ax.grid(True, alpha=0.2)
-
-    def _plot_pattern_analysis(self, sensors: List[EnhancedSensor]):
-        """Plot pattern analysis results"""
-        self.pattern_ax.set_title("Pattern Analysis", color='white')
-
-        for i, sensor in enumerate(sensors):
-            if len(sensor.temperature_history) >= 24:
-                data = sensor.temperature_history[-24:]
-                times = list(range(len(data)))
-                self.pattern_ax.plot(
-                    times,
-                    data,
-                    label=f"{sensor.name}",
-                    color=self.colors[i]
-                )
+        accuracy_lines, accuracy_labels = [], []
+        for i, (name, ax) in enumerate(zip(names, self.sensor_axes)):
+            accuracy_lines.append(ax.plot([], [], color=self._color(i), animated=animated)[0])
+            accuracy_labels.append(ax.text(0.02, 0.05, '', transform=ax.transAxes, animated=animated))
+            ax.set_title(name)
+            ax.set_xlim(0, 47)
+            ax.set_ylim(0, 1)
+            ax.grid(True, alpha=0.2)
 
+        self.pattern_ax.set_title("Pattern Analysis", color='white')
+        self.pattern_ax.set_xlim(0, 23)
+        pattern_lines = [self.pattern_ax.plot([], [], label=name, color=self._color(i), animated=animated)[0]
+                         for i, name in enumerate(names)]
         self.pattern_ax.legend(loc='upper right')
         self.pattern_ax.grid(True, alpha=0.2)
 
-    def _plot_privacy_metrics(self, sensors: List[EnhancedSensor]):
-        """Plot privacy preservation metrics"""
-        sensor_names = [s.name for s in sensors]
-        privacy_scores = [s.privacy.privacy_score for s in sensors]
-        bars = self.privacy_ax.bar(sensor_names, privacy_scores, color=self.colors)
-
-        # Add value labels on bars
+        bars = self.privacy_ax.bar(names, snapshot['privacy'],
+                                   color=[self._color(i) for i in range(len(names))])
+        bar_labels = []
         for bar in bars:
-            height = bar.get_height()
-            self.privacy_ax.text(
-                bar.get_x() + bar.get_width() / 2.,
-                height,
-                f'{height:.1f}%',
-                ha='center', va='bottom'
-            )
-
+            bar.set_animated(animated)
+            bar_labels.append(self.privacy_ax.text(
+                bar.get_x() + bar.get_width() / 2., bar.get_height(), '',
+                ha='center', va='bottom', animated=animated
+            ))
         self.privacy_ax.set_title("Privacy Preservation Scores", color='white')
         self.privacy_ax.set_ylim(0, 100)
         self.privacy_ax.grid(True, alpha=0.2)
 
+        self._artists = {
+            'temperature': temp_lines,
+            'accuracy': accuracy_lines,
+            'accuracy_labels': accuracy_labels,
+            'pattern': pattern_lines,
+            'bars': list(bars),
+            'bar_labels': bar_labels
+        }
+        self.fig.tight_layout()
+
+    def _update_artists(self, snapshot: Dict) -> bool:
+        """Set new data on the artists; returns True if axis limits had to change"""
+        artists = self._artists
+        for line, data in zip(artists['temperature'], snapshot['temperatures']):
+            line.set_data(np.arange(len(data)), data)
+
+        for line, label, data in zip(artists['accuracy'], artists['accuracy_labels'],
+                                     snapshot['accuracies']):
+            line.set_data(np.arange(len(data)), data)
+            label.set_text(f"Accuracy: {data[-1]:.2%}" if len(data) else '')
+
+        for line, data in zip(artists['pattern'], snapshot['temperatures']):
+            recent = data[-24:] if len(data) >= 24 else data[:0]
+            line.set_data(np.arange(len(recent)), recent)
+
+        for bar, label, score in zip(artists['bars'], artists['bar_labels'], snapshot['privacy']):
+            bar.set_height(score)
+            label.set_y(score)
+            label.set_text(f'{score:.1f}%')
+
+        rescaled = False
+        for ax, series in ((self.temp_ax, snapshot['temperatures']),
+                           (self.pattern_ax, [d[-24:] for d in snapshot['temperatures'] if len(d) >= 24])):
+            rescaled |= self._fit_ylim(ax, series)
+        return rescaled
+
+    def _create_aggregate_artists(self, snapshot: Dict):
+        """Create fleet-level lines, histogram bars and labels once"""
+        animated = self.blit
+
+        self.temp_ax.set_title(f"Fleet Temperature ({snapshot['size']} sensors)", color='white')
+        self.temp_ax.set_xlim(0, 47)
+        temp_lines = [self.temp_ax.plot([], [], label=label, color=self._color(i), animated=animated)[0]
+                      for i, label in enumerate(snapshot['temperature'])]
+        self.temp_ax.legend(loc='upper right')
+        self.temp_ax.grid(True, alpha=0.2)
+
+        titles = ["Mean Accuracy", "Worst Sensor Accuracy", "Accuracy Spread (P90 - P10)"]
+        accuracy_lines, accuracy_labels = [], []
+        for i, (title, ax) in enumerate(zip(titles, self.sensor_axes)):
+            accuracy_lines.append(ax.plot([], [], color=self._color(i), animated=animated)[0])
+            accuracy_labels.append(ax.text(0.02, 0.05, '', transform=ax.transAxes, animated=animated))
+            ax.set_title(title)
+            ax.set_xlim(0, 47)
+            ax.set_ylim(0, 1)
+            ax.grid(True, alpha=0.2)
+
+        self.pattern_ax.set_title("Pattern Analysis (mean by pattern type)", color='white')
+        self.pattern_ax.set_xlim(0, 23)
+        pattern_lines = [self.pattern_ax.plot([], [], label=pattern_type, color=self._color(i),
+                                              animated=animated)[0]
+                         for i, pattern_type in enumerate(snapshot['patterns'])]
+        self.pattern_ax.legend(loc='upper right')
+        self.pattern_ax.grid(True, alpha=0.2)
+
+        edges = snapshot['privacy_edges']
+        bars = self.privacy_ax.bar(edges[:-1], snapshot['privacy_counts'], width=np.diff(edges),
+                                   align='edge', color=self._color(2), edgecolor='#1C1C1C')
+        bar_labels = []
+        for bar in bars:
+            bar.set_animated(animated)
+            bar_labels.append(self.privacy_ax.text(
+                bar.get_x() + bar.get_width() / 2., bar.get_height(), '',
+                ha='center', va='bottom', animated=animated
+            ))
+        self.privacy_ax.set_title("Privacy Score Distribution", color='white')
+        self.privacy_ax.set_xlabel("Privacy score (%)")
+        self.privacy_ax.set_xlim(50, 100)
+        self.privacy_ax.set_ylim(0, snapshot['size'])
+        self.privacy_ax.grid(True, alpha=0.2)
+
+        self._artists = {
+            'temperature': temp_lines,
+            'accuracy': accuracy_lines,
+            'accuracy_labels': accuracy_labels,
+            'pattern': pattern_lines,
+            'bars': list(bars),
+            'bar_labels': bar_labels
+        }
+        self.fig.tight_layout()
+
+    def _update_aggregate_artists(self, snapshot: Dict) -> bool:
+        """Set new fleet-level data; returns True if axis limits had to change"""
+        artists = self._artists
+        for line, data in zip(artists['temperature'], snapshot['temperature'].values()):
+            line.set_data(np.arange(len(data)), data)
+
+        for line, label, data in zip(artists['accuracy'], artists['accuracy_labels'],
+                                     snapshot['accuracy']):
+            line.set_data(np.arange(len(data)), data)
+            label.set_text(f"{data[-1]:.2%}" if len(data) else '')
+
+        for line, data in zip(artists['pattern'], snapshot['patterns'].values()):
+            line.set_data(np.arange(len(data)), data)
+
+        for bar, label, count in zip(artists['bars'], artists['bar_labels'], snapshot['privacy_counts']):
+            bar.set_height(count)
+            label.set_y(count)
+            label.set_text(str(count) if count else '')
+
+        rescaled = self._fit_ylim(self.temp_ax, list(snapshot['temperature'].values()))
+        rescaled |= self._fit_ylim(self.pattern_ax, list(snapshot['patterns'].values()))
+        return rescaled
+
+    def _fit_ylim(self, ax, series: List[np.ndarray]) -> bool:
+        """Widen an axis' y-limits when data leaves them"""
+        values = [d for d in series if len(d)]
+        if not values:
+            return False
+        low = min(float(d.min()) for d in values)
+        high = max(float(d.max()) for d in values)
+        current_low, current_high = ax.get_ylim()
+        if ax.get_autoscaley_on() or low < current_low or high > current_high:
+            ax.set_ylim(low - 2, high + 2)
+            return True
+        return False
+
+    def _full_draw(self):
+        """Redraw the whole figure and cache blit backgrounds"""
+        canvas = self.fig.canvas
+        canvas.draw()
+        if self.blit:
+            self._backgrounds = [canvas.copy_from_bbox(ax.bbox) for ax in self.axes]
+            self._blit()
+        canvas.flush_events()
+
+    def _blit(self):
+        """Restore cached backgrounds and redraw only the animated artists"""
+        canvas = self.fig.canvas
+        for ax, background in zip(self.axes, self._backgrounds):
+            canvas.restore_region(background)
+            for artist in ax.get_children():
+                if artist.get_animated():
+                    ax.draw_artist(artist)
+            canvas.blit(ax.bbox)
+        canvas.flush_events()
+
+    def close(self):
+        """Stop the background renderer, if any"""
+        if self._thread is not None:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
     def show(self):
         """Display the final plot"""
+        self.close()
+        if self.headless:
+            return
+        plt.ioff()
         plt.show()
 
+    def _set_animated(self, animated: bool):
+        """Toggle blit animation on every persistent artist"""
+        if self._artists is None:
+            return
+        for group in self._artists.values():
+            for artist in group:
+                artist.set_animated(animated)
+
     def save(self, filename: str):
         """Save the current plot to a file"""
-        self.fig.savefig(filename, bbox_inches='tight', facecolor='#1C1C1C')
\ No newline at end of file
+        with self._lock:
+            # Animated artists are skipped by a normal draw, so include them explicitly
+            self._set_animated(False)
+            try:
+                self.fig.savefig(filename, bbox_inches='tight', facecolor='#1C1C1C')
+            finally:
+                self._set_animated(self.blit)